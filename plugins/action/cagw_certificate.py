@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c), Entrust Corporation, 2023
+# Author: Sapna Jain, Entrust
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import base64
+import json
+import os
+import shutil
+import tempfile
+
+from ansible import constants as C
+from ansible.errors import AnsibleActionFail
+from ansible.module_utils._text import to_native
+from ansible.module_utils.basic import FILE_COMMON_ARGUMENTS
+from ansible.plugins.action import ActionBase
+
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.api import (
+    cagw_client_argument_spec,
+    cagw_client_kwargs,
+    CAGWClient,
+    SessionConfigurationException,
+)
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.certificate import (
+    CagwCertificate,
+    CagwOperationFailure,
+    connection_failure_message,
+    ParamsModule,
+)
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.persistent import cagw_client_for
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.profiling import Profiler
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.retry import CONNECTION_ERRORS
+from ansible_collections.entrust.crypto.plugins.modules.cagw_certificate import (
+    cagw_certificate_argument_spec,
+    cagw_certificate_mutually_exclusive,
+    cagw_certificate_required_if,
+)
+
+# Warm API clients of this worker process, shared by the items of a loop
+_CLIENTS = {}
+
+
+def get_client(module):
+    if module._socket_path:
+        # The session is kept warm by the entrust.crypto.cagw connection across the tasks of the play
+        return cagw_client_for(module)
+    kwargs = cagw_client_kwargs(module.params)
+    # The endpoints are a list, which cannot be a key of a dict
+    key = json.dumps(kwargs, sort_keys=True)
+    client = _CLIENTS.get(key)
+    if client is None:
+        client = _CLIENTS[key] = CAGWClient(**kwargs)
+    return client
+
+
+class ActionModule(ActionBase):
+    '''
+    Runs cagw_certificate on the managed host, or with execution_mode=controller sends the
+    CAGW requests from the controller and only transfers the files to and from the managed host
+    '''
+
+    TRANSFERS_FILES = True
+
+    def _slurp(self, path, task_vars):
+        """Return the content of a file of the managed host, None if it cannot be read"""
+        result = self._execute_module(module_name='ansible.legacy.slurp', module_args=dict(src=path), task_vars=task_vars)
+        if result.get('failed'):
+            return None
+        return base64.b64decode(result['content'])
+
+    def _copy(self, src, dest, task_vars, **args):
+        new_task = self._task.copy()
+        new_task.args.clear()
+        new_task.args.update(dict(src=src, dest=dest))
+        new_task.args.update((option, value) for option, value in args.items() if value is not None)
+        copy_action = self._shared_loader_obj.action_loader.get('ansible.legacy.copy',
+                                                                task=new_task,
+                                                                connection=self._connection,
+                                                                play_context=self._play_context,
+                                                                loader=self._loader,
+                                                                templar=self._templar,
+                                                                shared_loader_obj=self._shared_loader_obj)
+        return copy_action.run(task_vars=task_vars)
+
+    def run(self, tmp=None, task_vars=None):
+        self._supports_check_mode = True
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp  # tmp no longer has any effect
+
+        if self._task.args.get('execution_mode', 'target') != 'controller':
+            result.update(self._execute_module(module_name='entrust.crypto.cagw_certificate', task_vars=task_vars))
+            return result
+
+        argument_spec = cagw_client_argument_spec()
+        argument_spec.update(cagw_certificate_argument_spec())
+        argument_spec.update(FILE_COMMON_ARGUMENTS)
+        dummy, params = self.validate_argument_spec(argument_spec=argument_spec, required_if=cagw_certificate_required_if(),
+                                                    mutually_exclusive=cagw_certificate_mutually_exclusive())
+        # The type=path options of the module are expanded on the target, the client files are local here
+        for option in ('cagw_api_client_cert_path', 'cagw_api_client_cert_key_path', 'cagw_api_specification_path',
+                       'cagw_api_specification_cache_dir', 'inventory_path'):
+            if params[option]:
+                params[option] = os.path.expanduser(os.path.expandvars(params[option]))
+
+        local_tempdir = tempfile.mkdtemp(dir=C.DEFAULT_LOCAL_TMP)
+        try:
+            # CagwCertificate works on local files, stage the certificate and CSR of the managed host next to each other
+            remote_path = params['path']
+            if remote_path:
+                params['path'] = os.path.join(local_tempdir, 'certificate')
+                # A sidecar in the temporary directory would be gone by the next run
+                params['metadata_cache'] = False
+                if params['request_type'] == 'new' and not params['force']:
+                    content = self._slurp(remote_path, task_vars)
+                    if content is not None:
+                        with open(params['path'], 'wb') as f:
+                            f.write(content)
+            remote_key_path = None
+            if params['request_type'] == 'new' and params['enrollment_format'] == 'X509' and params['csr']:
+                content = self._slurp(params['csr'], task_vars)
+                if content is None:
+                    raise AnsibleActionFail('The csr field of {0} was not a valid path.'.format(params['csr']))
+                params['csr'] = os.path.join(local_tempdir, 'request.csr')
+                with open(params['csr'], 'wb') as f:
+                    f.write(content)
+            elif params['request_type'] == 'new' and params['enrollment_format'] == 'X509':
+                # The key is used from the managed host, or generated here and copied to it along with the certificate
+                remote_key_path = params['private_key_path']
+                params['private_key_path'] = os.path.join(local_tempdir, 'private.key')
+                content = self._slurp(remote_key_path, task_vars)
+                if content is not None:
+                    remote_key_path = None
+                    fd = os.open(params['private_key_path'], os.O_WRONLY | os.O_CREAT, 0o600)
+                    with os.fdopen(fd, 'wb') as f:
+                        f.write(content)
+            # The PEM files split from a new PKCS12 are written here and copied to the managed host along with it
+            pkcs12_parts = []
+            if params['request_type'] == 'new' and params['enrollment_format'] == 'PKCS12':
+                for option, mode in (('p12_private_key_path', '0600'), ('p12_certificate_path', None), ('p12_chain_path', None)):
+                    if params[option]:
+                        pkcs12_parts.append((params[option], os.path.join(local_tempdir, option), dict(mode=mode)))
+                        params[option] = pkcs12_parts[-1][1]
+
+            module = ParamsModule(params, check_mode=self._play_context.check_mode, socket_path=self._connection.socket_path)
+            # Started before the client is built, the first task of a worker also accounts for building it
+            profiler = Profiler().start() if params['profile'] else None
+            try:
+                certificate = CagwCertificate(module, cagw_client=get_client(module), profiler=profiler, recorded_path=remote_path)
+                certificate.request_cert(module)
+            except SessionConfigurationException as e:
+                raise AnsibleActionFail('Failed to initialize Entrust Provider: {0}'.format(to_native(e)))
+            except CagwOperationFailure as e:
+                raise AnsibleActionFail(to_native(e))
+            except CONNECTION_ERRORS as e:
+                raise AnsibleActionFail(connection_failure_message(e, params))
+
+            result.update(certificate.dump())
+            result['filename'] = remote_path
+            if module.warnings:
+                # Name the file of the managed host rather than its local copy
+                result['warnings'] = [warning.replace(params['path'], remote_path) if remote_path else warning
+                                      for warning in module.warnings]
+            if remote_key_path and os.path.exists(params['private_key_path']):
+                copy_result = self._copy(params['private_key_path'], remote_key_path, task_vars, mode='0600')
+                if copy_result.get('failed'):
+                    copy_result['msg'] = 'Failed to copy the private key to {0}: {1}'.format(remote_key_path, copy_result.get('msg'))
+                    result.update(copy_result)
+                    return result
+            # A get is not staged from the managed host, the copy module tells whether its certificate changed
+            if remote_path and not module.check_mode and (certificate.changed or params['request_type'] == 'get'):
+                file_args = dict((option, params[option]) for option in FILE_COMMON_ARGUMENTS)
+                if certificate.writes_pkcs12() and not file_args['mode']:
+                    file_args['mode'] = '0600'
+                file_args['backup'] = params['backup']
+                copies = [(remote_path, params['path'], file_args)] + pkcs12_parts
+                for remote, local, args in copies:
+                    copy_result = self._copy(local, remote, task_vars, **args)
+                    if copy_result.get('failed'):
+                        copy_result['msg'] = 'Failed to copy the certificate to {0}: {1}'.format(remote, copy_result.get('msg'))
+                        result.update(copy_result)
+                        break
+                    if remote == remote_path:
+                        result.pop('backup_file', None)
+                        if copy_result.get('backup_file'):
+                            result['backup_file'] = copy_result['backup_file']
+                        if params['request_type'] == 'get':
+                            result['changed'] = copy_result.get('changed', False)
+        finally:
+            shutil.rmtree(local_tempdir, ignore_errors=True)
+            self._remove_tmp_path(self._connection._shell.tmpdir)
+
+        return result
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c), Entrust Corporation, 2023
+# Author: Sapna Jain, Entrust
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = '''
+---
+author:
+    - Sapna Jain (@sapnajainEntrust)
+name: cagw
+short_description: Keep the sessions with the Certificate Authority Gateway (CAGW) API warm across tasks
+version_added: 1.1.0
+description:
+    - A persistent connection for the modules of the collection. Modules run on the controller, as with
+      a local connection, and send their requests to CAGW through a process which lives for the whole play.
+    - That process keeps one session per set of C(cagw_api_*) options, host and port being per request. The first task using
+      a session loads the API specification and the client certificate, the next ones reuse them along with
+      the keep-alive TLS connections to the gateway, and only pay for a request on a local socket.
+    - A session is created again when its client certificate, key or specification file changed.
+    - Modules sending their requests from several workers, O(entrust.crypto.cagw_certificate_batch#module:workers) above 1 for example,
+      keep a session of their own, the process of the connection serves one request at a time.
+notes:
+    - The certificates, keys and CSRs are read and written on the controller, use it as the host of the tasks,
+      e.g. with C(delegate_to) or an inventory host whose C(ansible_connection) is C(entrust.crypto.cagw).
+    - Ansible starts a helper process for every task on a persistent connection, to find the process of the connection.
+      That costs a Python start-up, about half a second, which is only worth it when setting up a session costs more,
+      e.g. a gateway far enough for the mutual TLS handshake to be slow, or a specification which is not cached.
+    - The circuit breaker of a session is shared by the tasks, a gateway which keeps failing is not sent the requests
+      of the next tasks either until it recovers. So is the health of the endpoints of a O(entrust.crypto.cagw_certificate#module:host)
+      listing several of them, the requests of a task go to the endpoint which was the fastest for the previous ones.
+options:
+    persistent_connect_timeout:
+        description:
+            - Seconds the process of the connection waits for the next request before exiting, along with its sessions.
+        type: int
+        default: 30
+        ini:
+            - section: persistent_connection
+              key: connect_timeout
+        env:
+            - name: ANSIBLE_PERSISTENT_CONNECT_TIMEOUT
+        vars:
+            - name: ansible_connect_timeout
+    persistent_command_timeout:
+        description:
+            - Seconds a request may take, retries included, before the process of the connection gives up on it and exits.
+        type: int
+        default: 300
+        ini:
+            - section: persistent_connection
+              key: command_timeout
+        env:
+            - name: ANSIBLE_PERSISTENT_COMMAND_TIMEOUT
+        vars:
+            - name: ansible_command_timeout
+    persistent_log_messages:
+        description:
+            - Log every request to the process of the connection, and its response, to the log file of Ansible.
+            - The requests hold the bodies sent to CAGW, PKCS12 passwords included.
+        type: boolean
+        default: false
+        ini:
+            - section: persistent_connection
+              key: log_messages
+        env:
+            - name: ANSIBLE_PERSISTENT_LOG_MESSAGES
+        vars:
+            - name: ansible_persistent_log_messages
+'''
+
+EXAMPLES = '''
+- name: Renew the certificates of the web servers from the controller, sharing one CAGW session
+  hosts: localhost
+  connection: entrust.crypto.cagw
+  gather_facts: false
+  tasks:
+    - name: Enroll a certificate per web server
+      entrust.crypto.cagw_certificate:
+        host: cagw.example.com
+        port: 443
+        path: /etc/ssl/issued/{{ item }}.crt
+        private_key_path: /etc/ssl/private/{{ item }}.key
+        dn: CN={{ item }}
+        request_type: new
+        enrollment_format: X509
+        certificate_authority_id: 1234
+        certificate_profile_id: 5678
+        connector_name: SM
+        cagw_api_client_cert_path: /etc/ssl/entrust/cagw-client.crt
+        cagw_api_client_cert_key_path: /etc/ssl/entrust/cagw-client.key
+        cagw_api_specification_path: /etc/ssl/entrust/cagw-api.yaml
+      loop: "{{ groups['web'] }}"
+'''
+
+import json
+import os
+
+from ansible.plugins.connection import NetworkConnectionBase
+
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.api import (
+    CAGWClient,
+    RestOperationException,
+    SessionConfigurationException,
+)
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.profiling import Profiler
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.retry import CONNECTION_ERRORS
+
+# Arguments of CAGWClient naming the files a session is built from
+SESSION_FILES = ("cagw_api_cert", "cagw_api_cert_key", "cagw_api_specification_path")
+
+
+def session_files_key(client_kwargs):
+    """The inode, modification time and size of the files of a session, to tell when one of them was replaced"""
+    key = []
+    for name in SESSION_FILES:
+        path = client_kwargs.get(name)
+        try:
+            st = os.stat(path)
+        except (OSError, TypeError, ValueError):
+            key.append(None)
+        else:
+            key.append((st.st_ino, st.st_mtime_ns, st.st_size))
+    return tuple(key)
+
+
+def remote_error(exception):
+    """The error of a request, as a dict the module raises an exception of the same class from"""
+    if isinstance(exception, RestOperationException):
+        error = exception.to_error()
+    else:
+        error = dict(message=str(exception))
+    error["type"] = type(exception).__name__
+    return error
+
+
+class Connection(NetworkConnectionBase):
+    """ Persistent connection holding CAGW sessions, called by the modules through cagw_open, cagw_request and cagw_stats """
+
+    transport = 'entrust.crypto.cagw'
+    has_pipelining = True
+
+    def __init__(self, play_context, *args, **kwargs):
+        super(Connection, self).__init__(play_context, *args, **kwargs)
+        # CAGW client per options, along with the files_key of the files it was built from
+        self._clients = {}
+
+    def _connect(self):
+        # Nothing to connect to until a module asks for a session, which names the gateway
+        if not self._connected:
+            self._connected = True
+
+    def _client(self, client_kwargs):
+        # The endpoints are a list, which cannot be a key of a dict
+        key = json.dumps(client_kwargs, sort_keys=True)
+        files_key = session_files_key(client_kwargs)
+        cached = self._clients.get(key)
+        if cached is not None and cached[1] == files_key:
+            return cached[0]
+        if cached is not None:
+            self.queue_message('vvvv', 'the files of a CAGW session changed, creating it again')
+            cached[0].session.pool.close()
+        client = CAGWClient(**client_kwargs)
+        self._clients[key] = client, files_key
+        return client
+
+    def cagw_open(self, client_kwargs):
+        """The operations of the session for client_kwargs, and what it cost to set up unless an earlier task paid for it"""
+        try:
+            client = self._client(client_kwargs)
+        except SessionConfigurationException as e:
+            return dict(error=remote_error(e))
+        return dict(setup_timings=client.session.pop_setup_timings(), operations=sorted(client.session.operations))
+
+    def cagw_request(self, client_kwargs, operation, kwargs):
+        """Call operation on the session for client_kwargs, returning its result or error and the retries and timings of its attempts"""
+        client = self._client(client_kwargs)
+        profiler = Profiler(trace_memory=False)
+        retries = client.session.retries
+        response = dict(result=None, error=None)
+        try:
+            response['result'] = getattr(client, operation)(profiler=profiler, **kwargs)
+        except (RestOperationException,) + CONNECTION_ERRORS as e:
+            response['error'] = remote_error(e)
+        response['retries'] = client.session.retries - retries
+        response['timings'] = dict((phase, seconds) for phase, seconds in profiler.timings.items() if seconds)
+        return response
+
+    def cagw_stats(self, client_kwargs):
+        """The counters of the connection pool and circuit breaker of the session for client_kwargs"""
+        session = self._client(client_kwargs).session
+        return dict(pool=session.pool.stats(), retry=session.retry_stats())
+
+    def close(self):
+        for client, dummy in self._clients.values():
+            client.session.pool.close()
+        self._clients = {}
+        super(Connection, self).close()
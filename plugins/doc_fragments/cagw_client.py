@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c), Entrust Corporation, 2023
+# Author: Sapna Jain, Entrust
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+
+class ModuleDocFragment(object):
+
+    # Options shared by the modules talking to the Entrust CAGW API, see cagw_client_argument_spec()
+    DOCUMENTATION = r'''
+options:
+    cagw_api_client_cert_path:
+        description:
+            - Path for the Client cert issued by the same CA.
+        type: path
+        required: true
+
+    cagw_api_client_cert_key_path:
+        description:
+            - Path for the Client cert key issued by the same CA.
+        type: path
+        required: true
+
+    cagw_api_specification_path:
+        description:
+            - Path for CAGW api specification doc.
+            - When omitted, the specification bundled with the C(entrust.crypto.cagw_certificate) role is used, through
+              a client generated from it when the collection was built, which needs neither the file nor PyYAML.
+            - The same client is used for a copy of that specification. Any other specification, e.g. that of a
+              newer gateway, is loaded at run time, which needs PyYAML when it is written in YAML.
+        type: path
+
+    cagw_api_specification_cache_dir:
+        description:
+            - Directory in which the parsed API specification is cached between runs, so that the
+              specification doc is not parsed again by every task.
+            - A cached copy is reused while the modification time or the content hash of the specification doc is unchanged.
+            - Set to an empty string to disable the cache.
+        type: path
+        default: ~/.ansible/cagw
+        version_added: 1.1.0
+
+    cagw_api_retries:
+        description:
+            - Maximum number of times a request to CAGW is sent again after a failure.
+            - Requests which cannot change anything, e.g. getting a certificate, are retried when the connection fails
+              or CAGW answers 429, 502, 503 or 504.
+            - New enrollments and actions on certificates are only retried when the connection to CAGW could not be
+              established, so that a request CAGW may have processed is never sent twice.
+            - Set to 0 to disable retries.
+        type: int
+        default: 3
+        version_added: 1.1.0
+
+    cagw_api_retry_backoff:
+        description:
+            - Base of the exponential backoff between retries, in seconds.
+            - Retry number N waits a random time between 0 and O(cagw_api_retry_backoff) * 2^(N-1) seconds, at most 30 seconds,
+              unless the response has a C(Retry-After) header which is then honoured.
+        type: float
+        default: 0.5
+        version_added: 1.1.0
+
+    cagw_api_circuit_breaker_threshold:
+        description:
+            - Number of consecutive connection failures or 502, 503 and 504 responses after which CAGW is considered down.
+            - Requests then fail immediately for 30 seconds, instead of each waiting for its own retries, and a single
+              request is let through afterwards to find out whether CAGW is back.
+            - Set to 0 to disable the circuit breaker.
+        type: int
+        default: 5
+        version_added: 1.1.0
+
+    cagw_api_trace_path:
+        description:
+            - File to which every request to CAGW is appended as a line of JSON, with the operation, its status,
+              the bytes sent and received, the duration and the connect time in seconds, and the retry attempt.
+            - Every line also names the host and process which sent the request, so the files of a whole fleet can be
+              concatenated and aggregated.
+            - The file is created on the host running the module, by default no trace is written.
+        type: path
+        version_added: 1.1.0
+    cagw_api_validate_requests:
+        description:
+            - Check the parameters and the body of every request against the schemas of O(cagw_api_specification_path)
+              before sending it, so that a request CAGW would reject fails without a round trip to the gateway.
+            - The error names the offending field, e.g. C(Body.requiredFormat.format).
+            - Disable it only for a gateway accepting requests which its specification does not describe.
+        type: bool
+        default: true
+        version_added: 1.1.0
+    cagw_api_connect_timeout:
+        description:
+            - Seconds the TCP and TLS handshakes with CAGW may take before the endpoint is considered down.
+            - The request, which was not sent yet, then goes to the next endpoint of O(host), whatever the operation.
+        type: float
+        default: 10
+        version_added: 1.1.0
+    cagw_api_read_timeout:
+        description:
+            - Seconds CAGW may take to answer a request once it was sent, or between two reads of its response.
+        type: float
+        default: 120
+        version_added: 1.1.0
+    cagw_api_hedge_delay:
+        description:
+            - Seconds after which a request getting a certificate, or its events, which did not get a response yet is sent again,
+              to the next healthiest endpoint of O(host), or over another connection to the only one. The first response is used.
+            - This cuts the latency of the requests which hit a slow gateway node, for at most one more request each. Only
+              the requests which cannot change anything are sent twice, never an enrollment or an action on a certificate.
+            - The health of the endpoints is kept by the client of a module, and by the
+              P(entrust.crypto.cagw#connection) connection across the tasks of a play.
+            - By default no request is sent twice.
+        type: float
+        version_added: 1.1.0
+'''
@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c), Entrust Corporation, 2023
+# Author: Sapna Jain, Entrust
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = '''
+---
+author:
+    - Sapna Jain (@sapnajainEntrust)
+name: cagw_cert
+short_description: Look up certificates with the Certificate Authority Gateway (CAGW) API, for templates
+version_added: 1.1.0
+description:
+    - Returns the certificate of every serial number of the terms, with its PEM, status and validity, so that templates
+      can render a certificate without a task writing it to every host first.
+    - Certificates are cached on the controller for O(ttl) seconds, in a directory shared by the workers of the run.
+      A worker looking up a certificate which another one is fetching waits for that response rather than sending the
+      same request, rendering the same certificate for any number of hosts costs a single request.
+    - The serial numbers of a lookup which are not cached are fetched concurrently, O(workers) at a time, over one
+      session per gateway and client certificate, which the lookups of a task and of its loop items share.
+notes:
+    - The lookup runs on the controller, the client certificate and key are read there.
+    - A lookup failing, e.g. for an unknown serial number, is not cached, the next one sends its request again.
+extends_documentation_fragment:
+    - entrust.crypto.cagw_client
+options:
+    _terms:
+        description:
+            - Serial numbers of the certificates, in hexadecimal format.
+        type: list
+        elements: str
+        required: true
+    ca_id:
+        description:
+            - Unique id for the Certificate Authority which issued the certificates.
+        type: str
+        required: true
+    host:
+        description:
+            - Host or IP address for Entrust CAGW.
+            - A list of gateway endpoints, each a host optionally followed by C(:port), see
+              O(entrust.crypto.cagw_certificate#module:host).
+        type: list
+        elements: str
+        required: true
+    port:
+        description:
+            - Port for Entrust CAGW.
+        type: int
+        default: 443
+    validate_certs:
+        description:
+            - If set to false then SSL validation with Server is skipped.
+              This should be set to false only for testing purposes.
+        type: bool
+        default: true
+    ttl:
+        description:
+            - Seconds a certificate is served from the cache before it is fetched again.
+            - Set to 0 to disable the cache, every lookup then sends its requests.
+        type: int
+        default: 300
+    cache_dir:
+        description:
+            - Directory of the cache.
+            - By default the cache lives in the temporary directory of the controller for the run, and is removed along
+              with it when the run ends. Set a directory to share the certificates between runs, for up to O(ttl) seconds.
+        type: path
+    workers:
+        description:
+            - Maximum number of certificates of a lookup fetched at the same time.
+        type: int
+        default: 8
+'''
+
+EXAMPLES = '''
+- name: Render the certificate of the load balancer into the configuration of every web server
+  ansible.builtin.template:
+    src: haproxy.cfg.j2
+    dest: /etc/haproxy/haproxy.cfg
+  vars:
+    lb_certificate: "{{ lookup('entrust.crypto.cagw_cert', lb_serial_number, ca_id=cagw_ca_id, **cagw_options) }}"
+    cagw_options:
+      host: cagw.example.com
+      cagw_api_client_cert_path: /etc/ssl/entrust/cagw-client.crt
+      cagw_api_client_cert_key_path: /etc/ssl/entrust/cagw-client.key
+
+- name: Warn about the certificates of the list which expire within a month
+  ansible.builtin.debug:
+    msg: "{{ item.serial_number }} expires on {{ item.not_after }}"
+  loop: "{{ query('entrust.crypto.cagw_cert', *serial_numbers, ca_id=cagw_ca_id, **cagw_options) }}"
+  when: item.cert_days is not none and item.cert_days < 30
+'''
+
+RETURN = '''
+_raw:
+    description: The certificate of every serial number of the terms, in their order.
+    type: list
+    elements: dict
+    contains:
+        serial_number:
+            description: The serial number of the certificate, as looked up.
+            type: str
+            sample: 5B9BA13D
+        status:
+            description: The certificate status in CAGW.
+            type: str
+            sample: issued
+        pem:
+            description: The certificate in PEM format, none when CAGW did not return it.
+            type: str
+        validity_period:
+            description: The validity period of the certificate in CAGW.
+            type: str
+            sample: '2024-04-22T09:00:00Z/2025-04-22T09:00:00Z'
+        not_before:
+            description: The start of the validity of the certificate in ISO 8601 format, none when unknown.
+            type: str
+            sample: '2024-04-22T09:00:00+00:00'
+        not_after:
+            description: The expiry of the certificate in ISO 8601 format, none when unknown.
+            type: str
+            sample: '2025-04-22T09:00:00+00:00'
+        cert_days:
+            description: The number of days the certificate remains valid from now, none when its expiry is unknown.
+            type: int
+            sample: 12
+'''
+
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from ansible import constants as C
+from ansible.errors import AnsibleLookupError
+from ansible.module_utils._text import to_native
+from ansible.plugins.lookup import LookupBase
+
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.api import (
+    cagw_client_argument_spec,
+    cagw_client_kwargs,
+    cagw_gateway_kwargs,
+    CAGWClient,
+    SessionConfigurationException,
+)
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.certificate import validity_bounds
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.concurrency import run_concurrently
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.files import AtomicFile
+
+# Warm API clients of this worker process, shared by the lookups of a task and of its loop items
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+# Certificates this worker process looked up, by cache key, along with when they were fetched
+_MEMO = {}
+
+# Characters of a line of the base64 of a PEM certificate
+PEM_LINE_LENGTH = 64
+
+
+def get_client(client_kwargs):
+    # The endpoints are a list, which cannot be a key of a dict
+    key = json.dumps(client_kwargs, sort_keys=True)
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(key)
+        if client is None:
+            client = _CLIENTS[key] = CAGWClient(**client_kwargs)
+    return client
+
+
+def cache_key(client_kwargs, ca_id, serial_number):
+    """Name of the certificate serial_number of ca_id in the cache, per gateway and client certificate"""
+    content = json.dumps([client_kwargs['endpoints'], client_kwargs['cagw_api_cert'], ca_id, serial_number])
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def certificate_pem(certificate_data):
+    """The PEM of certificateData, the base64 of the DER certificate returned by CAGW"""
+    body = ''.join(certificate_data.split())
+    lines = [body[offset:offset + PEM_LINE_LENGTH] for offset in range(0, len(body), PEM_LINE_LENGTH)]
+    return '-----BEGIN CERTIFICATE-----\n{0}\n-----END CERTIFICATE-----\n'.format('\n'.join(lines))
+
+
+def certificate_result(serial_number, certificate):
+    """What the lookup returns of the certificate of a GetCertificate response"""
+    not_before, not_after = validity_bounds(certificate.get('validityPeriod'))
+    return dict(
+        serial_number=serial_number,
+        status=certificate.get('status'),
+        pem=certificate_pem(certificate['certificateData']) if certificate.get('certificateData') else None,
+        validity_period=certificate.get('validityPeriod'),
+        not_before=not_before.isoformat() if not_before is not None else None,
+        not_after=not_after.isoformat() if not_after is not None else None,
+        cert_days=(not_after - datetime.now(timezone.utc)).days if not_after is not None else None,
+    )
+
+
+class CertificateCache(object):
+    """ Certificates fetched by the workers of a run, a JSON file per certificate along with a lock file.
+
+    The lock of a certificate is held while it is fetched, a worker looking it up at the same time waits for
+    the response and reads it from the cache rather than sending the same request.
+    """
+
+    def __init__(self, cache_dir, ttl):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, "cert-{0}.json".format(key))
+
+    def _read(self, path):
+        try:
+            with open(path, "r") as f:
+                cached = json.load(f)
+            if time.time() - cached["fetched"] < self.ttl:
+                return cached["certificate"]
+        except (IOError, OSError, ValueError, TypeError, KeyError):
+            pass
+        return None
+
+    def _write(self, path, certificate):
+        content = json.dumps(dict(fetched=time.time(), certificate=certificate), sort_keys=True)
+        try:
+            with AtomicFile(path, mode=0o600) as f:
+                f.write(content.encode('utf-8'))
+                f.commit()
+        except (IOError, OSError):
+            # Only a cache, the next lookup sends its request again
+            pass
+
+    def get(self, key, fetch):
+        """The certificate of key from the cache, or from fetch() by a single worker at a time"""
+        path = self._entry_path(key)
+        certificate = self._read(path)
+        if certificate is not None:
+            return certificate
+        try:
+            os.makedirs(self.cache_dir, 0o700, exist_ok=True)
+            fd = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        except OSError:
+            # A directory we cannot write to costs a request per lookup
+            return fetch()
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            # Another worker may have fetched it while this one waited for the lock
+            certificate = self._read(path)
+            if certificate is None:
+                certificate = fetch()
+                self._write(path, certificate)
+            return certificate
+        finally:
+            os.close(fd)
+
+
+class LookupModule(LookupBase):
+
+    def run(self, terms, variables=None, **kwargs):
+        self.set_options(var_options=variables, direct=kwargs)
+        params = dict((name, self.get_option(name)) for name in cagw_client_argument_spec())
+        params.update(host=self.get_option('host'), port=self.get_option('port'))
+        try:
+            client_kwargs = cagw_client_kwargs(params)
+            gateway_kwargs = cagw_gateway_kwargs(params)
+        except SessionConfigurationException as e:
+            raise AnsibleLookupError(to_native(e))
+        ca_id = self.get_option('ca_id')
+        validate_certs = self.get_option('validate_certs')
+        ttl = self.get_option('ttl')
+        cache = None
+        if ttl > 0:
+            cache = CertificateCache(self.get_option('cache_dir') or os.path.join(C.DEFAULT_LOCAL_TMP, 'cagw_cert'), ttl)
+
+        def fetch(serial_number):
+            result = get_client(client_kwargs).GetCertificate(ca_id=ca_id, serial_no=serial_number, validate_certs=validate_certs,
+                                                              **gateway_kwargs)
+            return result.get('certificate') or {}
+
+        def lookup(serial_number):
+            if cache is None:
+                return fetch(serial_number)
+            key = cache_key(client_kwargs, ca_id, serial_number)
+            memo = _MEMO.get(key)
+            if memo is not None and time.monotonic() - memo[0] < ttl:
+                return memo[1]
+            certificate = cache.get(key, lambda: fetch(serial_number))
+            _MEMO[key] = time.monotonic(), certificate
+            return certificate
+
+        serial_numbers = [to_native(term).strip() for term in terms]
+        if not all(serial_numbers):
+            raise AnsibleLookupError('The serial numbers of the certificates must not be empty.')
+        # A serial number listed twice is only looked up once
+        distinct = list(dict.fromkeys(serial_numbers))
+        outcomes = dict(zip(distinct, run_concurrently(lookup, distinct, self.get_option('workers'))))
+        results = []
+        for serial_number in serial_numbers:
+            certificate, error = outcomes[serial_number]
+            if error is not None:
+                raise AnsibleLookupError('Failed to look up the certificate {0} from Entrust (CAGW): {1}'.format(
+                    serial_number, to_native(error) or type(error).__name__))
+            results.append(certificate_result(serial_number, certificate))
+        return results
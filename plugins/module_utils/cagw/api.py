@@ -9,50 +9,101 @@ from __future__ import absolute_import, division, print_function
 
 __metaclass__ = type
 
+import functools
+import hashlib
 import json
 import os
+import queue
 import re
-import traceback
+import threading
+import time
 
 from ansible.module_utils._text import to_text, to_native
-from ansible.module_utils.basic import missing_required_lib
-from ansible.module_utils.six.moves.urllib.parse import urlencode
-from ansible.module_utils.six.moves.urllib.error import HTTPError
-from ansible.module_utils.urls import Request
-
-YAML_IMP_ERR = None
-try:
-    import yaml
-except ImportError:
-    YAML_FOUND = False
-    YAML_IMP_ERR = traceback.format_exc()
-else:
-    YAML_FOUND = True
+from ansible.module_utils.six.moves.urllib.parse import urlencode, urlsplit, urlunsplit
+
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.connection import AsyncConnectionPool, ConnectionPool
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.endpoints import EndpointBalancer, format_endpoint, parse_endpoints
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.exceptions import (  # noqa: F401, pylint: disable=unused-import
+    CircuitOpenException,
+    RequestValidationException,
+    RestOperationException,
+    SessionConfigurationException,
+)
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.generated_client import (
+    GeneratedOperations,
+    SPEC as GENERATED_SPEC,
+    SPEC_SHA256 as GENERATED_SPEC_SHA256,
+)
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.profiling import JsonlTraceWriter
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.retry import (
+    CircuitBreaker,
+    CONNECT_ERRORS,
+    CONNECTION_ERRORS,
+    GATEWAY_FAILURE_STATUSES,
+    parse_retry_after,
+    RetryPolicy,
+    TRIAL,
+)
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.schema import compile_parameters
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.spec import (  # noqa: F401, pylint: disable=unused-import
+    YAML_FOUND,
+    YAML_IMP_ERR,
+    load_spec,
+)
 
 valid_file_format = re.compile(r".*(\.)(yml|yaml|json)$")
 
+# Query parameter selecting a page of a listing operation, and key of the response giving the index of the next page
+PAGE_INDEX_PARAMETER = "pageIndex"
+NEXT_PAGE_INDEX = "nextPageIndex"
+
 
 def cagw_client_argument_spec():
     return dict(
         cagw_api_client_cert_path=dict(type='path', required=True),
         cagw_api_client_cert_key_path=dict(type='path', required=True, no_log=True),
-        cagw_api_specification_path=dict(type='path', required=True),
+        cagw_api_specification_path=dict(type='path'),
+        cagw_api_specification_cache_dir=dict(type='path', default='~/.ansible/cagw'),
+        cagw_api_retries=dict(type='int', default=3),
+        cagw_api_retry_backoff=dict(type='float', default=0.5),
+        cagw_api_circuit_breaker_threshold=dict(type='int', default=5),
+        cagw_api_trace_path=dict(type='path'),
+        cagw_api_validate_requests=dict(type='bool', default=True),
+        cagw_api_connect_timeout=dict(type='float', default=10),
+        cagw_api_read_timeout=dict(type='float', default=120),
+        cagw_api_hedge_delay=dict(type='float'),
     )
 
 
-class SessionConfigurationException(Exception):
-    """ Raised if we cannot configure a session with the API """
-
-    pass
+def cagw_client_kwargs(params):
+    """Arguments of CAGWClient and AsyncCAGWClient from the options of cagw_client_argument_spec(), and the endpoints of the host option"""
+    endpoints = None
+    if params.get('host'):
+        endpoints = [format_endpoint(host, port) for host, port in parse_endpoints(params['host'], params['port'])]
+    return dict(
+        cagw_api_cert=params['cagw_api_client_cert_path'],
+        cagw_api_cert_key=params['cagw_api_client_cert_key_path'],
+        cagw_api_specification_path=params['cagw_api_specification_path'],
+        cagw_api_specification_cache_dir=params['cagw_api_specification_cache_dir'],
+        max_retries=params['cagw_api_retries'],
+        retry_backoff=params['cagw_api_retry_backoff'],
+        circuit_breaker_threshold=params['cagw_api_circuit_breaker_threshold'],
+        trace_path=params['cagw_api_trace_path'],
+        validate_requests=params['cagw_api_validate_requests'],
+        endpoints=endpoints,
+        connect_timeout=params['cagw_api_connect_timeout'],
+        read_timeout=params['cagw_api_read_timeout'],
+        hedge_delay=params['cagw_api_hedge_delay'],
+    )
 
 
-class RestOperationException(Exception):
-    """ Encapsulate a REST API error """
+def cagw_gateway_kwargs(params):
+    """host and port of the operations called by a module, those of the first endpoint of its host option.
 
-    def __init__(self, error):
-        self.status = to_native(error.get("status", None))
-        self.errors = [to_native(err.get("message")) for err in error.get("errors", {})]
-        self.message = to_native(" ".join(self.errors))
+    A client created from cagw_client_kwargs() of the same options routes them to the healthiest of the endpoints.
+    """
+    host, port = parse_endpoints(params['host'], params['port'])[0]
+    return dict(host=host, port=port)
 
 
 def generate_docstring(operation_spec):
@@ -76,87 +127,171 @@ def generate_docstring(operation_spec):
     return docs
 
 
-def bind(instance, method, operation_spec):
-    def binding_scope_fn(*args, **kwargs):
-        return method(instance, *args, **kwargs)
+def response_header(response, name):
+    """Return a header of a response of CAGWSession.open, which may also be an HTTPError"""
+    getheader = getattr(response, "getheader", None)
+    if getheader is None:
+        return response.headers.get(name)
+    return getheader(name)
 
-    # Make sure we don't confuse users; add the proper name and documentation to the function.
-    # Users can use !help(<function>) to get help on the function from interactive python or pdb
-    operation_name = operation_spec.get("operationId").split("Using")[0]
-    binding_scope_fn.__name__ = str(operation_name)
-    binding_scope_fn.__doc__ = generate_docstring(operation_spec)
 
-    return binding_scope_fn
+class OperationDescriptor(object):
+    """ An operation of the spec, compiled once per session so calls do not have to re-read the spec. """
 
+    __slots__ = ("name", "method", "uri", "scheme", "url_template", "path_params", "query_params", "body_params", "operation_spec",
+                 "_validator")
 
-class RestOperation(object):
-    def __init__(self, session, uri, method, parameters=None):
-        self.session = session
+    def __init__(self, spec, uri, method, operation_spec, name):
+        self.name = name
         self.method = method
         self.uri = uri
-        if parameters is None:
-            self.parameters = {}
-        else:
-            self.parameters = parameters
-        self.url = "{scheme}://{host}:{port}{base_path}{uri}".format(scheme=session._spec.get("schemes")[0],
-                                                                     host=("example.com"),
-                                                                     port=("443"),
-                                                                     base_path=session._spec.get("basePath"), uri=uri)
+        self.scheme = spec.get("schemes")[0]
+        # Only the path parameters are substituted per call, scheme and basePath are fixed for the spec
+        self.url_template = "{0}{1}".format(spec.get("basePath"), uri)
+        self.operation_spec = operation_spec
+
+        path_params = []
+        query_params = []
+        body_params = []
+        for parameter in operation_spec.get("parameters") or []:
+            key_name = parameter.get("name", None)
+            if not key_name:
+                continue
+            expected_location = parameter.get("in")
+            if expected_location == "path":
+                path_params.append(key_name)
+            elif expected_location == "query":
+                query_params.append(key_name)
+            elif expected_location == "body":
+                body_params.append(key_name)
+        self.path_params = tuple(path_params)
+        self.query_params = tuple(query_params)
+        self.body_params = tuple(body_params)
+        self._validator = None
+
+    def validate(self, kwargs):
+        """Raise a RequestValidationException when the arguments of a call do not match the parameters of the operation.
+
+        The schemas are compiled on the first call, so that the operations a client never calls cost nothing.
+        """
+        if self._validator is None:
+            self._validator = compile_parameters(self.operation_spec)
+        errors = self._validator(kwargs)
+        if errors:
+            raise RequestValidationException(self.name, errors)
+
+
+def operation_name_for(url, method, operation_spec):
+    """Return the operationId of an operation, deriving one from the method and url when the spec has none"""
+    operation_name = operation_spec.get("operationId", None)
+    if operation_name:
+        return operation_name
+
+    if method.lower() == "post":
+        operation_name = "Create"
+    elif method.lower() == "get":
+        operation_name = "Get"
+    elif method.lower() == "put":
+        operation_name = "Update"
+    elif method.lower() == "delete":
+        operation_name = "Delete"
+    elif method.lower() == "patch":
+        operation_name = "Patch"
+    else:
+        raise SessionConfigurationException(to_native("Invalid REST method type {0}".format(method)))
+
+    # Get the non-parameter parts of the URL and append to the operation name
+    # e.g  /application/version -> GetApplicationVersion
+    # e.g. /application/{id}    -> GetApplication
+    # This may lead to duplicates, which we must prevent.
+    operation_name += re.sub(r"{(.*)}", "", url).replace("/", " ").title().replace(" ", "")
+    return operation_name
+
+
+def compile_operations(spec):
+    """Build the table of OperationDescriptor for every path and method of the spec, keyed by operation name"""
+    operations = {}
+    for url, methods in spec.get("paths").items():
+        for method, operation_spec in methods.items():
+            operation_name = operation_name_for(url, method, operation_spec)
+            operations[operation_name] = OperationDescriptor(spec, url, method, operation_spec, operation_name)
+    return operations
+
+
+class BoundOperation(object):
+    """ Callable returned for an operation of a Resource.
+
+    Users can use !help(<function>) to get help on the function from interactive python or pdb,
+    the docstring is generated from the spec only when it is asked for.
+    """
+
+    __slots__ = ("_method", "_descriptor")
+
+    def __init__(self, method, descriptor):
+        self._method = method
+        self._descriptor = descriptor
+
+    def __call__(self, *args, **kwargs):
+        return self._method(*args, **kwargs)
+
+    @property
+    def __name__(self):
+        return str(self._descriptor.name.split("Using")[0])
+
+    @property
+    def __doc__(self):
+        return generate_docstring(self._descriptor.operation_spec)
 
-    def restmethod(self, *args, **kwargs):
-        """Do the hard work of making the request here"""
+
+class RestOperation(object):
+    def __init__(self, session, descriptor):
+        self.session = session
+        self.descriptor = descriptor
+        self.method = descriptor.method
+        self.uri = descriptor.uri
+
+    def build_request(self, **kwargs):
+        """Return the url, JSON body (or None) and validate_certs of a call of the operation
+
+        Unless the session was configured not to, the arguments are checked against the spec first, so that a request
+        the gateway would reject fails without a round trip.
+        """
+        descriptor = self.descriptor
+        if self.session.validate_requests:
+            descriptor.validate(kwargs)
         validate_certs_val = kwargs.get("validate_certs", True)
         host = kwargs.get("host", None)
         port = kwargs.get("port", None)
-        url = "{scheme}://{host}:{port}{base_path}{uri}".format(scheme=self.session._spec.get("schemes")[0],
-                                                                host=host, port=port,
-                                                                base_path=self.session._spec.get("basePath"),
-                                                                uri=self.uri)
+
         # gather named path parameters and do substitution on the URL
-        if self.parameters:
-            path_parameters = {}
-            body_parameters = {}
-            query_parameters = {}
-            for x in self.parameters:
-                expected_location = x.get("in")
-                key_name = x.get("name", None)
-                key_value = kwargs.get(key_name, None)
-                if expected_location == "path" and key_name and key_value:
-                    path_parameters.update({key_name: key_value})
-                elif expected_location == "body" and key_name and key_value:
-                    body_parameters.update({key_name: key_value})
-                elif expected_location == "query" and key_name and key_value:
-                    query_parameters.update({key_name: key_value})
-
-            if len(body_parameters.keys()) >= 1:
-                body_parameters = body_parameters.get(list(body_parameters.keys())[0])
-            else:
-                body_parameters = None
-        else:
-            path_parameters = {}
-            query_parameters = {}
-            body_parameters = None
+        path_parameters = {}
+        for key_name in descriptor.path_params:
+            key_value = kwargs.get(key_name, None)
+            if key_value:
+                path_parameters[key_name] = key_value
+        query_parameters = {}
+        for key_name in descriptor.query_params:
+            key_value = kwargs.get(key_name, None)
+            # Unlike a path parameter, 0 is a valid value, e.g. of a page index
+            if key_value is not None and key_value != "":
+                query_parameters[key_name] = key_value
+        body_parameters = None
+        for key_name in descriptor.body_params:
+            body_parameters = kwargs.get(key_name, None)
+            if body_parameters:
+                break
 
         # This will fail if we have not set path parameters with a KeyError
-        url = url.format(**path_parameters)
+        url = "{0}://{1}:{2}{3}".format(descriptor.scheme, host, port, descriptor.url_template.format(**path_parameters))
         if query_parameters:
             # modify the URL to add query parameters
             url = url + "?" + urlencode(query_parameters)
 
-        try:
-            if body_parameters:
-                body_parameters_json = json.dumps(body_parameters)
-                response = self.session.request.open(method=self.method, url=url, data=body_parameters_json, validate_certs=validate_certs_val)
-            else:
-                response = self.session.request.open(method=self.method, url=url, validate_certs=validate_certs_val)
-                request_error = False
-        except HTTPError as e:
-            # An HTTPError has the same methods available as a valid response from request.open
-            response = e
-            request_error = True
-
-        # Return the result if JSON and success ({} for empty responses)
-        # Raise an exception if there was a failure.
+        data = json.dumps(body_parameters) if body_parameters else None
+        return url, data, validate_certs_val
+
+    def parse_response(self, response):
+        """Return the result if JSON and success ({} for empty responses), raise a RestOperationException for a failure"""
         try:
             result_code = response.getcode()
             result = json.loads(response.read())
@@ -172,66 +307,244 @@ class RestOperation(object):
         # Raise a generic RestOperationException if this fails
         raise RestOperationException({"status": result_code, "errors": [{"message": "REST Operation Failed"}]})
 
+    def complete(self, response, url, data, attempt, started, profiler):
+        """Parse the final response of a call, recording the attempt"""
+        received = time.monotonic()
+        try:
+            return self.parse_response(response)
+        finally:
+            self.record(url, data, attempt, started, profiler, response=response, received=received)
+
+    def record(self, url, data, attempt, started, profiler, response=None, error=None, received=None):
+        """Report an attempt to the profiler of the call and to the trace hooks of the session"""
+        if profiler is None and not self.session.trace_hooks:
+            return
+        now = time.monotonic()
+        body = getattr(response, "body", None)
+        record = dict(
+            time=round(time.time() - (now - started), 6),
+            operation=self.descriptor.name,
+            method=self.method.upper(),
+            # The endpoint the session routed the request to
+            host=getattr(response, "endpoint_host", None) or getattr(error, "endpoint_host", None) or urlsplit(url).hostname,
+            status=response.getcode() if response is not None else None,
+            error=type(error).__name__ if error is not None else None,
+            attempt=attempt,
+            request_bytes=len(data) if data else 0,
+            response_bytes=len(body) if body is not None else None,
+            connect=getattr(response, "connect_time", 0.0),
+            response_parse=now - received if received is not None else 0.0,
+            duration=now - started,
+        )
+        if profiler is not None:
+            profiler.add_call(record)
+        self.session.trace(record)
+
+    def restmethod(self, *args, **kwargs):
+        """Do the hard work of making the request here
+
+        A Profiler passed as profiler is charged with the time of every attempt.
+        """
+        profiler = kwargs.pop("profiler", None)
+        url, data, validate_certs = self.build_request(**kwargs)
+        return self.send(url, data, validate_certs, profiler)
+
+    def send(self, url, data, validate_certs, profiler=None):
+        """Send a request built by build_request, or by a method of GeneratedOperations, retrying it as the session says"""
+        attempt = 0
+        while True:
+            trial = self.session.before_request()
+            started = time.monotonic()
+            try:
+                response = self.session.open(self.method, url, data=data, validate_certs=validate_certs)
+            except Exception as e:
+                self.record(url, data, attempt, started, profiler, error=e)
+                delay = self.session.retry_delay(self.descriptor, attempt, error=e)
+                if delay is None:
+                    raise
+            else:
+                delay = self.session.retry_delay(self.descriptor, attempt, response=response)
+                if delay is None:
+                    return self.complete(response, url, data, attempt, started, profiler)
+                self.record(url, data, attempt, started, profiler, response=response)
+            finally:
+                if trial:
+                    # Whatever the trial raised, e.g. an HTTPError or a cancellation, it must not hold the circuit half open
+                    self.session.circuit_breaker.resolve_trial()
+            attempt += 1
+            time.sleep(delay)
+            if profiler is not None:
+                profiler.add("retry_wait", delay)
+
+
+class AsyncRestOperation(RestOperation):
+    async def restmethod(self, *args, **kwargs):  # pylint: disable=invalid-overridden-method
+        """Coroutine making the request on the event loop of the caller"""
+        profiler = kwargs.pop("profiler", None)
+        url, data, validate_certs = self.build_request(**kwargs)
+        return await self.send(url, data, validate_certs, profiler)
+
+    async def send(self, url, data, validate_certs, profiler=None):  # pylint: disable=invalid-overridden-method
+        """Coroutine sending a request built by build_request, or by a method of GeneratedOperations"""
+        import asyncio
+
+        attempt = 0
+        while True:
+            trial = self.session.before_request()
+            started = time.monotonic()
+            try:
+                response = await self.session.open(self.method, url, data=data, validate_certs=validate_certs)
+            except Exception as e:
+                self.record(url, data, attempt, started, profiler, error=e)
+                delay = self.session.retry_delay(self.descriptor, attempt, error=e)
+                if delay is None:
+                    raise
+            else:
+                delay = self.session.retry_delay(self.descriptor, attempt, response=response)
+                if delay is None:
+                    return self.complete(response, url, data, attempt, started, profiler)
+                self.record(url, data, attempt, started, profiler, response=response)
+            finally:
+                if trial:
+                    # Whatever the trial raised, e.g. an HTTPError or a cancellation, it must not hold the circuit half open
+                    self.session.circuit_breaker.resolve_trial()
+            attempt += 1
+            await asyncio.sleep(delay)
+            if profiler is not None:
+                profiler.add("retry_wait", delay)
+
 
 class Resource(object):
-    """ Implement basic CRUD operations against a path. """
+    """ Implement basic CRUD operations against a path.
+
+    Operations of the spec are bound lazily on first attribute access, so a client only pays for the operations it calls.
+    """
+
+    operation_class = RestOperation
 
     def __init__(self, session):
         self.session = session
         self.parameters = {}
 
-        for url in session._spec.get("paths").keys():
-            methods = session._spec.get("paths").get(url)
-            for method in methods.keys():
-                operation_spec = methods.get(method)
-                operation_name = operation_spec.get("operationId", None)
-                parameters = operation_spec.get("parameters")
-
-                if not operation_name:
-                    if method.lower() == "post":
-                        operation_name = "Create"
-                    elif method.lower() == "get":
-                        operation_name = "Get"
-                    elif method.lower() == "put":
-                        operation_name = "Update"
-                    elif method.lower() == "delete":
-                        operation_name = "Delete"
-                    elif method.lower() == "patch":
-                        operation_name = "Patch"
-                    else:
-                        raise SessionConfigurationException(to_native("Invalid REST method type {0}".format(method)))
-
-                    # Get the non-parameter parts of the URL and append to the operation name
-                    # e.g  /application/version -> GetApplicationVersion
-                    # e.g. /application/{id}    -> GetApplication
-                    # This may lead to duplicates, which we must prevent.
-                    operation_name += re.sub(r"{(.*)}", "", url).replace("/", " ").title().replace(" ", "")
-                    operation_spec["operationId"] = operation_name
-
-                op = RestOperation(session, url, method, parameters)
-                setattr(self, operation_name, bind(self, op.restmethod, operation_spec))
-
-
-# Session to encapsulate the connection parameters of the module_utils Request object, the api spec, etc
+    def __getattr__(self, name):
+        # Only called when normal lookup fails, i.e. for operations which are not bound yet
+        if name.startswith("__") or "session" not in self.__dict__:
+            raise AttributeError(name)
+        descriptor = self.session.operations.get(name)
+        if descriptor is None:
+            raise AttributeError("{0} object has no operation {1}".format(type(self).__name__, name))
+        operation = BoundOperation(self.operation_class(self.session, descriptor).restmethod, descriptor)
+        setattr(self, name, operation)
+        return operation
+
+    def __dir__(self):
+        return sorted(set(dir(type(self))) | set(self.__dict__) | set(self.session.operations))
+
+    def pages(self, operation, **kwargs):
+        """Yield every page of a listing operation called with kwargs, e.g. GetCertificateEvents, on a synchronous client.
+
+        A page is only requested once the previous one was consumed, and the next one while the gateway gives a nextPageIndex.
+        """
+        call = getattr(self, operation)
+        while True:
+            page = call(**kwargs)
+            yield page
+            next_index = page.get(NEXT_PAGE_INDEX)
+            # A gateway repeating the index would make this loop forever
+            if next_index is None or next_index == "" or next_index == kwargs.get(PAGE_INDEX_PARAMETER):
+                return
+            kwargs[PAGE_INDEX_PARAMETER] = next_index
+
+    def paginate(self, operation, items, **kwargs):
+        """Yield the elements of the list items of every page of operation, see pages"""
+        for page in self.pages(operation, **kwargs):
+            yield from page.get(items) or []
+
+
+class AsyncResource(Resource):
+    """ Resource whose operations are coroutines, e.g. await client.GetCertificate(...) """
+
+    operation_class = AsyncRestOperation
+
+
+class GeneratedResource(GeneratedOperations, Resource):
+    """ Resource of the bundled specification, whose operations are the methods generated from it.
+
+    Unlike those bound by Resource, they format their URL from a template built once by tools/generate_cagw_client.py,
+    and need neither PyYAML nor the specification file. Operations the methods do not cover are still bound from the spec.
+    """
+
+    def __init__(self, session):
+        super(GeneratedResource, self).__init__(session)
+        self._rest_operations = {}
+
+    def _check(self, name, arguments):
+        if self.session.validate_requests:
+            self.session.operations[name].validate(arguments)
+
+    def _send(self, name, url, data, validate_certs, profiler):
+        operation = self._rest_operations.get(name)
+        if operation is None:
+            operation = self._rest_operations[name] = self.operation_class(self.session, self.session.operations[name])
+        return operation.send(url, data, validate_certs, profiler)
+
+
+class AsyncGeneratedResource(GeneratedResource):
+    """ GeneratedResource whose operations are coroutines """
+
+    operation_class = AsyncRestOperation
+
+
+def uses_generated_client(location):
+    """Whether the specification at location is the one GeneratedOperations was generated from, as is the default one (None)"""
+    if location is None:
+        return True
+    if location.startswith("http"):
+        return False
+    try:
+        with open(location, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest() == GENERATED_SPEC_SHA256
+    except (IOError, OSError):
+        # Reported by the checks of the dynamic specification
+        return False
+
+
+# Session to encapsulate the connection pool, the api spec, etc
 class CAGWSession(object):
+    resource_class = Resource
+    generated_resource_class = GeneratedResource
+
     def __init__(self, name, **kwargs):
         """
         Initialize our session
         """
 
+        started = time.monotonic()
+        self.setup_timings = dict(spec_load=0.0)
         self._set_config(name, **kwargs)
+        self.setup_timings["client_build"] = time.monotonic() - started - self.setup_timings["spec_load"]
 
     def client(self):
-        resource = Resource(self)
+        started = time.monotonic()
+        resource = (self.generated_resource_class if self.generated else self.resource_class)(self)
+        self.setup_timings["client_build"] = self.setup_timings.get("client_build", 0.0) + time.monotonic() - started
         return resource
 
+    def pop_setup_timings(self):
+        """Return the time spent building the session, then zeros, so that only its first request is charged with it"""
+        timings, self.setup_timings = self.setup_timings, {}
+        return timings
+
+    def trace(self, record):
+        for hook in self.trace_hooks:
+            hook(record)
+
     def _set_config(self, name, **kwargs):
         headers = {
             "Content-Type": "application/json",
             "Connection": "keep-alive",
+            "User-Agent": "ansible-httpget",
         }
-        self.request = Request(headers=headers, timeout=120)
-
         configurators = [self._read_config_vars]
         for configurator in configurators:
             self._config = configurator(name, **kwargs)
@@ -243,42 +556,192 @@ class CAGWSession(object):
         # set up client certificate if passed (support all-in one or cert + key)
         cagw_api_cert = self.get_config("cagw_api_cert")
         cagw_api_cert_key = self.get_config("cagw_api_cert_key")
-        if cagw_api_cert:
-            self.request.client_cert = cagw_api_cert
-            if cagw_api_cert_key:
-                self.request.client_key = cagw_api_cert_key
-        else:
+        if not cagw_api_cert:
             raise SessionConfigurationException(to_native("Client certificate for authentication to the API must be provided."))
+        # Connections, the SSLContext and TLS sessions are reused by all the operations of the session
+        self.pool = self._create_pool(cagw_api_cert, cagw_api_cert_key, headers)
 
-        # set up the spec
+        # set up the spec, the bundled one is served by the generated client without being read again
         cagw_api_specification_path = self.get_config("cagw_api_specification_path")
+        started = time.monotonic()
+        self.generated = uses_generated_client(cagw_api_specification_path)
 
-        if not cagw_api_specification_path.startswith("http") and not os.path.isfile(cagw_api_specification_path):
-            raise SessionConfigurationException(to_native("OpenAPI specification was not found at location {0}.".format(cagw_api_specification_path)))
-        if not valid_file_format.match(cagw_api_specification_path):
-            raise SessionConfigurationException(to_native("OpenAPI specification filename must end in .json, .yml or .yaml"))
+        if not self.generated:
+            if not cagw_api_specification_path.startswith("http") and not os.path.isfile(cagw_api_specification_path):
+                raise SessionConfigurationException(to_native("OpenAPI specification was not found at location {0}.".format(cagw_api_specification_path)))
+            if not valid_file_format.match(cagw_api_specification_path):
+                raise SessionConfigurationException(to_native("OpenAPI specification filename must end in .json, .yml or .yaml"))
 
         self.verify = True
+        self.validate_requests = self.get_config("validate_requests")
 
-        if cagw_api_specification_path.startswith("http"):
+        if self.generated:
+            self._spec = GENERATED_SPEC
+        else:
+            self._spec = load_spec(cagw_api_specification_path, cache_dir=self.get_config("cagw_api_specification_cache_dir"))
+        self.operations = compile_operations(self._spec)
+        self.setup_timings["spec_load"] = time.monotonic() - started
+
+        # Callables receiving a dict describing every attempt of a REST call, see RestOperation.record
+        self.trace_hooks = list(self.get_config("trace_hooks") or [])
+        if self.get_config("trace_path"):
             try:
-                http_response = Request().open(method="GET", url=cagw_api_specification_path)
-                http_response_contents = http_response.read()
-                if cagw_api_specification_path.endswith(".json"):
-                    self._spec = json.load(http_response_contents)
-                elif cagw_api_specification_path.endswith(".yml") or cagw_api_specification_path.endswith(".yaml"):
-                    self._spec = yaml.safe_load(http_response_contents)
-            except HTTPError as e:
-                raise SessionConfigurationException(to_native("Error downloading specification from address '{0}', received error code '{1}'".format(
-                    cagw_api_specification_path, e.getcode())))
+                self.trace_hooks.append(JsonlTraceWriter(self.get_config("trace_path")))
+            except OSError as e:
+                raise SessionConfigurationException(to_native("Cannot write the trace to {0}: {1}".format(self.get_config("trace_path"), e)))
+
+        # Retries of every operation follow its policy, the circuit breaker is shared by all of them
+        self.retries = 0
+        self._retries_lock = threading.Lock()
+        self.retry_policies = {}
+        for name, descriptor in self.operations.items():
+            self.retry_policies[name] = RetryPolicy.for_method(descriptor.method, max_retries=self.get_config("max_retries"),
+                                                               backoff=self.get_config("retry_backoff"))
+        self.retry_policies.update(self.get_config("retry_policies") or {})
+        self.circuit_breaker = CircuitBreaker(failure_threshold=self.get_config("circuit_breaker_threshold"))
+
+        # Requests to one of several endpoints are balanced between them, as are hedged ones even to a single endpoint
+        self.hedge_delay = self.get_config("hedge_delay")
+        endpoints = self.get_config("endpoints")
+        self.balancer = None
+        if endpoints and (len(endpoints) > 1 or self.hedge_delay):
+            self.balancer = EndpointBalancer(parse_endpoints(endpoints))
+
+    def before_request(self):
+        """Fail fast instead of sending a request while the circuit breaker is open, return whether the request is its trial"""
+        allowed = self.circuit_breaker.allow_request()
+        if not allowed:
+            raise CircuitOpenException(self.circuit_breaker.retry_in())
+        return allowed == TRIAL
+
+    def retry_delay(self, descriptor, attempt, response=None, error=None):
+        """Record the outcome of an attempt, return the seconds to wait before sending it again or None if it is final"""
+        policy = self.retry_policies[descriptor.name]
+        if error is not None:
+            if isinstance(error, CONNECTION_ERRORS):
+                self.circuit_breaker.record_failure()
+            if not policy.retry_error(error, attempt):
+                return None
+            delay = policy.delay(attempt)
+        else:
+            status = response.getcode()
+            if status in GATEWAY_FAILURE_STATUSES:
+                self.circuit_breaker.record_failure()
+            else:
+                self.circuit_breaker.record_success()
+            if not policy.retry_status(status, attempt):
+                return None
+            delay = policy.delay(attempt, parse_retry_after(response_header(response, "Retry-After")))
+        with self._retries_lock:
+            self.retries += 1
+        return delay
+
+    def retry_stats(self):
+        stats = dict(retries=self.retries)
+        stats.update(self.circuit_breaker.stats())
+        if self.balancer is not None:
+            stats.update(self.balancer.stats())
+        return stats
+
+    def _create_pool(self, cagw_api_cert, cagw_api_cert_key, headers):
+        return ConnectionPool(cagw_api_cert, cagw_api_cert_key, timeout=self.get_config("read_timeout"), headers=headers,
+                              connect_timeout=self.get_config("connect_timeout"))
+
+    def open(self, method, url, data=None, validate_certs=True):
+        """Send a request to the gateway.
+
+        A request to one of the endpoints of the session goes to the healthiest of them, and to the next one when it
+        cannot connect. With a hedge_delay, a GET is also sent to a second endpoint when the first did not answer in time.
+        """
+        parts = self._route(url)
+        if parts is None:
+            return self._open(method, url, data=data, validate_certs=validate_certs)
+        if self.hedge_delay and method.lower() == "get":
+            return self._open_hedged(method, parts, data, validate_certs)
+        return self._open_failover(method, parts, data, validate_certs)
+
+    def _route(self, url):
+        """The split url when it targets one of the endpoints of the session, None otherwise"""
+        if self.balancer is None:
+            return None
+        parts = urlsplit(url)
+        return parts if (parts.hostname, parts.port or 443) in self.balancer else None
+
+    def _open(self, method, url, data=None, validate_certs=True):
+        """Send a request to url over the connection pool, unless a proxy is configured for its host"""
+        if not ConnectionPool.uses_proxy(urlsplit(url).hostname):
+            return self.pool.request(method, url, data=data, validate_certs=validate_certs)
+        return self.pool.proxy_request(method, url, data=data, validate_certs=validate_certs)
+
+    def _record_endpoint(self, endpoint, started, response=None, error=None):
+        """Update the health of endpoint with the outcome of a request sent to it"""
+        if error is not None:
+            error.endpoint_host = endpoint.host
+            error.endpoint_netloc = endpoint.netloc
+            self.balancer.record_failure(endpoint, started)
+            return
+        response.endpoint_host = endpoint.host
+        if response.getcode() in GATEWAY_FAILURE_STATUSES:
+            self.balancer.record_failure(endpoint, started)
         else:
-            with open(cagw_api_specification_path) as f:
-                if cagw_api_specification_path.endswith(".json"):
-                    self._spec = json.load(f)
-                elif ".yml" in cagw_api_specification_path or ".yaml" in cagw_api_specification_path:
-                    self._spec = yaml.safe_load(f)
-                else:
-                    raise SessionConfigurationException(to_native("OpenAPI specification filename must end in .json, .yml or .yaml"))
+            self.balancer.record_success(endpoint, started)
+
+    def _open_endpoint(self, endpoint, method, parts, data, validate_certs):
+        started = self.balancer.start(endpoint)
+        try:
+            response = self._open(method, urlunsplit(parts._replace(netloc=endpoint.netloc)), data=data, validate_certs=validate_certs)
+        except Exception as e:
+            self._record_endpoint(endpoint, started, error=e)
+            raise
+        self._record_endpoint(endpoint, started, response=response)
+        return response
+
+    def _open_failover(self, method, parts, data, validate_certs, endpoint=None, exclude=()):
+        """Send the request to endpoint, the healthiest one by default, then to the next ones while they cannot connect"""
+        tried = list(exclude)
+        endpoint = endpoint or self.balancer.choose(tried)
+        while True:
+            try:
+                return self._open_endpoint(endpoint, method, parts, data, validate_certs)
+            except CONNECT_ERRORS:
+                # The request never left this host, another endpoint can have it whatever the operation
+                tried.append(endpoint)
+                endpoint = self.balancer.choose(tried)
+                if endpoint is None:
+                    raise
+                self.balancer.record_failover()
+
+    def _open_hedged(self, method, parts, data, validate_certs):
+        """Send a GET to the healthiest endpoint and, when it did not answer within hedge_delay, to the next one as well.
+
+        The first response wins. The other request runs to completion in a daemon thread, for the health of its endpoint only.
+        """
+        results = queue.Queue()
+
+        def send(hedge, endpoint, exclude):
+            try:
+                results.put((hedge, self._open_failover(method, parts, data, validate_certs, endpoint, exclude), None))
+            except Exception as e:
+                results.put((hedge, None, e))
+
+        primary = self.balancer.choose()
+        threading.Thread(target=send, args=(False, primary, ()), daemon=True).start()
+        try:
+            hedge, response, error = results.get(timeout=self.hedge_delay)
+        except queue.Empty:
+            self.balancer.record_hedge()
+            # With a single endpoint, the hedge goes to it over another connection
+            secondary = self.balancer.choose(exclude=(primary,)) or primary
+            threading.Thread(target=send, args=(True, secondary, (primary,)), daemon=True).start()
+            hedge, response, error = results.get()
+            if error is not None:
+                # The other request may still succeed
+                hedge, response, error = results.get()
+            if hedge and error is None:
+                self.balancer.record_hedge(won=True)
+        if error is not None:
+            raise error
+        return response
 
     def get_config(self, item):
         return self._config.get(item, None)
@@ -288,7 +751,9 @@ class CAGWSession(object):
         config = {}
 
         cagw_api_specification_path = kwargs.get("cagw_api_specification_path")
-        if not cagw_api_specification_path or (not cagw_api_specification_path.startswith("http") and not os.path.isfile(cagw_api_specification_path)):
+        # None is the bundled specification
+        if cagw_api_specification_path is not None and (
+                not cagw_api_specification_path.startswith("http") and not os.path.isfile(cagw_api_specification_path)):
             raise SessionConfigurationException(
                 to_native(
                     "Parameter provided for cagw_api_specification_path of value '{0}' was not a valid file path or HTTPS address.".format(
@@ -307,22 +772,176 @@ class CAGWSession(object):
         config["cagw_api_cert"] = kwargs.get("cagw_api_cert")
         config["cagw_api_cert_key"] = kwargs.get("cagw_api_cert_key")
         config["cagw_api_specification_path"] = kwargs.get("cagw_api_specification_path")
+        config["cagw_api_specification_cache_dir"] = kwargs.get("cagw_api_specification_cache_dir")
+        config["max_retries"] = kwargs.get("max_retries", 3)
+        config["retry_backoff"] = kwargs.get("retry_backoff", 0.5)
+        config["retry_policies"] = kwargs.get("retry_policies")
+        config["circuit_breaker_threshold"] = kwargs.get("circuit_breaker_threshold", 5)
+        config["trace_path"] = kwargs.get("trace_path")
+        config["trace_hooks"] = kwargs.get("trace_hooks")
+        config["validate_requests"] = kwargs.get("validate_requests", True)
+        config["endpoints"] = kwargs.get("endpoints")
+        config["connect_timeout"] = kwargs.get("connect_timeout", 10)
+        config["read_timeout"] = kwargs.get("read_timeout", 120)
+        config["hedge_delay"] = kwargs.get("hedge_delay")
 
         return config
 
 
-def CAGWClient(cagw_api_cert=None, cagw_api_cert_key=None, cagw_api_specification_path=None):
-    """Create a CAGW client"""
+class AsyncCAGWSession(CAGWSession):
+    """ Session whose client sends the requests from coroutines, with at most max_concurrency of them in flight """
+
+    resource_class = AsyncResource
+    generated_resource_class = AsyncGeneratedResource
+
+    def __init__(self, name, max_concurrency=64, **kwargs):
+        self.max_concurrency = max_concurrency
+        super(AsyncCAGWSession, self).__init__(name, **kwargs)
 
-    if not YAML_FOUND:
-        raise SessionConfigurationException(missing_required_lib("PyYAML"), exception=YAML_IMP_ERR)
+    def _create_pool(self, cagw_api_cert, cagw_api_cert_key, headers):
+        return AsyncConnectionPool(cagw_api_cert, cagw_api_cert_key, timeout=self.get_config("read_timeout"), headers=headers,
+                                   max_concurrency=self.max_concurrency, connect_timeout=self.get_config("connect_timeout"))
+
+    async def open(self, method, url, data=None, validate_certs=True):  # pylint: disable=invalid-overridden-method
+        """Coroutine sending a request to the gateway, routed as by CAGWSession.open"""
+        parts = self._route(url)
+        if parts is None:
+            return await self._open(method, url, data=data, validate_certs=validate_certs)
+        if self.hedge_delay and method.lower() == "get":
+            return await self._open_hedged(method, parts, data, validate_certs)
+        return await self._open_failover(method, parts, data, validate_certs)
+
+    async def _open(self, method, url, data=None, validate_certs=True):  # pylint: disable=invalid-overridden-method
+        """Send a request to url over the asyncio connection pool, unless a proxy is configured for its host"""
+        if not ConnectionPool.uses_proxy(urlsplit(url).hostname):
+            return await self.pool.request(method, url, data=data, validate_certs=validate_certs)
+        # The stdlib streams cannot talk to a proxy, send these requests from the default executor instead
+        import asyncio
+
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, functools.partial(CAGWSession._open, self, method, url, data=data, validate_certs=validate_certs))
+
+    async def _open_endpoint(self, endpoint, method, parts, data, validate_certs):  # pylint: disable=invalid-overridden-method
+        import asyncio
+
+        started = self.balancer.start(endpoint)
+        try:
+            response = await self._open(method, urlunsplit(parts._replace(netloc=endpoint.netloc)), data=data, validate_certs=validate_certs)
+        except asyncio.CancelledError:
+            # The other request of a hedged GET answered first
+            self.balancer.abandon(endpoint, started)
+            raise
+        except Exception as e:
+            self._record_endpoint(endpoint, started, error=e)
+            raise
+        self._record_endpoint(endpoint, started, response=response)
+        return response
+
+    async def _open_failover(self, method, parts, data, validate_certs, endpoint=None, exclude=()):  # pylint: disable=invalid-overridden-method
+        tried = list(exclude)
+        endpoint = endpoint or self.balancer.choose(tried)
+        while True:
+            try:
+                return await self._open_endpoint(endpoint, method, parts, data, validate_certs)
+            except CONNECT_ERRORS:
+                tried.append(endpoint)
+                endpoint = self.balancer.choose(tried)
+                if endpoint is None:
+                    raise
+                self.balancer.record_failover()
+
+    async def _open_hedged(self, method, parts, data, validate_certs):  # pylint: disable=invalid-overridden-method
+        """As CAGWSession._open_hedged, the request which lost is cancelled instead of running to completion"""
+        import asyncio
+
+        primary = self.balancer.choose()
+        first = asyncio.ensure_future(self._open_failover(method, parts, data, validate_certs, primary))
+        pending = set([first])
+        try:
+            done, pending = await asyncio.wait(pending, timeout=self.hedge_delay)
+            if done:
+                return first.result()
+            self.balancer.record_hedge()
+            secondary = self.balancer.choose(exclude=(primary,)) or primary
+            hedge = asyncio.ensure_future(self._open_failover(method, parts, data, validate_certs, secondary, (primary,)))
+            pending.add(hedge)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.balancer.record_hedge(won=True)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+def CAGWClient(cagw_api_cert=None, cagw_api_cert_key=None, cagw_api_specification_path=None, cagw_api_specification_cache_dir=None,
+               max_retries=3, retry_backoff=0.5, circuit_breaker_threshold=5, retry_policies=None, trace_path=None, trace_hooks=None,
+               validate_requests=True, endpoints=None, connect_timeout=10, read_timeout=120, hedge_delay=None):
+    """Create a CAGW client
+
+    retry_policies maps operation names to a RetryPolicy, replacing the default policy derived from their method.
+    trace_hooks are called with a dict describing every attempt of a REST call, trace_path adds one writing them to a JSONL file.
+    With validate_requests, the arguments of a call are checked against the schemas of the spec before it is sent.
+    The calls to one of endpoints, a list of host or host:port, are routed to the healthiest of them, see EndpointBalancer,
+    and with hedge_delay a GET which got no response after that many seconds is sent to a second endpoint as well.
+    """
 
     cagw_api_cert_key = to_text(cagw_api_cert_key)
-    cagw_api_specification_path = to_text(cagw_api_specification_path)
+    if cagw_api_specification_path is not None:
+        cagw_api_specification_path = to_text(cagw_api_specification_path)
 
     return CAGWSession(
         "cagw",
         cagw_api_cert=cagw_api_cert,
         cagw_api_cert_key=cagw_api_cert_key,
         cagw_api_specification_path=cagw_api_specification_path,
+        cagw_api_specification_cache_dir=cagw_api_specification_cache_dir,
+        max_retries=max_retries,
+        retry_backoff=retry_backoff,
+        circuit_breaker_threshold=circuit_breaker_threshold,
+        retry_policies=retry_policies,
+        trace_path=trace_path,
+        trace_hooks=trace_hooks,
+        validate_requests=validate_requests,
+        endpoints=endpoints,
+        connect_timeout=connect_timeout,
+        read_timeout=read_timeout,
+        hedge_delay=hedge_delay,
+    ).client()
+
+
+def AsyncCAGWClient(cagw_api_cert=None, cagw_api_cert_key=None, cagw_api_specification_path=None, cagw_api_specification_cache_dir=None,
+                    max_concurrency=64, max_retries=3, retry_backoff=0.5, circuit_breaker_threshold=5, retry_policies=None,
+                    trace_path=None, trace_hooks=None, validate_requests=True, endpoints=None, connect_timeout=10, read_timeout=120,
+                    hedge_delay=None):
+    """Create a CAGW client whose operations are coroutines, for many concurrent requests on one event loop"""
+
+    cagw_api_cert_key = to_text(cagw_api_cert_key)
+    if cagw_api_specification_path is not None:
+        cagw_api_specification_path = to_text(cagw_api_specification_path)
+
+    return AsyncCAGWSession(
+        "cagw",
+        max_concurrency=max_concurrency,
+        cagw_api_cert=cagw_api_cert,
+        cagw_api_cert_key=cagw_api_cert_key,
+        cagw_api_specification_path=cagw_api_specification_path,
+        cagw_api_specification_cache_dir=cagw_api_specification_cache_dir,
+        max_retries=max_retries,
+        retry_backoff=retry_backoff,
+        circuit_breaker_threshold=circuit_breaker_threshold,
+        retry_policies=retry_policies,
+        trace_path=trace_path,
+        trace_hooks=trace_hooks,
+        validate_requests=validate_requests,
+        endpoints=endpoints,
+        connect_timeout=connect_timeout,
+        read_timeout=read_timeout,
+        hedge_delay=hedge_delay,
     ).client()
@@ -0,0 +1,745 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c), Entrust Corporation, 2023
+# Author: Sapna Jain, Entrust
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+from datetime import datetime, timedelta, timezone
+import base64
+import binascii
+import hashlib
+import os
+import re
+import time
+
+from ansible.module_utils._text import to_bytes, to_native
+
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.api import (
+    cagw_gateway_kwargs,
+    RestOperationException,
+    SessionConfigurationException,
+)
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.endpoints import format_endpoint
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.files import AtomicFile
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.metadata import read_certificate_metadata
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.persistent import cagw_client_for
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.profiling import Profiler
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.retry import CONNECTION_ERRORS
+
+# The helpers built on cryptography (keygen, pkcs12 and support) are imported by the methods which need them:
+# importing cryptography.x509 is a large part of the start up time of a module, and e.g. an action request never uses it.
+
+# Private keys which can be generated for an X509 enrollment without a CSR, see keygen.generate_private_key
+KEY_TYPES = ('RSA', 'ECC', 'Ed25519')
+CURVES = ('secp256r1', 'secp384r1', 'secp521r1')
+
+# CAGW statuses of a certificate which must be replaced, whatever its expiry
+UNUSABLE_STATUSES = ('expired', 'suspended', 'revoked', 'held')
+
+# Status of a certificate once CAGW completed an action on it, as recorded in the inventory
+ACTION_STATUSES = {
+    'RevokeAction': 'revoked',
+    'HoldAction': 'held',
+    'UnholdAction': 'issued',
+}
+
+PEM_BEGIN_LINE = b"-----BEGIN CERTIFICATE-----\n"
+PEM_END_LINE = b"\n-----END CERTIFICATE-----"
+
+# A date and time of ISO 8601 as in the validityPeriod of CAGW, e.g. 2024-07-06T13:00:00Z or 2024-07-06T13:00:00.000+02:00
+ISO8601_DATETIME = re.compile(r'(\d{4})-(\d{2})-(\d{2})(?:[T ](\d{2}):(\d{2})(?::(\d{2})(?:[.,](\d{1,6})\d*)?)?)?\s*(Z|[+-]\d{2}(?::?\d{2})?)?$',
+                              re.IGNORECASE)
+
+
+def version_tuple(version):
+    """The leading numbers of a version, which compare like the versions do, e.g. (41, 0, 3) for 41.0.3"""
+    return tuple(int(part) for part in re.match(r'\d+(?:\.\d+)*', version).group(0).split('.'))
+
+
+def connection_failure_message(error, params):
+    """Message of a request which got no response from CAGW once its retries ran out, naming the endpoint it went to last"""
+    endpoint = getattr(error, 'endpoint_netloc', None)
+    if endpoint is None:
+        gateway = cagw_gateway_kwargs(params)
+        endpoint = format_endpoint(gateway['host'], gateway['port'])
+    return 'Failed to reach Entrust (CAGW) at {0}: {1}'.format(endpoint, to_native(error) or type(error).__name__)
+
+
+class CagwOperationFailure(Exception):
+    """ Raised by ParamsModule.fail_json, where an AnsibleModule would exit """
+
+    pass
+
+
+class ParamsModule(object):
+    '''
+    Presents a dict of parameters to CagwCertificate where there is no AnsibleModule,
+    e.g. for the items of cagw_certificate_batch or on the controller
+    '''
+    def __init__(self, params, check_mode=False, socket_path=None):
+        self.params = params
+        self.check_mode = check_mode
+        # As AnsibleModule._socket_path, that of the persistent connection the task runs on
+        self._socket_path = socket_path
+
+        self.warnings = []
+
+    def fail_json(self, msg, **kwargs):
+        raise CagwOperationFailure(msg)
+
+    def warn(self, warning):
+        self.warnings.append(warning)
+
+
+def parse_iso8601(value):
+    """Parse an ISO 8601 date and time into an aware datetime, in UTC when it has no offset, None if it is not one"""
+    match = ISO8601_DATETIME.match(value.strip())
+    if not match:
+        return None
+    year, month, day, hour, minute, second, fraction, offset = match.groups()
+    tz = timezone.utc
+    if offset and offset.upper() != 'Z':
+        digits = offset[1:].replace(':', '')
+        delta = timedelta(hours=int(digits[:2]), minutes=int(digits[2:] or 0))
+        tz = timezone(-delta if offset[0] == '-' else delta)
+    try:
+        return datetime(int(year), int(month), int(day), int(hour or 0), int(minute or 0), int(second or 0),
+                        int((fraction or '0').ljust(6, '0')), tzinfo=tz)
+    except ValueError:
+        return None
+
+
+def calculate_cert_days(validityPeriod):
+    """Days until the end of validityPeriod, None when its end is not a date and time, e.g. a duration"""
+    if not validityPeriod:
+        return None
+    expiry = validityPeriod.split("/")
+    expiresAfter = expiry[-1]
+    cert_days = 0
+    if expiresAfter:
+        expires_after_datetime = parse_iso8601(expiresAfter)
+        if expires_after_datetime is None:
+            return None
+        cert_days = (expires_after_datetime - datetime.now(timezone.utc)).days
+    return cert_days
+
+
+def validity_bounds(validityPeriod):
+    """The (start, end) of validityPeriod as aware datetimes, None for a bound which is not a date and time"""
+    bounds = (validityPeriod or '').split('/')
+    if len(bounds) != 2:
+        return None, None
+    return parse_iso8601(bounds[0]), parse_iso8601(bounds[1])
+
+
+def jitter_fraction(seed):
+    """A number in [0, 1) derived from seed, the same on every run and every host"""
+    return int(hashlib.sha256(to_bytes(seed)).hexdigest()[:15], 16) / float(16 ** 15)
+
+
+def renewal_date(not_before, not_after, remaining_days, window=None, jitter=0.0, seed=None):
+    """When a certificate valid from not_before until not_after is due for renewal.
+
+    That is remaining_days before not_after or, with window, once less than that fraction of its lifetime is left.
+    With jitter, the date moves earlier by up to that fraction of its lifetime, by an amount derived from seed: certificates
+    issued together, e.g. by a rollout, are then renewed over a period rather than all on the same day.
+    The lifetime is only known with not_before, without it neither window nor jitter apply.
+    """
+    lifetime = not_after - not_before if not_before is not None else None
+    if window is not None and lifetime is not None:
+        lead = lifetime * window
+    else:
+        lead = timedelta(days=remaining_days)
+    if jitter and seed and lifetime is not None:
+        lead += lifetime * (jitter * jitter_fraction(seed))
+    return not_after - lead
+
+
+class CagwCertificate(object):
+    '''
+    CA gateway certificate class
+    '''
+    def __init__(self, module, cagw_client=None, profiler=None, private_key=None, inventory=None, recorded_path=None):
+        # With the profile option, or a profiler passed by the caller, dump() reports where the time went
+        self.profiler = profiler
+        if self.profiler is None and module.params.get('profile'):
+            self.profiler = Profiler()
+        if self.profiler is not None:
+            self.profiler.start()
+        self.request_type = module.params['request_type']
+        self.enrollment_format = module.params.get('enrollment_format')
+        self.path = module.params['path']
+        self.force = module.params['force']
+        window, jitter = module.params.get('renewal_window'), module.params.get('renewal_jitter') or 0.0
+        if window is not None and not 0 < window < 1:
+            module.fail_json(msg='renewal_window must be a fraction of the lifetime between 0 and 1, got {0}.'.format(window))
+        if not 0 <= jitter < 1:
+            module.fail_json(msg='renewal_jitter must be a fraction of the lifetime between 0 and 1, got {0}.'.format(jitter))
+
+        # All return values
+        self.changed = False
+        self.filename = None
+        self.cert_details = None
+        self.cert_status = None
+        self.serialNumber = None
+        self.cert_days = None
+        self.message = None
+        self.retries = 0
+        self.backup_file = None
+        self.renewal_date = None
+
+        # Content of the certificate to write to path
+        self.cert = None
+        # Serial number, expiry, subject... of the certificate at path, see support.certificate_metadata
+        self.local_metadata = None
+        self.cagw_client = cagw_client
+        # Key for private_key_path when it does not exist yet, generated ahead by cagw_certificate_batch
+        self.private_key = private_key
+        # Inventory shared by the items of cagw_certificate_batch, or opened for inventory_path
+        self.inventory = inventory
+        # Check mode reads an existing inventory, it does not create one
+        if self.inventory is None and module.params.get('inventory_path') and not (
+                module.check_mode and not os.path.exists(module.params['inventory_path'])):
+            # Imported only now, as sqlite3, a task without an inventory does not need them
+            import sqlite3
+            from ansible_collections.entrust.crypto.plugins.module_utils.cagw.inventory import Inventory
+
+            try:
+                self.inventory = Inventory(module.params['inventory_path'], read_only=module.check_mode)
+            except (OSError, sqlite3.Error) as e:
+                module.fail_json(msg='Failed to open the inventory {0}: {1}'.format(module.params['inventory_path'], to_native(e)))
+        # The path of the managed host, where path is a local copy on the controller
+        self.recorded_path = recorded_path or self.path
+        # Only a new request without force checks the certificate already at path
+        if self.request_type == 'new' and not self.force and self.path and os.path.exists(self.path):
+            try:
+                self.local_metadata = self.load_local_metadata(module)
+            except Exception as e:
+                # The file is replaced as if there was none, e.g. a PKCS12 whose password changed
+                module.warn('Failed to load the certificate at {0}, a new one will be requested: {1}'.format(self.path, to_native(e)))
+        # Instantiate the CAGW client, unless one is shared between several certificates (cagw_certificate_batch)
+        if self.cagw_client is None:
+            try:
+                self.cagw_client = cagw_client_for(module)
+            except SessionConfigurationException as e:
+                module.fail_json(msg='Failed to initialize Entrust Provider: {0}'.format(to_native(e)))
+        if self.profiler is not None:
+            self.profiler.add_setup(self.cagw_client.session)
+
+    def load_local_metadata(self, module):
+        """The metadata of the certificate at path, None when it holds none"""
+        if self.writes_pkcs12():
+            # Not cached, the certificate must still be loaded with p12_protection_password to tell whether it changed
+            from ansible_collections.entrust.crypto.plugins.module_utils.cagw.pkcs12 import load_pkcs12
+            from ansible_collections.entrust.crypto.plugins.module_utils.cagw.support import certificate_metadata
+
+            cert = load_pkcs12(self.path, module.params['p12_protection_password'])[1]
+            return certificate_metadata(cert) if cert is not None else None
+        return read_certificate_metadata(self.path, cache=module.params.get('metadata_cache'), write=not module.check_mode)[0]
+
+    def writes_pkcs12(self):
+        """Whether path holds a PKCS12 rather than a PEM certificate"""
+        return self.request_type == 'new' and self.enrollment_format == 'PKCS12'
+
+    def write_cert_to_file(self, module):
+        """Replace path with the certificate, return whether path changed, i.e. its content or its attributes"""
+        from ansible_collections.entrust.crypto.plugins.module_utils.cagw.pkcs12 import write_base64
+
+        started = time.monotonic()
+        pkcs12 = self.writes_pkcs12()
+        try:
+            # The PKCS12 holds the private key, only its owner may read it
+            with AtomicFile(self.path, mode=0o600 if pkcs12 else None, fsync=module.params.get('fsync')) as fh:
+                if pkcs12:
+                    try:
+                        write_base64(fh, self.cert)
+                    except ValueError as e:
+                        module.fail_json(msg='The PKCS12 returned by CAGW is not valid base64: {0}'.format(to_native(e)))
+                else:
+                    # The armor is written around the base64 of the certificate rather than concatenated to a copy of it
+                    fh.write(PEM_BEGIN_LINE)
+                    fh.write(self.cert.encode('ascii'))
+                    fh.write(PEM_END_LINE)
+                changed, self.backup_file = fh.commit(backup=module.params.get('backup'))
+        except (IOError, OSError) as e:
+            module.fail_json(msg='Failed to write the certificate to {0}: {1}'.format(self.path, to_native(e)))
+        if changed and pkcs12:
+            self.write_pkcs12_parts(module)
+        changed = self.set_file_attributes(module, changed)
+        if self.profiler is not None:
+            self.profiler.add('write', time.monotonic() - started)
+        return changed
+
+    def set_file_attributes(self, module, changed):
+        """Apply the owner, group and mode options of an AnsibleModule to path.
+
+        Where there is only a ParamsModule, the caller applies them: cagw_certificate_batch once all of
+        the certificates are written, the action plugin when it copies path to the managed host.
+        """
+        if isinstance(module, ParamsModule):
+            return changed
+        file_args = module.load_file_common_arguments(module.params, path=self.path)
+        return module.set_fs_attributes_if_different(file_args, changed)
+
+    def write_pkcs12_parts(self, module):
+        """Write the private key, certificate and chain of the PKCS12 at path to the PEM files requested"""
+        key_path = module.params.get('p12_private_key_path')
+        cert_path = module.params.get('p12_certificate_path')
+        chain_path = module.params.get('p12_chain_path')
+        if not (key_path or cert_path or chain_path):
+            return
+        from ansible_collections.entrust.crypto.plugins.module_utils.cagw.keygen import write_private_key
+        from ansible_collections.entrust.crypto.plugins.module_utils.cagw.pkcs12 import load_pkcs12, write_certificates
+
+        try:
+            key, certificate, chain = load_pkcs12(self.path, module.params['p12_protection_password'])
+            if key_path:
+                write_private_key(key_path, key, module.params.get('private_key_passphrase'))
+            if cert_path:
+                write_certificates(cert_path, [certificate])
+            if chain_path:
+                write_certificates(chain_path, chain)
+        except (ValueError, TypeError, OSError) as e:
+            module.fail_json(msg='Failed to split the PKCS12 {0} into PEM files: {1}'.format(self.path, to_native(e)))
+
+    def update_csr(self, module):
+        from ansible_collections.entrust.crypto.plugins.module_utils.cagw.keygen import load_csr_body
+
+        body = {}
+        if module.params['csr']:
+            try:
+                body['csr'] = load_csr_body(module.params['csr'])
+            except (ValueError, OSError) as e:
+                module.fail_json(msg='The csr field of {0} is not a valid CSR: {1}'.format(module.params['csr'], to_native(e)))
+        else:
+            body['csr'] = self.generate_csr(module)
+        return body
+
+    def generate_csr(self, module):
+        """Build the CSR from the key at private_key_path, generating the key first if it does not exist"""
+        from ansible_collections.entrust.crypto.plugins.module_utils.cagw.keygen import (
+            build_csr,
+            csr_body,
+            generate_private_key,
+            load_private_key,
+            write_private_key,
+        )
+
+        path = module.params['private_key_path']
+        passphrase = module.params['private_key_passphrase']
+        try:
+            if os.path.exists(path):
+                key = load_private_key(path, passphrase)
+            else:
+                key = self.private_key or generate_private_key(module.params['private_key_type'], module.params['private_key_size'],
+                                                               module.params['private_key_curve'])
+                write_private_key(path, key, passphrase)
+            csr = build_csr(key, module.params['dn'], module.params['subject_alt_name'])
+        except (ValueError, TypeError, OSError) as e:
+            module.fail_json(msg='Failed to create a CSR with the private key {0}: {1}'.format(path, to_native(e)))
+        return csr_body(csr)
+
+    def update_optional_certificate_request_details(self, module):
+        body = {}
+        optionalCertificateRequestDetails = {}
+        optionalCertificateRequestDetails['subjectDn'] = module.params['dn']
+        if module.params['validity_period']:
+            optionalCertificateRequestDetails['validityPeriod'] = module.params['validity_period']
+        body['optionalCertificateRequestDetails'] = optionalCertificateRequestDetails
+        return body
+
+    def update_properties(self, module):
+        body = {}
+        properties = {}
+        if module.params['requester_name']:
+            properties['tracking.requesterName'] = module.params['requester_name']
+        if module.params['requester_email']:
+            properties['tracking.requesterEmail'] = module.params['requester_email']
+        if module.params['requester_phone']:
+            properties['tracking.requesterPhone'] = module.params['requester_phone']
+        if module.params['tracking_info']:
+            properties['tracking.trackingInfo'] = module.params['tracking_info']
+        if module.params['additional_emails']:
+            properties['tracking.additionalEmails'] = module.params['additional_emails']
+        if module.params['custom_fields']:
+            # Omit custom fields from submitted dict if not present, instead of submitting them with value of 'null'
+            # The ECS API does technically accept null without error, but it complicates debugging user escalations and is unnecessary bandwidth.
+            for k, v in module.params['custom_fields'].items():
+                if v is not None:
+                    key = "tracking.customFields.{k}".format(k=k)
+                    properties[key] = v
+        body['properties'] = properties
+        return body
+
+    def update_protection(self, module):
+        requiredFormat = {}
+        protection = {}
+
+        protection['type'] = "PasswordProtection"
+        protection['password'] = module.params['p12_protection_password']
+
+        requiredFormat['protection'] = protection
+        return requiredFormat
+
+    def update_required_format(self, module):
+        body = {}
+        requiredFormat = {}
+        module_params_format = module.params['enrollment_format']
+        requiredFormat['format'] = module_params_format
+        if module_params_format == 'PKCS12':
+            requiredFormat.update(self.update_protection(module))
+        body['requiredFormat'] = requiredFormat
+        return body
+
+    def update_cert_subject_alt_name(self, module):
+        body = {}
+        subjectAltNames = []
+        if module.params['subject_alt_name']:
+            for k, v in module.params['subject_alt_name'].items():
+                if v is not None:
+                    options = {}
+                    options['type'] = k
+                    options['value'] = v
+                    subjectAltNames.append(options)
+            body['subjectAltNames'] = subjectAltNames
+        return body
+
+    def update_action(self, module):
+        body = {}
+        action = {}
+        action['type'] = module.params['action_type']
+        action['reason'] = module.params['action_reason']
+        body['action'] = action
+        return body
+
+    def set_cert_details(self, module):
+        module_params_format = module.params['enrollment_format']
+        if module_params_format == 'X509':
+            self.serialNumber = self.cert_details.get('serialNumber')
+            self.validityPeriod = self.cert_details.get('validityPeriod')
+            self.cert_days = calculate_cert_days(self.cert_details.get('validityPeriod'))
+
+        if self.request_type == 'new':
+            self.cert = self.cert_details.get('body')
+        elif self.request_type == 'get':
+            self.cert = self.cert_details.get('certificateData')
+
+    def local_cert_days(self):
+        return (parse_iso8601(self.local_metadata['not_after']) - datetime.now(timezone.utc)).days
+
+    def set_renewal_date(self, module, not_before, not_after, serial_number):
+        """Compute when the certificate valid from not_before until not_after is due for renewal, see renewal_date"""
+        self.renewal_date = renewal_date(not_before, not_after, module.params['remaining_days'], window=module.params.get('renewal_window'),
+                                         jitter=module.params.get('renewal_jitter'), seed=module.params.get('renewal_jitter_seed') or serial_number)
+        return self.renewal_date
+
+    def renewal_due(self, module):
+        """Whether the certificate at path is due for renewal"""
+        metadata = self.local_metadata
+        due = self.set_renewal_date(module, parse_iso8601(metadata.get('not_before') or ''), parse_iso8601(metadata['not_after']),
+                                    metadata['serial_number'])
+        return datetime.now(timezone.utc) >= due
+
+    def check_local(self, module):
+        """Take the serial number and remaining days from the certificate at path, without contacting CAGW"""
+        self.serialNumber = self.local_metadata['serial_number']
+        self.cert_days = self.local_cert_days()
+        return not self.renewal_due(module)
+
+    def run_steps(self, steps):
+        """Drive the steps of an operation, sending every CAGW call it yields through the synchronous client"""
+        value, error = None, None
+        while True:
+            try:
+                name, kwargs = steps.send(value) if error is None else steps.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            try:
+                value, error = getattr(self.cagw_client, name)(profiler=self.profiler, **kwargs), None
+            except Exception as e:
+                value, error = None, e
+
+    async def run_steps_async(self, steps):
+        """Drive the steps of an operation, awaiting every CAGW call it yields on an AsyncCAGWClient"""
+        value, error = None, None
+        while True:
+            try:
+                name, kwargs = steps.send(value) if error is None else steps.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            try:
+                value, error = await getattr(self.cagw_client, name)(profiler=self.profiler, **kwargs), None
+            except Exception as e:
+                value, error = None, e
+
+    def check(self, module):
+        return self.run_steps(self.check_steps(module))
+
+    def check_steps(self, module):
+        """Generator deciding whether the certificate at path is still good, yields the CAGW calls it needs"""
+        if self.local_metadata:
+            status_check = module.params['status_check']
+            # Check mode never contacts CAGW, the local certificate is all we have
+            if status_check != 'remote' or module.check_mode:
+                healthy = self.check_local(module)
+                if status_check == 'local' or module.check_mode:
+                    return healthy
+                if status_check == 'inventory':
+                    # The status last recorded for the certificate, CAGW is only asked about a certificate it does not know
+                    recorded = self.inventory.get(module.params['certificate_authority_id'], self.serialNumber) if self.inventory else None
+                    if recorded is not None and recorded['status']:
+                        self.cert_status = recorded['status']
+                        return healthy and self.cert_status.lower() not in UNUSABLE_STATUSES
+                # local_then_remote: only ask CAGW about a certificate which is due for renewal, or closer to its expiry
+                # than status_check_threshold, a certificate the local check found due is never kept without asking
+                elif healthy:
+                    threshold = module.params['status_check_threshold']
+                    if not threshold or self.cert_days >= threshold:
+                        return True
+
+            result = yield ('GetCertificate', dict(ca_id=module.params['certificate_authority_id'],
+                                                   serial_no=self.local_metadata['serial_number'],
+                                                   validate_certs=module.params['validate_certs'],
+                                                   **cagw_gateway_kwargs(module.params)))
+            self.cert_details = result.get('certificate')
+            # Changing the request type to get since we are getting the certificate here on the basis of
+            # serial number and we need to populate the cert details on the get response only.
+            self.request_type = 'get'
+            self.set_cert_details(module)
+            # Changing the request back to new
+            self.request_type = 'new'
+            if self.cert_days is None:
+                # Only X509 enrollments take the validity from CAGW, that of the local certificate is the same
+                self.cert_days = self.local_cert_days()
+
+            module_params_connector_name = module.params['connector_name']
+            # ECS CA getCertificate api through CAGW doesn't return status of the certificate
+            if module_params_connector_name == 'SM':
+                self.cert_status = self.cert_details.get('status')
+                if (self.cert_status or '').lower() in UNUSABLE_STATUSES:
+                    return False
+
+            if self.renewal_due(module):
+                return False
+
+            return True
+
+        return False
+
+    def request_cert(self, module):
+        retries = self.cagw_client.session.retries
+        try:
+            self.run_steps(self.request_cert_steps(module))
+        finally:
+            self.retries = self.cagw_client.session.retries - retries
+
+    async def request_cert_async(self, module):
+        """Same as request_cert, with a cagw_client created by AsyncCAGWClient"""
+        retries = self.cagw_client.session.retries
+        try:
+            await self.run_steps_async(self.request_cert_steps(module))
+        finally:
+            self.retries = self.cagw_client.session.retries - retries
+
+    def request_cert_steps(self, module):
+        """Generator running the request of the module, yields every CAGW call as a tuple (operation name, arguments)"""
+        body = {}
+        try:
+            if self.request_type == 'new':
+                if self.force or not (yield from self.check_steps(module)):
+                    if module.check_mode:
+                        self.changed = True
+                        return
+                    body['profileId'] = module.params['certificate_profile_id']
+                    body.update(self.update_required_format(module))
+                    body.update(self.update_cert_subject_alt_name(module))
+                    module_params_format = module.params['enrollment_format']
+                    body.update(self.update_optional_certificate_request_details(module))
+                    if module_params_format == 'X509':
+                        body.update(self.update_csr(module))
+                    module_params_connector_name = module.params['connector_name']
+                    if module_params_connector_name == 'ECS':
+                        body.update(self.update_properties(module))
+                    result = yield ('NewCertRequest', dict(Body=body, ca_id=module.params['certificate_authority_id'],
+                                                           validate_certs=module.params['validate_certs'],
+                                                           **cagw_gateway_kwargs(module.params)))
+                    self.cert_details = result.get('enrollment')
+                    self.set_cert_details(module)
+                    # A new certificate was issued, path is changed whatever its content was
+                    self.write_cert_to_file(module)
+                    if module_params_format == 'PKCS12':
+                        # The PKCS12 is in path now, do not hold on to it or return it
+                        self.cert_details.pop('body', None)
+                        self.cert = None
+                    self.changed = True
+                else:
+                    # The certificate at path is still good, only its owner, group or mode may need fixing
+                    self.changed = self.set_file_attributes(module, False)
+                    self.record(module)
+                    return
+            elif module.check_mode:
+                # Without fetching it, a get may always change path, an action is never reported as a change
+                self.changed = self.request_type == 'get'
+                return
+            elif self.request_type == 'action':
+                self.serialNumber = module.params['serial_no'] or self.recorded_serial_number(module)
+                body.update(self.update_action(module))
+                result = yield ('ActionOnCertificate', dict(Body=body, ca_id=module.params['certificate_authority_id'],
+                                                            serial_no=self.serialNumber,
+                                                            validate_certs=module.params['validate_certs'],
+                                                            **cagw_gateway_kwargs(module.params)))
+                self.cert_details = result.get('action')
+            elif self.request_type == 'get':
+                result = yield ('GetCertificate', dict(ca_id=module.params['certificate_authority_id'],
+                                                       serial_no=module.params['serial_no'],
+                                                       validate_certs=module.params['validate_certs'],
+                                                       **cagw_gateway_kwargs(module.params)))
+                self.cert_details = result.get('certificate')
+                self.set_cert_details(module)
+                # The same certificate is fetched every time, only report a change when path did not hold it yet
+                self.changed = self.write_cert_to_file(module)
+        except RestOperationException as e:
+            module.fail_json(msg='Failed in certificate operation from Entrust (CAGW) {0} Error:'.format(e))
+        except CONNECTION_ERRORS as e:
+            module.fail_json(msg=connection_failure_message(e, module.params))
+
+        self.message = result.get('message')
+        self.cert_status = self.cert_details.get('status')
+        if self.request_type != 'action':
+            # That of the certificate now at path, the one checked before may just have been replaced
+            not_before, not_after = validity_bounds(self.cert_details.get('validityPeriod'))
+            self.renewal_date = None
+            if not_after is not None:
+                self.set_renewal_date(module, not_before, not_after, self.serialNumber or self.cert_details.get('serialNumber'))
+        self.record(module)
+
+    def recorded_serial_number(self, module):
+        """The serial number of the certificate last recorded in the inventory for path, for an action without serial_no"""
+        if self.inventory is None or not self.recorded_path:
+            module.fail_json(msg='request_type=action needs serial_no, or path and inventory_path to find the serial number of path.')
+        recorded = self.inventory.last_at_path(self.recorded_path, module.params['certificate_authority_id'])
+        if recorded is None:
+            module.fail_json(msg='No serial_no given and no certificate recorded for {0} in the inventory {1}.'.format(
+                self.recorded_path, module.params.get('inventory_path')))
+        return recorded['serial_number']
+
+    def fingerprint(self):
+        """The SHA-256 of the DER encoding of the certificate received from CAGW, None for a PKCS12 or no certificate"""
+        if not self.cert or not isinstance(self.cert, str) or self.writes_pkcs12():
+            return None
+        try:
+            return hashlib.sha256(base64.b64decode(''.join(self.cert.split()), validate=True)).hexdigest()
+        except (binascii.Error, ValueError):
+            return None
+
+    def record(self, module):
+        """Record the outcome of the request in the inventory, if there is one"""
+        serial_number = self.serialNumber or (self.cert_details or {}).get('serialNumber') or module.params.get('serial_no')
+        if self.inventory is None or not serial_number or module.check_mode:
+            return
+        import sqlite3
+        from ansible_collections.entrust.crypto.plugins.module_utils.cagw.inventory import format_date
+
+        not_before, not_after = validity_bounds((self.cert_details or {}).get('validityPeriod'))
+        if not_after is None and self.local_metadata and serial_number == self.local_metadata['serial_number']:
+            not_after = parse_iso8601(self.local_metadata['not_after'])
+        status = self.cert_status
+        if self.request_type == 'action':
+            # The status of the action, not that of the certificate
+            status = ACTION_STATUSES.get(module.params['action_type']) if (status or '').upper() == 'COMPLETED' else None
+        elif self.request_type == 'new' and self.changed and not status:
+            status = 'issued'
+        try:
+            self.inventory.record(
+                module.params['certificate_authority_id'], serial_number,
+                path=self.recorded_path if self.request_type != 'action' else None,
+                profile_id=module.params.get('certificate_profile_id') if self.request_type == 'new' else None,
+                enrollment_format=self.enrollment_format if self.request_type == 'new' else None,
+                not_before=format_date(not_before), not_after=format_date(not_after),
+                status=status, fingerprint=self.fingerprint())
+        except sqlite3.Error as e:
+            # The certificate was requested all the same, do not fail the task for its record
+            module.warn('Failed to record the certificate {0} in the inventory {1}: {2}'.format(
+                serial_number, self.inventory.path, to_native(e)))
+
+    def dump(self):
+        result = {
+            'changed': self.changed,
+            'filename': self.path,
+            'cert_status': self.cert_status,
+            'serialNumber': self.serialNumber,
+            'cert_days': self.cert_days,
+            'renewal_date': self.renewal_date.isoformat() if self.renewal_date else None,
+            'cert_details': self.cert_details,
+            'message': self.message,
+            'retries': self.retries,
+        }
+        if self.backup_file:
+            result['backup_file'] = self.backup_file
+        if self.profiler is not None:
+            result['timings'] = self.profiler.result()
+        return result
+
+
+def custom_fields_spec():
+    return dict(
+        text1=dict(type='str'),
+        text2=dict(type='str'),
+        text3=dict(type='str'),
+        text4=dict(type='str'),
+        text5=dict(type='str'),
+        text6=dict(type='str'),
+        text7=dict(type='str'),
+        text8=dict(type='str'),
+        text9=dict(type='str'),
+        text10=dict(type='str'),
+        text11=dict(type='str'),
+        text12=dict(type='str'),
+        text13=dict(type='str'),
+        text14=dict(type='str'),
+        text15=dict(type='str'),
+        number1=dict(type='float'),
+        number2=dict(type='float'),
+        number3=dict(type='float'),
+        number4=dict(type='float'),
+        number5=dict(type='float'),
+        date1=dict(type='str'),
+        date2=dict(type='str'),
+        date3=dict(type='str'),
+        date4=dict(type='str'),
+        date5=dict(type='str'),
+        email1=dict(type='str'),
+        email2=dict(type='str'),
+        email3=dict(type='str'),
+        email4=dict(type='str'),
+        email5=dict(type='str'),
+        dropdown1=dict(type='str'),
+        dropdown2=dict(type='str'),
+        dropdown3=dict(type='str'),
+        dropdown4=dict(type='str'),
+        dropdown5=dict(type='str'),
+    )
+
+
+def subject_alt_name_spec():
+    return dict(
+        dNSName=dict(type='str'),
+        iPAddress=dict(type='str'),
+        directoryName=dict(type='str'),
+        uniformResourceIdentifier=dict(type='str'),
+        rfc822Name=dict(type='str'),
+    )
+
+
+def private_key_argument_spec():
+    """Options of the private key generated for an X509 enrollment without a CSR"""
+    return dict(
+        private_key_type=dict(type='str', default='RSA', choices=list(KEY_TYPES)),
+        private_key_size=dict(type='int', default=2048),
+        private_key_curve=dict(type='str', default='secp256r1', choices=list(CURVES)),
+        private_key_passphrase=dict(type='str', no_log=True),
+    )
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c), Entrust Corporation, 2023
+# Author: Sapna Jain, Entrust
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import asyncio
+import threading
+import time
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+def run_concurrently(func, items, workers):
+    """Call func(item) for every item on a pool of at most workers threads.
+
+    Returns a list of (result, exception) tuples in the order of items, so a failing item
+    never prevents the others from running.
+    """
+
+    def call(item):
+        try:
+            return func(item), None
+        except Exception as e:
+            return None, e
+
+    items = list(items)
+    if not items:
+        return []
+    workers = max(1, min(workers, len(items)))
+    if workers == 1:
+        return [call(item) for item in items]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(call, items))
+
+
+def run_streaming(func, items, workers, on_result):
+    """Call func(item) for every item of the iterable items on a pool of at most workers threads.
+
+    Unlike run_concurrently, items is consumed as the calls complete, at most twice workers items are held
+    at any time whatever their number. on_result(item, result, exception) is called in the calling thread
+    for every item, in the order the calls complete, so it needs no lock.
+    """
+
+    def call(item):
+        try:
+            return func(item), None
+        except Exception as e:
+            return None, e
+
+    workers = max(1, workers)
+    pending = {}
+
+    def collect(return_when):
+        done = wait(pending, return_when=return_when)[0]
+        for future in done:
+            on_result(pending.pop(future), *future.result())
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            for item in items:
+                if len(pending) >= 2 * workers:
+                    collect(FIRST_COMPLETED)
+                pending[executor.submit(call, item)] = item
+        finally:
+            # Also when reading items fails, the calls already made are reported
+            while pending:
+                collect(FIRST_COMPLETED)
+
+
+class RateLimiter(object):
+    """ Space the calls of wait() across threads so that at most rate of them return per second, None for no limit """
+
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def run_on_event_loop(func, items, concurrency, cleanup=None):
+    """Await func(item) for every item on a new event loop, at most concurrency of them at the same time.
+
+    Returns a list of (result, exception) tuples in the order of items, like run_concurrently.
+    The coroutine function cleanup, e.g. closing the connections of an AsyncCAGWClient, is awaited
+    on the same loop before it is closed.
+    """
+
+    async def run_all():
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def call(item):
+            async with semaphore:
+                try:
+                    return await func(item), None
+                except Exception as e:
+                    return None, e
+
+        try:
+            return await asyncio.gather(*[call(item) for item in items])
+        finally:
+            if cleanup is not None:
+                await cleanup()
+
+    items = list(items)
+    if not items:
+        return []
+    loop = asyncio.new_event_loop()
+    try:
+        return list(loop.run_until_complete(run_all()))
+    finally:
+        loop.close()
+
+
+def throughput_stats(total, elapsed, workers, **counters):
+    """Aggregate statistics returned by the bulk modules"""
+    stats = dict(
+        total=total,
+        workers=workers,
+        elapsed=round(elapsed, 3),
+        requests_per_second=round(total / elapsed, 2) if elapsed > 0 else None,
+    )
+    stats.update(counters)
+    return stats
+
+
+class Stopwatch(object):
+    """ Measure the wall clock time of a block """
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        self.elapsed = 0.0
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.monotonic() - self.start
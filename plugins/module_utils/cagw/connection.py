@@ -0,0 +1,408 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c), Entrust Corporation, 2023
+# Author: Sapna Jain, Entrust
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import socket
+import ssl
+import threading
+import time
+
+from ansible.module_utils.six.moves import http_client
+from ansible.module_utils.six.moves.urllib.error import HTTPError
+from ansible.module_utils.six.moves.urllib.parse import urlsplit
+from ansible.module_utils.six.moves.urllib.request import build_opener, getproxies, HTTPSHandler, proxy_bypass, Request
+
+# Errors raised when the server closed an idle keep-alive connection before we reused it
+STALE_CONNECTION_ERRORS = (http_client.BadStatusLine, ConnectionResetError, ConnectionAbortedError, BrokenPipeError)
+# asyncio.IncompleteReadError is an EOFError, asyncio is only imported once an async pool is used
+ASYNC_STALE_CONNECTION_ERRORS = STALE_CONNECTION_ERRORS + (EOFError,)
+
+# Methods which can be sent again without risk of a duplicate, e.g. a second enrollment
+IDEMPOTENT_METHODS = ("get", "head", "options", "put", "delete")
+
+# Seconds a connection may have been idle to carry a request which cannot be sent again, well within the keep-alive
+# timeout of common servers (5 seconds for Apache), so that such a request is hardly ever sent on a stale connection
+NON_IDEMPOTENT_MAX_IDLE = 2.0
+
+
+def _no_response(error):
+    """Whether error of a stale connection means the server closed it without answering, rather than sent part of a response"""
+    return not isinstance(error, http_client.BadStatusLine) or isinstance(error, http_client.RemoteDisconnected)
+
+
+class ConnectTimeout(socket.timeout):
+    """ The TCP or TLS handshake with the gateway did not complete within the connect timeout, no request was sent """
+
+    pass
+
+
+class PooledResponse(object):
+    """ A fully read response; the connection it came from is already back in the pool.
+
+    connect_time is the time spent opening a new connection (TCP and TLS handshake) for the request, 0 when an idle one was reused.
+    """
+
+    def __init__(self, status, reason, headers, body, connect_time=0.0):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+        self.connect_time = connect_time
+
+    def getcode(self):
+        return self.status
+
+    def getheader(self, name, default=None):
+        name = name.lower()
+        for header, value in self.headers.items():
+            if header.lower() == name:
+                return value
+        return default
+
+    def read(self):
+        return self.body
+
+
+class _HTTPSConnection(http_client.HTTPSConnection):
+    """ HTTPSConnection which resumes a previous TLS session of the pool.
+
+    The handshakes must complete within connect_timeout, each read of the response within timeout.
+    """
+
+    def __init__(self, host, port, context, timeout, tls_session=None, connect_timeout=None):
+        http_client.HTTPSConnection.__init__(self, host, port, timeout=timeout, context=context)
+        self.connect_timeout = timeout if connect_timeout is None else connect_timeout
+        self.tls_session = tls_session
+        # Whether the session of this connection was handed to the pool, once is enough
+        self.tls_session_saved = False
+        self.idle_since = 0.0
+
+    def connect(self):
+        try:
+            sock = socket.create_connection((self.host, self.port), self.connect_timeout, self.source_address)
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                self.sock = self._context.wrap_socket(sock, server_hostname=self.host, session=self.tls_session)
+            except BaseException:
+                sock.close()
+                raise
+        except socket.timeout:
+            raise ConnectTimeout("Timed out connecting to {0}:{1} after {2} seconds".format(self.host, self.port, self.connect_timeout))
+        self.sock.settimeout(self.timeout)
+
+
+class ConnectionPool(object):
+    """ Keep-alive HTTPS connections to the gateway, shared by all operations of a CAGWSession.
+
+    The SSLContext, and with it the client certificate and key, is built once per value of validate_certs.
+    Idle connections are kept per host and reused by the next request, new connections to a host resume
+    the last TLS session negotiated with it. The pool is thread safe, a connection is used by one request at a time.
+    A new connection fails with a ConnectTimeout when it is not established within connect_timeout seconds,
+    a request when the gateway keeps it waiting for timeout seconds.
+    """
+
+    def __init__(self, client_cert, client_key=None, timeout=120, headers=None, max_idle=32, connect_timeout=None):
+        self.client_cert = client_cert
+        self.client_key = client_key
+        self.timeout = timeout
+        self.connect_timeout = timeout if connect_timeout is None else connect_timeout
+        self.headers = dict(headers or {})
+        self.max_idle = max_idle
+
+        self.connections_opened = 0
+        self.connections_reused = 0
+        self.tls_sessions_resumed = 0
+
+        self._lock = threading.Lock()
+        self._contexts = {}
+        self._idle = {}
+        self._tls_sessions = {}
+
+    def stats(self):
+        return dict(
+            connections_opened=self.connections_opened,
+            connections_reused=self.connections_reused,
+            tls_sessions_resumed=self.tls_sessions_resumed,
+        )
+
+    def ssl_context(self, validate_certs=True):
+        with self._lock:
+            context = self._contexts.get(validate_certs)
+            if context is None:
+                context = ssl.create_default_context()
+                if not validate_certs:
+                    context.check_hostname = False
+                    context.verify_mode = ssl.CERT_NONE
+                if self.client_cert:
+                    context.load_cert_chain(self.client_cert, self.client_key or None)
+                self._contexts[validate_certs] = context
+            return context
+
+    def proxy_request(self, method, url, data=None, validate_certs=True):
+        """Send the request through the proxy of the environment on a new connection, return the response whatever its status code"""
+        opener = build_opener(HTTPSHandler(context=self.ssl_context(validate_certs)))
+        body = data.encode("utf-8") if isinstance(data, str) else data
+        try:
+            return opener.open(Request(url, data=body, headers=self.headers, method=method.upper()), timeout=self.timeout)
+        except HTTPError as e:
+            # An HTTPError has the same methods available as a valid response
+            return e
+
+    @staticmethod
+    def uses_proxy(host):
+        """Whether the environment routes requests to host through a proxy, which this pool does not support"""
+        return "https" in getproxies() and not proxy_bypass(host)
+
+    def _acquire(self, key, idempotent=True):
+        with self._lock:
+            idle = self._idle.get(key)
+            # The most recently released connection is the last one, the others were idle for longer
+            if idle and (idempotent or time.monotonic() - idle[-1].idle_since < NON_IDEMPOTENT_MAX_IDLE):
+                self.connections_reused += 1
+                return idle.pop(), True
+            self.connections_opened += 1
+            tls_session = self._tls_sessions.get(key)
+        host, port, validate_certs = key
+        return _HTTPSConnection(host, port, self.ssl_context(validate_certs), self.timeout, tls_session, connect_timeout=self.connect_timeout), False
+
+    def _release(self, key, connection):
+        sock = connection.sock
+        # Read after the first response, when the TLS 1.3 tickets arrived, and only then: every read of
+        # sock.session allocates a new session in OpenSSL, which cost about 12 KB per request of a long run
+        session = None
+        if sock is not None and not connection.tls_session_saved:
+            connection.tls_session_saved = True
+            session = getattr(sock, "session", None)
+        with self._lock:
+            if session is not None:
+                self._tls_sessions[key] = session
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                connection.idle_since = time.monotonic()
+                idle.append(connection)
+                return
+        connection.close()
+
+    def request(self, method, url, data=None, validate_certs=True):
+        """Send the request over a pooled connection and return a PooledResponse, whatever its status code"""
+        parts = urlsplit(url)
+        key = (parts.hostname, parts.port or 443, validate_certs)
+        target = parts.path + ("?" + parts.query if parts.query else "")
+        body = data.encode("utf-8") if isinstance(data, str) else data
+        idempotent = method.lower() in IDEMPOTENT_METHODS
+
+        while True:
+            connection, reused = self._acquire(key, idempotent)
+            connect_time = 0.0
+            responded = False
+            try:
+                if not reused:
+                    start = time.monotonic()
+                    connection.connect()
+                    connect_time = time.monotonic() - start
+                connection.request(method.upper(), target, body=body, headers=self.headers)
+                if not reused and getattr(connection.sock, "session_reused", False):
+                    with self._lock:
+                        self.tls_sessions_resumed += 1
+                response = connection.getresponse()
+                responded = True
+                response_body = response.read()
+            except STALE_CONNECTION_ERRORS as e:
+                connection.close()
+                if reused and idempotent and not responded and _no_response(e):
+                    # The server dropped the idle connection before answering: send the request again on a fresh one.
+                    # Any other request may have been processed, the RetryPolicy of the session decides about it
+                    continue
+                raise
+            except Exception:
+                connection.close()
+                raise
+
+            result = PooledResponse(response.status, response.reason, dict(response.getheaders()), response_body, connect_time)
+            if response.will_close:
+                connection.close()
+            else:
+                self._release(key, connection)
+            return result
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+
+class _AsyncConnection(object):
+    """ An HTTP/1.1 connection over asyncio streams """
+
+    def __init__(self, reader, writer, host, port):
+        self.reader = reader
+        self.writer = writer
+        self.host = host if port == 443 else "{0}:{1}".format(host, port)
+        self.connect_time = 0.0
+        self.idle_since = 0.0
+        # Whether any byte of the response to the current request arrived
+        self.responded = False
+
+    async def exchange(self, method, target, body, headers):
+        """Send one request and read its response, return (PooledResponse, will_close)"""
+        self.responded = False
+        lines = ["{0} {1} HTTP/1.1".format(method, target), "Host: {0}".format(self.host)]
+        lines.extend("{0}: {1}".format(name, value) for name, value in headers.items())
+        lines.append("Content-Length: {0}".format(len(body) if body else 0))
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + (body or b""))
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise http_client.BadStatusLine(status_line)
+        self.responded = True
+        parts = status_line.decode("latin-1").rstrip("\r\n").split(" ", 2)
+        if len(parts) < 2 or not parts[1].isdigit():
+            raise http_client.BadStatusLine(status_line)
+        version, status, reason = parts[0], int(parts[1]), parts[2] if len(parts) > 2 else ""
+
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, dummy, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip()] = value.strip()
+        lowered = dict((name.lower(), value) for name, value in response_headers.items())
+
+        will_close = lowered.get("connection", "").lower() == "close" or version == "HTTP/1.0"
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            response_body = b""
+        elif lowered.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0].strip(), 16)
+                if size == 0:
+                    # Skip the trailers up to the final empty line
+                    while (await self.reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readexactly(2)
+            response_body = b"".join(chunks)
+        elif "content-length" in lowered:
+            response_body = await self.reader.readexactly(int(lowered["content-length"]))
+        else:
+            response_body = await self.reader.read()
+            will_close = True
+        return PooledResponse(status, reason, response_headers, response_body), will_close
+
+    def close(self):
+        self.writer.close()
+
+
+class AsyncConnectionPool(ConnectionPool):
+    """ Keep-alive HTTPS connections to the gateway for coroutines running on one event loop.
+
+    The stdlib-only counterpart of ConnectionPool for asyncio: the SSLContext is shared the same way,
+    at most max_concurrency requests are in flight at a time and idle connections are reused per host.
+    asyncio cannot resume a TLS session, so tls_sessions_resumed stays at 0.
+    """
+
+    def __init__(self, client_cert, client_key=None, timeout=120, headers=None, max_idle=32, max_concurrency=64, connect_timeout=None):
+        super(AsyncConnectionPool, self).__init__(client_cert, client_key, timeout=timeout, headers=headers, max_idle=max_idle,
+                                                  connect_timeout=connect_timeout)
+        self.max_concurrency = max_concurrency
+        self._loop = None
+        self._semaphore = None
+
+    def _bind_loop(self):
+        import asyncio
+
+        # Streams and the semaphore belong to the loop that created them, start afresh on another loop
+        loop = asyncio.get_event_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._idle = {}
+
+    async def _acquire_async(self, key, idempotent=True):
+        import asyncio
+
+        idle = self._idle.get(key)
+        if idle and (idempotent or time.monotonic() - idle[-1].idle_since < NON_IDEMPOTENT_MAX_IDLE):
+            self.connections_reused += 1
+            return idle.pop(), True
+        self.connections_opened += 1
+        host, port, validate_certs = key
+        start = time.monotonic()
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port, ssl=self.ssl_context(validate_certs), server_hostname=host), self.connect_timeout)
+        except asyncio.TimeoutError:
+            raise ConnectTimeout("Timed out connecting to {0}:{1} after {2} seconds".format(host, port, self.connect_timeout))
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        connection = _AsyncConnection(reader, writer, host, port)
+        connection.connect_time = time.monotonic() - start
+        return connection, False
+
+    def _release_async(self, key, connection):
+        idle = self._idle.setdefault(key, [])
+        if len(idle) < self.max_idle:
+            connection.idle_since = time.monotonic()
+            idle.append(connection)
+        else:
+            connection.close()
+
+    async def request(self, method, url, data=None, validate_certs=True):  # pylint: disable=invalid-overridden-method
+        """Send the request over a pooled connection and return a PooledResponse, whatever its status code"""
+        import asyncio
+
+        self._bind_loop()
+        parts = urlsplit(url)
+        key = (parts.hostname, parts.port or 443, validate_certs)
+        target = parts.path + ("?" + parts.query if parts.query else "")
+        body = data.encode("utf-8") if isinstance(data, str) else data
+        idempotent = method.lower() in IDEMPOTENT_METHODS
+
+        async with self._semaphore:
+            while True:
+                connection, reused = await self._acquire_async(key, idempotent)
+                try:
+                    response, will_close = await asyncio.wait_for(
+                        connection.exchange(method.upper(), target, body, self.headers), self.timeout)
+                except ASYNC_STALE_CONNECTION_ERRORS:
+                    connection.close()
+                    if reused and idempotent and not connection.responded:
+                        # The server dropped the idle connection before answering: send the request again on a fresh one.
+                        # Any other request may have been processed, the RetryPolicy of the session decides about it
+                        continue
+                    raise
+                except BaseException:
+                    connection.close()
+                    raise
+
+                if not reused:
+                    response.connect_time = connection.connect_time
+                if will_close:
+                    connection.close()
+                else:
+                    self._release_async(key, connection)
+                return response
+
+    async def aclose(self):
+        """Close the idle connections, on the event loop they were opened on"""
+        import asyncio
+
+        idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+        # Let the transports run their shutdown before the loop goes away
+        await asyncio.sleep(0)
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c), Entrust Corporation, 2023
+# Author: Sapna Jain, Entrust
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import threading
+import time
+
+from ansible.module_utils._text import to_native
+
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.exceptions import SessionConfigurationException
+
+# Weight of the last request in the moving averages of the latency and the error rate of an endpoint
+EWMA_WEIGHT = 0.3
+
+# The latency of an endpoint counts 1 + ERROR_PENALTY * its error rate times, an endpoint failing half of
+# its requests has to be three times faster than a healthy one to be preferred
+ERROR_PENALTY = 4.0
+
+# Seconds an endpoint is avoided after a failure, doubled by every consecutive failure up to MAX_COOLDOWN
+BASE_COOLDOWN = 1.0
+MAX_COOLDOWN = 30.0
+
+
+def format_endpoint(host, port):
+    """host and port as written in a URL, an IPv6 address in brackets"""
+    return "[{0}]:{1}".format(host, port) if ":" in host else "{0}:{1}".format(host, port)
+
+
+def parse_endpoints(hosts, port=443):
+    """The (host, port) of the gateway endpoints in hosts, a name or address optionally followed by :port, port otherwise.
+
+    An IPv6 address with a port is written in brackets, e.g. [2001:db8::1]:8443. Duplicates are dropped, the order is kept.
+    Raises a SessionConfigurationException for an entry which is not an endpoint.
+    """
+    if isinstance(hosts, str):
+        hosts = [hosts]
+    endpoints = []
+    for entry in hosts or []:
+        entry = to_native(entry).strip()
+        host, entry_port = entry, port
+        if entry.startswith("["):
+            host, bracket, rest = entry[1:].partition("]")
+            if not bracket or (rest and not rest.startswith(":")):
+                raise SessionConfigurationException("Invalid CAGW endpoint {0}".format(entry))
+            if rest:
+                entry_port = rest[1:]
+        elif entry.count(":") == 1:
+            host, entry_port = entry.split(":")
+        try:
+            entry_port = int(entry_port)
+        except (TypeError, ValueError):
+            raise SessionConfigurationException("Invalid port in CAGW endpoint {0}".format(entry))
+        if not host or not 0 < entry_port < 65536:
+            raise SessionConfigurationException("Invalid CAGW endpoint {0}".format(entry))
+        if (host, entry_port) not in endpoints:
+            endpoints.append((host, entry_port))
+    if not endpoints:
+        raise SessionConfigurationException("At least one CAGW endpoint must be provided.")
+    return endpoints
+
+
+class Endpoint(object):
+    """ A gateway node, with the moving averages of the latency and the error rate of its requests """
+
+    def __init__(self, host, port, index):
+        self.host = host
+        self.port = port
+        self.netloc = format_endpoint(host, port)
+        # Position in the list of the user, the tie breaker between endpoints which look the same
+        self.index = index
+        self.requests = 0
+        self.failures = 0
+        # None until a request completed, such an endpoint is tried before the ones which were measured
+        self.latency = None
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.avoid_until = 0.0
+        # Start times of the requests in flight
+        self.pending = []
+
+    def rank(self, now):
+        """Sort key of the endpoint, the healthiest first"""
+        if self.avoid_until > now:
+            # Avoided endpoints come last, the one coming back first leads them
+            return (1, self.avoid_until, self.index)
+        latency = self.latency or 0.0
+        if self.pending:
+            # An endpoint is at least as slow as its oldest request waiting for a response
+            latency = max(latency, now - self.pending[0])
+        # With N requests in flight the latency counts 1 + N times, which spreads concurrent requests over similar endpoints
+        return (0, latency * (1 + ERROR_PENALTY * self.error_rate) * (1 + len(self.pending)), len(self.pending), self.index)
+
+    def stats(self):
+        return dict(
+            endpoint=self.netloc,
+            requests=self.requests,
+            failures=self.failures,
+            latency=round(self.latency, 6) if self.latency is not None else None,
+            error_rate=round(self.error_rate, 3),
+        )
+
+
+class EndpointBalancer(object):
+    """ Route the requests of a session to the healthiest of several gateway endpoints.
+
+    Every response and failure of an endpoint updates its moving averages. choose() returns the endpoint with the lowest
+    latency weighted by its error rate, after those which were never measured, and avoids an endpoint which just failed
+    for a cooldown growing with its consecutive failures. The balancer is thread safe, it is shared by the threads or
+    coroutines of a session and, on the entrust.crypto.cagw connection, by the tasks of a play.
+    """
+
+    def __init__(self, endpoints):
+        self.endpoints = [Endpoint(host, port, index) for index, (host, port) in enumerate(endpoints)]
+        self._addresses = frozenset((endpoint.host, endpoint.port) for endpoint in self.endpoints)
+        self.failovers = 0
+        self.hedged_requests = 0
+        self.hedges_won = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, address):
+        return address in self._addresses
+
+    def choose(self, exclude=()):
+        """The healthiest endpoint which is not in exclude, None when all of them are"""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [endpoint for endpoint in self.endpoints if endpoint not in exclude]
+            if not candidates:
+                return None
+            return min(candidates, key=lambda endpoint: endpoint.rank(now))
+
+    def start(self, endpoint):
+        """Count a request sent to endpoint as in flight until record_success, record_failure or abandon, return its start time"""
+        started = time.monotonic()
+        with self._lock:
+            endpoint.pending.append(started)
+        return started
+
+    def abandon(self, endpoint, started):
+        """Forget a request which was cancelled, its endpoint took at least that long to answer it"""
+        waited = time.monotonic() - started
+        with self._lock:
+            endpoint.pending.remove(started)
+            if endpoint.latency is None or endpoint.latency < waited:
+                endpoint.latency = waited
+
+    def record_success(self, endpoint, started):
+        latency = time.monotonic() - started
+        with self._lock:
+            endpoint.pending.remove(started)
+            endpoint.requests += 1
+            endpoint.latency = latency if endpoint.latency is None else endpoint.latency + EWMA_WEIGHT * (latency - endpoint.latency)
+            endpoint.error_rate -= EWMA_WEIGHT * endpoint.error_rate
+            endpoint.consecutive_failures = 0
+            endpoint.avoid_until = 0.0
+
+    def record_failure(self, endpoint, started):
+        with self._lock:
+            endpoint.pending.remove(started)
+            endpoint.requests += 1
+            endpoint.failures += 1
+            endpoint.error_rate += EWMA_WEIGHT * (1.0 - endpoint.error_rate)
+            endpoint.consecutive_failures += 1
+            cooldown = min(MAX_COOLDOWN, BASE_COOLDOWN * 2 ** (endpoint.consecutive_failures - 1))
+            endpoint.avoid_until = time.monotonic() + cooldown
+
+    def record_failover(self):
+        with self._lock:
+            self.failovers += 1
+
+    def record_hedge(self, won=False):
+        with self._lock:
+            if won:
+                self.hedges_won += 1
+            else:
+                self.hedged_requests += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                failovers=self.failovers,
+                hedged_requests=self.hedged_requests,
+                hedges_won=self.hedges_won,
+                endpoints=[endpoint.stats() for endpoint in self.endpoints],
+            )
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c), Entrust Corporation, 2023
+# Author: Sapna Jain, Entrust
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+from ansible.module_utils._text import to_native
+
+
+class SessionConfigurationException(Exception):
+    """ Raised if we cannot configure a session with the API """
+
+    pass
+
+
+class RestOperationException(Exception):
+    """ Encapsulate a REST API error """
+
+    def __init__(self, error):
+        self.status = to_native(error.get("status", None))
+        self.errors = [to_native(err.get("message")) for err in error.get("errors", {})]
+        self.message = to_native(" ".join(self.errors))
+        super(RestOperationException, self).__init__(self.message)
+
+    @classmethod
+    def from_error(cls, error):
+        """Rebuild an exception of class cls from the error dict it was made of, e.g. received from another process"""
+        exception = cls.__new__(cls)
+        RestOperationException.__init__(exception, error)
+        return exception
+
+    def to_error(self):
+        return {"status": self.status, "errors": [{"message": message} for message in self.errors]}
+
+
+class CircuitOpenException(RestOperationException):
+    """ Raised instead of sending a request while the circuit breaker of the session is open """
+
+    def __init__(self, retry_in):
+        super(CircuitOpenException, self).__init__({
+            "errors": [{"message": "CAGW is failing, not sending requests for another {0:.0f} seconds.".format(retry_in)}],
+        })
+
+
+class RequestValidationException(RestOperationException):
+    """ Raised instead of sending a request whose parameters do not match the schemas of the spec """
+
+    def __init__(self, operation, errors):
+        super(RequestValidationException, self).__init__({
+            "errors": [{"message": "Invalid request for {0}: {1}".format(operation, "; ".join(errors))}],
+        })
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c), Entrust Corporation, 2023
+# Author: Sapna Jain, Entrust
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+# Bytes read at a time to compute the digest of an existing file
+DIGEST_CHUNK_SIZE = 64 * 1024
+
+
+def file_digest(path):
+    """The SHA-256 of the content of the file at path, None if there is no such file"""
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(DIGEST_CHUNK_SIZE), b''):
+                digest.update(chunk)
+    except (IOError, OSError):
+        return None
+    return digest.hexdigest()
+
+
+def backup_file(path):
+    """Copy path next to itself with a timestamp, the way AnsibleModule.backup_local names backups, and return the copy"""
+    backup_path = '{0}.{1}.{2}'.format(path, os.getpid(), time.strftime('%Y-%m-%d@%H:%M:%S~'))
+    shutil.copy2(path, backup_path)
+    return backup_path
+
+
+class AtomicFile(object):
+    """ Binary file which replaces path only when commit() finds its content differs from that of path.
+
+    The content goes to a temporary file in the directory of path, so that it can be renamed over path and
+    readers of path never see a partial file. Its digest is computed while it is written, as the content may
+    be streamed and is not kept in memory.
+
+    The new file keeps the mode and owner of the file it replaces. A file created anew gets mode, by default
+    the permissions the umask gives to a new file.
+    """
+
+    def __init__(self, path, mode=None, fsync=False):
+        self.path = path
+        self.mode = mode
+        self.fsync = fsync
+        self.digest = hashlib.sha256()
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, self.tmp_path = tempfile.mkstemp(dir=directory, prefix='.{0}.'.format(os.path.basename(path)), suffix='.tmp')
+        self.file = os.fdopen(fd, 'wb')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.discard()
+
+    def write(self, data):
+        self.digest.update(data)
+        self.file.write(data)
+
+    def discard(self):
+        """Remove the temporary file, unless commit() already renamed it"""
+        if not self.file.closed:
+            self.file.close()
+        if self.tmp_path is not None:
+            try:
+                os.unlink(self.tmp_path)
+            except OSError:
+                pass
+            self.tmp_path = None
+
+    def commit(self, backup=False):
+        """Replace path with the new content unless it is the same, return (changed, path of the backup or None)"""
+        if self.fsync:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        self.file.close()
+        try:
+            current = os.stat(self.path)
+        except OSError:
+            current = None
+        if current is not None and file_digest(self.path) == self.digest.hexdigest():
+            self.discard()
+            return False, None
+
+        if current is not None:
+            os.chmod(self.tmp_path, current.st_mode & 0o7777)
+            try:
+                os.chown(self.tmp_path, current.st_uid, current.st_gid)
+            except OSError:
+                # Only root may give the file away, it then belongs to whoever wrote it
+                pass
+        else:
+            mode = self.mode
+            if mode is None:
+                umask = os.umask(0)
+                os.umask(umask)
+                mode = 0o666 & ~umask
+            os.chmod(self.tmp_path, mode)
+
+        backup_path = backup_file(self.path) if backup and current is not None else None
+        os.rename(self.tmp_path, self.path)
+        self.tmp_path = None
+        if self.fsync:
+            # The rename itself is only durable once the directory is synced
+            fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        return True, backup_path
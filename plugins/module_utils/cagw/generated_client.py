@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c), Entrust Corporation, 2023
+# Author: Sapna Jain, Entrust
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+# Generated from roles/cagw_certificate/files/cagw-api.yaml by tools/generate_cagw_client.py, do not edit.
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import json
+
+from ansible.module_utils.six.moves.urllib.parse import urlencode
+
+# SHA-256 of the specification the operations were generated from, a session only uses them for that specification
+SPEC_SHA256 = "4f422a2523671f31dff724b80f7819bd1445aa4d7b5741de77b546521d871f1b"
+
+# The operations of the ref-resolved specification, which the session compiles its descriptors and validators from
+SPEC = {
+    'basePath': '/cagw/v1/certificate-authorities',
+    'paths': {
+        '/{ca_id}/certificate-events': {
+            'get': {
+                'operationId': 'GetCertificateEvents',
+                'parameters': [
+                    {
+                        'in': 'path',
+                        'name': 'ca_id',
+                        'required': True,
+                        'type': 'string',
+                    },
+                    {
+                        'format': 'date-time',
+                        'in': 'query',
+                        'name': 'startDate',
+                        'required': True,
+                        'type': 'string',
+                    },
+                    {
+                        'format': 'date-time',
+                        'in': 'query',
+                        'name': 'endDate',
+                        'required': False,
+                        'type': 'string',
+                    },
+                    {
+                        'in': 'query',
+                        'name': 'pageIndex',
+                        'required': False,
+                        'type': 'integer',
+                    },
+                    {
+                        'in': 'query',
+                        'name': 'pageSize',
+                        'required': False,
+                        'type': 'integer',
+                    },
+                ],
+            },
+        },
+        '/{ca_id}/certificates/{serial_no}': {
+            'get': {
+                'operationId': 'GetCertificate',
+                'parameters': [
+                    {
+                        'in': 'path',
+                        'name': 'ca_id',
+                        'required': True,
+                        'type': 'string',
+                    },
+                    {
+                        'in': 'path',
+                        'name': 'serial_no',
+                        'required': True,
+                        'type': 'string',
+                    },
+                ],
+            },
+        },
+        '/{ca_id}/certificates/{serial_no}/actions': {
+            'post': {
+                'operationId': 'ActionOnCertificate',
+                'parameters': [
+                    {
+                        'in': 'path',
+                        'name': 'ca_id',
+                        'required': True,
+                        'type': 'string',
+                    },
+                    {
+                        'in': 'path',
+                        'name': 'serial_no',
+                        'required': True,
+                        'type': 'string',
+                    },
+                    {
+                        'in': 'body',
+                        'name': 'Body',
+                        'required': True,
+                        'schema': {
+                            'properties': {
+                                'action': {
+                                    'properties': {
+                                        'reason': {
+                                            'type': 'string',
+                                            'x-nullable': True,
+                                        },
+                                        'type': {
+                                            'enum': [
+                                                'RevokeAction',
+                                                'HoldAction',
+                                                'UnholdAction',
+                                            ],
+                                            'type': 'string',
+                                        },
+                                    },
+                                    'required': [
+                                        'type',
+                                    ],
+                                    'type': 'object',
+                                },
+                            },
+                            'required': [
+                                'action',
+                            ],
+                            'type': 'object',
+                        },
+                    },
+                ],
+            },
+        },
+        '/{ca_id}/enrollments': {
+            'post': {
+                'operationId': 'NewCertRequest',
+                'parameters': [
+                    {
+                        'in': 'path',
+                        'name': 'ca_id',
+                        'required': True,
+                        'type': 'string',
+                    },
+                    {
+                        'in': 'body',
+                        'name': 'Body',
+                        'required': True,
+                        'schema': {
+                            'properties': {
+                                'csr': {
+                                    'minLength': 1,
+                                    'type': 'string',
+                                },
+                                'optionalCertificateRequestDetails': {
+                                    'properties': {
+                                        'subjectDn': {
+                                            'type': 'string',
+                                            'x-nullable': True,
+                                        },
+                                        'validityPeriod': {
+                                            'pattern': '^[^/\\s]+(/[^/\\s]+)?$',
+                                            'type': 'string',
+                                        },
+                                    },
+                                    'type': 'object',
+                                },
+                                'profileId': {
+                                    'minLength': 1,
+                                    'type': 'string',
+                                },
+                                'properties': {
+                                    'type': 'object',
+                                },
+                                'requiredFormat': {
+                                    'properties': {
+                                        'format': {
+                                            'enum': [
+                                                'X509',
+                                                'PKCS12',
+                                            ],
+                                            'type': 'string',
+                                        },
+                                        'protection': {
+                                            'properties': {
+                                                'password': {
+                                                    'format': 'password',
+                                                    'minLength': 1,
+                                                    'type': 'string',
+                                                },
+                                                'type': {
+                                                    'enum': [
+                                                        'PasswordProtection',
+                                                    ],
+                                                    'type': 'string',
+                                                },
+                                            },
+                                            'required': [
+                                                'type',
+                                                'password',
+                                            ],
+                                            'type': 'object',
+                                        },
+                                    },
+                                    'required': [
+                                        'format',
+                                    ],
+                                    'type': 'object',
+                                },
+                                'subjectAltNames': {
+                                    'items': {
+                                        'properties': {
+                                            'type': {
+                                                'enum': [
+                                                    'dNSName',
+                                                    'iPAddress',
+                                                    'directoryName',
+                                                    'uniformResourceIdentifier',
+                                                    'rfc822Name',
+                                                ],
+                                                'type': 'string',
+                                            },
+                                            'value': {
+                                                'minLength': 1,
+                                                'type': 'string',
+                                            },
+                                        },
+                                        'required': [
+                                            'type',
+                                            'value',
+                                        ],
+                                        'type': 'object',
+                                    },
+                                    'type': 'array',
+                                },
+                            },
+                            'required': [
+                                'profileId',
+                                'requiredFormat',
+                            ],
+                            'type': 'object',
+                        },
+                    },
+                ],
+            },
+        },
+    },
+    'schemes': [
+        'https',
+    ],
+}
+
+
+class GeneratedOperations(object):
+    """ One method per operation of the specification, mixed into api.GeneratedResource.
+
+    The URLs are formatted from templates built once here, the arguments are checked by _check and the
+    request is sent by _send, with the retries, validation and tracing of the session.
+    """
+
+    def ActionOnCertificate(self, ca_id=None, serial_no=None, Body=None, host=None, port=None, validate_certs=True, profiler=None):
+        """Take an action on certificate, POST /{ca_id}/certificates/{serial_no}/actions
+
+        Arguments:
+            ca_id (string, path, required): CA ID of the certificate
+            serial_no (string, path, required): Serial number of the certificate
+            Body (ActionOnCertificate, body, required): Certificate request
+        """
+        self._check("ActionOnCertificate", dict(ca_id=ca_id, serial_no=serial_no, Body=Body))
+        if not ca_id:
+            raise KeyError("ca_id")
+        if not serial_no:
+            raise KeyError("serial_no")
+        url = "https://{0}:{1}/cagw/v1/certificate-authorities/{2}/certificates/{3}/actions".format(host, port, ca_id, serial_no)
+        data = json.dumps(Body) if Body else None
+        return self._send("ActionOnCertificate", url, data, validate_certs, profiler)
+
+    def GetCertificate(self, ca_id=None, serial_no=None, host=None, port=None, validate_certs=True, profiler=None):
+        """Get a Certificate based on serial number, GET /{ca_id}/certificates/{serial_no}
+
+        Arguments:
+            ca_id (string, path, required): CA ID of the certificate
+            serial_no (string, path, required): Serial number of the certificate
+        """
+        self._check("GetCertificate", dict(ca_id=ca_id, serial_no=serial_no))
+        if not ca_id:
+            raise KeyError("ca_id")
+        if not serial_no:
+            raise KeyError("serial_no")
+        url = "https://{0}:{1}/cagw/v1/certificate-authorities/{2}/certificates/{3}".format(host, port, ca_id, serial_no)
+        data = None
+        return self._send("GetCertificate", url, data, validate_certs, profiler)
+
+    def GetCertificateEvents(self, ca_id=None, startDate=None, endDate=None, pageIndex=None, pageSize=None, host=None, port=None, validate_certs=True,
+                             profiler=None):
+        """List the events of the certificates of a CA, e.g. their issuance or revocation, GET /{ca_id}/certificate-events
+
+        Arguments:
+            ca_id (string, path, required): CA ID of the certificates
+            startDate (date-time, query, required): Start of the period of the events, in ISO 8601 format
+            endDate (date-time, query): End of the period of the events, in ISO 8601 format, now by default
+            pageIndex (integer, query): Index of the page, 0 by default
+            pageSize (integer, query): Maximum number of events in a page
+        """
+        self._check("GetCertificateEvents", dict(ca_id=ca_id, startDate=startDate, endDate=endDate, pageIndex=pageIndex, pageSize=pageSize))
+        if not ca_id:
+            raise KeyError("ca_id")
+        url = "https://{0}:{1}/cagw/v1/certificate-authorities/{2}/certificate-events".format(host, port, ca_id)
+        query = [
+            ("startDate", startDate),
+            ("endDate", endDate),
+            ("pageIndex", pageIndex),
+            ("pageSize", pageSize),
+        ]
+        query = [(name, value) for name, value in query if value is not None and value != ""]
+        if query:
+            url += "?" + urlencode(query)
+        data = None
+        return self._send("GetCertificateEvents", url, data, validate_certs, profiler)
+
+    def NewCertRequest(self, ca_id=None, Body=None, host=None, port=None, validate_certs=True, profiler=None):
+        """Get a Certificate, POST /{ca_id}/enrollments
+
+        Arguments:
+            ca_id (string, path, required): CA ID of the certificate
+            Body (NewCertificateRequest, body, required): Certificate request
+        """
+        self._check("NewCertRequest", dict(ca_id=ca_id, Body=Body))
+        if not ca_id:
+            raise KeyError("ca_id")
+        url = "https://{0}:{1}/cagw/v1/certificate-authorities/{2}/enrollments".format(host, port, ca_id)
+        data = json.dumps(Body) if Body else None
+        return self._send("NewCertRequest", url, data, validate_certs, profiler)
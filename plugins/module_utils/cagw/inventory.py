@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c), Entrust Corporation, 2023
+# Author: Sapna Jain, Entrust
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import os
+import sqlite3
+import threading
+
+from datetime import datetime, timedelta, timezone
+
+from ansible.module_utils.six.moves.urllib.request import pathname2url
+
+# Columns of a certificate besides its key (ca_id, serial_number), in the order they are returned
+COLUMNS = ('path', 'profile_id', 'enrollment_format', 'not_before', 'not_after', 'status', 'fingerprint', 'updated')
+
+# Every statement is idempotent, an inventory created by an older version gets the new indexes
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS certificates (
+    ca_id TEXT NOT NULL,
+    serial_number TEXT NOT NULL,
+    path TEXT,
+    profile_id TEXT,
+    enrollment_format TEXT,
+    not_before TEXT,
+    not_after TEXT,
+    status TEXT,
+    fingerprint TEXT,
+    updated TEXT NOT NULL,
+    PRIMARY KEY (ca_id, serial_number)
+);
+CREATE INDEX IF NOT EXISTS certificates_not_after ON certificates (not_after);
+CREATE INDEX IF NOT EXISTS certificates_path ON certificates (path);
+'''
+
+# Dates are stored as text which sorts like the dates do, in UTC, e.g. 2025-04-22T09:00:00Z
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+
+def format_date(value):
+    """A timezone aware datetime as stored in the inventory, None stays None"""
+    if value is None:
+        return None
+    return value.astimezone(timezone.utc).strftime(DATE_FORMAT)
+
+
+class Inventory(object):
+    """ Local SQLite record of the certificates requested through the modules.
+
+    Certificates are keyed by CA and serial number, and indexed by expiry and path, so that the certificates
+    expiring soon, or the one last requested for a path, are found without asking CAGW.
+    A single connection is shared by the threads of cagw_certificate_batch, one statement at a time.
+    A read_only inventory must exist already, it is neither created nor migrated, e.g. in check mode.
+    """
+
+    def __init__(self, path, timeout=30, read_only=False):
+        self.path = path
+        self.lock = threading.Lock()
+        if read_only:
+            # SQLite then fails to open a missing inventory rather than create it, and refuses any write
+            database, uri = 'file:{0}?mode=ro'.format(pathname2url(os.path.abspath(path))), True
+        else:
+            directory = os.path.dirname(os.path.abspath(path))
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            database, uri = path, False
+        # Autocommit, every record is a single statement; several hosts or tasks may wait up to timeout for the lock
+        self.connection = sqlite3.connect(database, timeout=timeout, isolation_level=None, check_same_thread=False, uri=uri)
+        self.connection.row_factory = sqlite3.Row
+        if not read_only:
+            with self.lock:
+                self.connection.executescript(SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def record(self, ca_id, serial_number, **columns):
+        """Insert or update the certificate, the columns which are None keep their recorded value"""
+        columns = dict((name, value) for name, value in columns.items() if name in COLUMNS and value is not None)
+        columns['updated'] = format_date(datetime.now(timezone.utc))
+        # CAGW connectors spell the statuses in either case
+        if 'status' in columns:
+            columns['status'] = columns['status'].lower()
+        key = (ca_id, serial_number.upper())
+        with self.lock:
+            self.connection.execute('INSERT OR IGNORE INTO certificates (ca_id, serial_number, updated) VALUES (?, ?, ?)',
+                                    key + (columns['updated'],))
+            self.connection.execute('UPDATE certificates SET {0} WHERE ca_id = ? AND serial_number = ?'.format(
+                ', '.join('{0} = ?'.format(name) for name in columns)), tuple(columns.values()) + key)
+
+    def _select(self, where='', parameters=(), suffix=''):
+        query = 'SELECT ca_id, serial_number, {0} FROM certificates'.format(', '.join(COLUMNS))
+        if where:
+            query += ' WHERE ' + where
+        with self.lock:
+            return [dict(row) for row in self.connection.execute(query + suffix, parameters)]
+
+    def get(self, ca_id, serial_number):
+        """The recorded certificate, None if it is unknown"""
+        rows = self._select('ca_id = ? AND serial_number = ?', (ca_id, serial_number.upper()))
+        return rows[0] if rows else None
+
+    def last_at_path(self, path, ca_id=None):
+        """The certificate first recorded last for path, i.e. the one last issued for it, None if there is none"""
+        where, parameters = 'path = ?', (path,)
+        if ca_id:
+            where, parameters = where + ' AND ca_id = ?', parameters + (ca_id,)
+        # Not by updated, which also changes when an older certificate is e.g. revoked
+        rows = self._select(where, parameters, ' ORDER BY rowid DESC LIMIT 1')
+        return rows[0] if rows else None
+
+    def search(self, ca_id=None, path=None, serial_number=None, expiring_within=None, statuses=None):
+        """The certificates matching every given criterion, those expiring first first.
+
+        expiring_within is a number of days from now, expired certificates are included.
+        """
+        conditions, parameters = [], []
+        for column, value in (('ca_id', ca_id), ('path', path), ('serial_number', serial_number and serial_number.upper())):
+            if value:
+                conditions.append('{0} = ?'.format(column))
+                parameters.append(value)
+        if expiring_within is not None:
+            conditions.append('not_after < ?')
+            parameters.append(format_date(datetime.now(timezone.utc) + timedelta(days=expiring_within)))
+        if statuses:
+            conditions.append('lower(status) IN ({0})'.format(', '.join('?' * len(statuses))))
+            parameters.extend(status.lower() for status in statuses)
+        return self._select(' AND '.join(conditions), tuple(parameters), ' ORDER BY not_after, ca_id, serial_number')
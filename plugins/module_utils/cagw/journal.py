@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c), Entrust Corporation, 2023
+# Author: Sapna Jain, Entrust
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import json
+import os
+import sqlite3
+
+from datetime import datetime, timezone
+
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.inventory import format_date
+
+# The index of a journal is this file next to it, rebuilt from the journal when it is missing or out of date
+INDEX_SUFFIX = '.index'
+
+# Keys of the completed actions, and how much of which journal they were read from
+INDEX_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS completed (
+    ca_id TEXT NOT NULL,
+    serial_number TEXT NOT NULL,
+    action_type TEXT NOT NULL,
+    PRIMARY KEY (ca_id, serial_number, action_type)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS journal (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    inode INTEGER NOT NULL,
+    offset INTEGER NOT NULL
+);
+CREATE TEMP TABLE IF NOT EXISTS started (
+    ca_id TEXT NOT NULL,
+    serial_number TEXT NOT NULL,
+    action_type TEXT NOT NULL,
+    PRIMARY KEY (ca_id, serial_number, action_type)
+) WITHOUT ROWID;
+'''
+
+# The index is committed every so many entries, a run which is interrupted reads the entries after it again
+COMMIT_EVERY = 1000
+
+
+class ActionJournal(object):
+    """ Append only record of the actions taken by cagw_certificate_bulk_action, one JSON object per line.
+
+    Every action is written as soon as CAGW answered it, so that a run which is interrupted, or which failed
+    for some certificates, can be started again with the same journal: the actions which completed are not sent again.
+    The keys of the completed actions, and of those started in this run, are looked up in a SQLite index on disk
+    rather than kept in memory. The index is path followed by INDEX_SUFFIX, it only reads the entries appended
+    to the journal since it was last updated.
+    A journal which is not writable, e.g. in check mode, is only read and never created, its index is then
+    a temporary database. Without a path nothing is recorded, only the actions started in this run are known.
+    """
+
+    def __init__(self, path, fsync=False, writable=True):
+        self.path = path
+        self.fsync = fsync
+        self.file = None
+        self.uncommitted = 0
+        if path and writable:
+            directory = os.path.dirname(os.path.abspath(path))
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            index_path = path + INDEX_SUFFIX
+        else:
+            # An empty name is a temporary database on disk, which SQLite deletes once it is closed
+            index_path = ''
+        self.index = sqlite3.connect(index_path, timeout=30)
+        # The temporary table of the started actions is on disk as well
+        self.index.execute('PRAGMA temp_store = FILE')
+        self.index.executescript(INDEX_SCHEMA)
+        if path and writable:
+            self.file = open(path, 'ab')
+        # An interrupted run may have left half a line, the next entry starts on a line of its own
+        if path and self.update_index() and self.file is not None:
+            self.file.write(b'\n')
+
+    def update_index(self):
+        """Index the completed actions of the entries appended since the last update, True if the journal ends with half a line"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            stat = None
+        row = self.index.execute('SELECT inode, offset FROM journal').fetchone()
+        # Another journal, or the same one written again from the start, is indexed again
+        if row is None or stat is None or row[0] != stat.st_ino or row[1] > stat.st_size:
+            self.index.execute('DELETE FROM completed')
+            self.index.execute('DELETE FROM journal')
+            offset = 0
+        else:
+            offset = row[1]
+        half_line = False
+        if stat is not None:
+            with open(self.path, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        half_line = True
+                        break
+                    offset += len(line)
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if not isinstance(entry, dict) or entry.get('status') != 'completed':
+                        continue
+                    ca_id, serial_number, action_type = entry.get('ca_id'), entry.get('serial_number'), entry.get('action_type')
+                    if all(isinstance(value, str) for value in (ca_id, serial_number, action_type)):
+                        self.index.execute('INSERT OR IGNORE INTO completed VALUES (?, ?, ?)', self.key(ca_id, serial_number, action_type))
+            self.index.execute('INSERT OR REPLACE INTO journal (id, inode, offset) VALUES (0, ?, ?)', (stat.st_ino, offset))
+        self.index.commit()
+        return half_line
+
+    @staticmethod
+    def key(ca_id, serial_number, action_type):
+        return ca_id, serial_number.upper(), action_type
+
+    def is_completed(self, ca_id, serial_number, action_type):
+        """Whether the action on the certificate completed in this run or an earlier one"""
+        return self.index.execute('SELECT 1 FROM completed WHERE ca_id = ? AND serial_number = ? AND action_type = ?',
+                                  self.key(ca_id, serial_number, action_type)).fetchone() is not None
+
+    def start(self, ca_id, serial_number, action_type):
+        """Claim the action on the certificate for this run, False if it completed already or was started earlier in this run"""
+        if self.is_completed(ca_id, serial_number, action_type):
+            return False
+        return self.index.execute('INSERT OR IGNORE INTO started VALUES (?, ?, ?)', self.key(ca_id, serial_number, action_type)).rowcount == 1
+
+    def append(self, ca_id, serial_number, action_type, status, **fields):
+        """Record the outcome of an action, status is completed or failed, fields are added to the entry"""
+        if status == 'completed':
+            self.index.execute('INSERT OR IGNORE INTO completed VALUES (?, ?, ?)', self.key(ca_id, serial_number, action_type))
+        if self.file is not None:
+            entry = dict(fields, ca_id=ca_id, serial_number=serial_number, action_type=action_type, status=status,
+                         time=format_date(datetime.now(timezone.utc)))
+            self.file.write((json.dumps(entry, sort_keys=True) + '\n').encode('utf-8'))
+            self.file.flush()
+            if self.fsync:
+                os.fsync(self.file.fileno())
+            # The journal is written first, an index which is behind it only reads the entries again
+            self.index.execute('UPDATE journal SET offset = ?', (self.file.tell(),))
+        self.uncommitted += 1
+        if self.uncommitted >= COMMIT_EVERY:
+            self.index.commit()
+            self.uncommitted = 0
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+        self.index.commit()
+        self.index.close()
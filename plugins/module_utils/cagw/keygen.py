@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c), Entrust Corporation, 2023
+# Author: Sapna Jain, Entrust
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import base64
+import ipaddress
+import multiprocessing
+import os
+import traceback
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+CRYPTOGRAPHY_IMP_ERR = None
+try:
+    from cryptography import x509
+    from cryptography.hazmat.backends import default_backend as cryptography_backend
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+    from cryptography.x509.oid import NameOID
+except ImportError:
+    CRYPTOGRAPHY_IMP_ERR = traceback.format_exc()
+else:
+    # Attribute types of a distinguished name, e.g. CN=www.example.com,O=Example,C=US
+    NAME_OIDS = {
+        'CN': NameOID.COMMON_NAME,
+        'O': NameOID.ORGANIZATION_NAME,
+        'OU': NameOID.ORGANIZATIONAL_UNIT_NAME,
+        'C': NameOID.COUNTRY_NAME,
+        'ST': NameOID.STATE_OR_PROVINCE_NAME,
+        'L': NameOID.LOCALITY_NAME,
+        'STREET': NameOID.STREET_ADDRESS,
+        'DC': NameOID.DOMAIN_COMPONENT,
+        'UID': NameOID.USER_ID,
+        'SERIALNUMBER': NameOID.SERIAL_NUMBER,
+        'E': NameOID.EMAIL_ADDRESS,
+        'EMAILADDRESS': NameOID.EMAIL_ADDRESS,
+    }
+
+
+def generate_private_key(key_type='RSA', key_size=2048, curve='secp256r1'):
+    if key_type == 'RSA':
+        return rsa.generate_private_key(public_exponent=65537, key_size=key_size, backend=cryptography_backend())
+    if key_type == 'ECC':
+        return ec.generate_private_key(getattr(ec, curve.upper())(), cryptography_backend())
+    if key_type == 'Ed25519':
+        return ed25519.Ed25519PrivateKey.generate()
+    raise ValueError('Unsupported private key type {0}'.format(key_type))
+
+
+def generate_private_key_pem(key_type='RSA', key_size=2048, curve='secp256r1'):
+    """Generate a private key as unencrypted PKCS#8 PEM, which unlike the key object can be sent back by a worker process"""
+    return generate_private_key(key_type, key_size, curve).private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+
+
+def generate_private_keys(specs, workers=None):
+    """Generate a private key for every (key_type, key_size, curve) of specs, in the same order.
+
+    RSA keys take long to generate, when there are several of them they are generated by a pool of
+    worker processes, one per CPU by default. Elliptic curve keys are generated in this process.
+    """
+    specs = list(specs)
+    pems = [None] * len(specs)
+    slow = [index for index, spec in enumerate(specs) if spec[0] == 'RSA']
+    workers = min(workers or os.cpu_count() or 1, len(slow))
+    if workers > 1:
+        try:
+            # Forked workers inherit the modules of the AnsiballZ payload, which a spawned interpreter could not import
+            context = multiprocessing.get_context('fork')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+                for index, pem in zip(slow, executor.map(generate_private_key_pem, *zip(*[specs[index] for index in slow]))):
+                    pems[index] = pem
+        except (ValueError, OSError, NotImplementedError, BrokenProcessPool):
+            # No fork or no semaphores for the pool on this platform, or a worker died: generate the rest here
+            pass
+    keys = []
+    for spec, pem in zip(specs, pems):
+        if pem is None:
+            keys.append(generate_private_key(*spec))
+        else:
+            keys.append(serialization.load_pem_private_key(pem, password=None, backend=cryptography_backend()))
+    return keys
+
+
+def load_private_key(path, passphrase=None):
+    with open(path, 'rb') as f:
+        content = f.read()
+    return serialization.load_pem_private_key(content, password=passphrase.encode('utf-8') if passphrase else None,
+                                              backend=cryptography_backend())
+
+
+def write_private_key(path, key, passphrase=None):
+    """Write key to path in PEM, readable only by its owner"""
+    if passphrase:
+        encryption = serialization.BestAvailableEncryption(passphrase.encode('utf-8'))
+    else:
+        encryption = serialization.NoEncryption()
+    content = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, encryption)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(content)
+
+
+def _split_dn(dn, separator):
+    parts, current, escaped = [], [], False
+    for char in dn:
+        if escaped:
+            current.append(char)
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif char == separator:
+            parts.append(''.join(current))
+            current = []
+        else:
+            current.append(char)
+    parts.append(''.join(current))
+    return [part for part in parts if part.strip()]
+
+
+def parse_dn(dn):
+    """Parse a distinguished name into an x509.Name.
+
+    Both the RFC 4514 form, most specific first as in CN=www.example.com,O=Example,C=US, and the OpenSSL
+    form, most general first as in /C=US/O=Example/CN=www.example.com, are accepted.
+    """
+    if dn.startswith('/'):
+        parts = _split_dn(dn, '/')
+    else:
+        parts = list(reversed(_split_dn(dn, ',')))
+    attributes = []
+    for part in parts:
+        name, separator, value = part.partition('=')
+        name = name.strip()
+        if not separator or not name:
+            raise ValueError('Invalid attribute {0} in the distinguished name {1}'.format(part, dn))
+        oid = NAME_OIDS.get(name.upper())
+        if oid is None:
+            if not all(item.isdigit() for item in name.split('.')):
+                raise ValueError('Unsupported attribute type {0} in the distinguished name {1}'.format(name, dn))
+            oid = x509.ObjectIdentifier(name)
+        attributes.append(x509.NameAttribute(oid, value.strip()))
+    return x509.Name(attributes)
+
+
+def subject_alt_names(subject_alt_name):
+    """The x509 general names of the subject_alt_name option"""
+    names = []
+    for option, value in (subject_alt_name or {}).items():
+        if not value:
+            continue
+        if option == 'dNSName':
+            names.append(x509.DNSName(value))
+        elif option == 'iPAddress':
+            names.append(x509.IPAddress(ipaddress.ip_address(value)))
+        elif option == 'rfc822Name':
+            names.append(x509.RFC822Name(value))
+        elif option == 'uniformResourceIdentifier':
+            names.append(x509.UniformResourceIdentifier(value))
+        elif option == 'directoryName':
+            names.append(x509.DirectoryName(parse_dn(value)))
+    return names
+
+
+def build_csr(key, dn=None, subject_alt_name=None):
+    """Build and sign a CSR for key, with the subject dn and the subject alternative names of subject_alt_name"""
+    names = subject_alt_names(subject_alt_name)
+    if not dn and not names:
+        raise ValueError('A CSR needs a subject, dn or subject_alt_name must be set')
+    builder = x509.CertificateSigningRequestBuilder().subject_name(parse_dn(dn) if dn else x509.Name([]))
+    if names:
+        builder = builder.add_extension(x509.SubjectAlternativeName(names), critical=not dn)
+    # Ed25519 signs the message itself and takes no separate hash algorithm
+    algorithm = None if isinstance(key, ed25519.Ed25519PrivateKey) else hashes.SHA256()
+    return builder.sign(key, algorithm, cryptography_backend())
+
+
+def csr_body(csr):
+    """The csr of an enrollment request: the base64 of the DER encoding of the CSR, i.e. its PEM without the armor"""
+    return base64.b64encode(csr.public_bytes(serialization.Encoding.DER)).decode('ascii')
+
+
+def load_csr_body(path):
+    """The csr of an enrollment request from a CSR file in PEM or DER, raise ValueError if it is not a CSR"""
+    with open(path, 'rb') as f:
+        content = f.read()
+    if b'-----BEGIN' in content:
+        csr = x509.load_pem_x509_csr(content, cryptography_backend())
+    else:
+        csr = x509.load_der_x509_csr(content, cryptography_backend())
+    return csr_body(csr)
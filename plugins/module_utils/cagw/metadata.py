@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c), Entrust Corporation, 2023
+# Author: Sapna Jain, Entrust
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import hashlib
+import json
+import os
+
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.files import AtomicFile, file_digest
+
+# Bumped whenever the content of the sidecar changes, sidecars of another version are ignored
+METADATA_VERSION = 2
+
+
+def sidecar_path(path):
+    """The file caching the metadata of the certificate at path, hidden next to it"""
+    directory, name = os.path.split(path)
+    return os.path.join(directory, '.{0}.cagw-metadata.json'.format(name))
+
+
+def _stat_key(st):
+    return [st.st_ino, st.st_mtime_ns, st.st_size]
+
+
+def _read_sidecar(path):
+    try:
+        with open(sidecar_path(path), 'r') as f:
+            cached = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+    if not isinstance(cached, dict) or cached.get('version') != METADATA_VERSION:
+        return None
+    return cached
+
+
+def _write_sidecar(path, key, digest, metadata):
+    content = json.dumps(dict(version=METADATA_VERSION, stat=key, sha256=digest, certificate=metadata), sort_keys=True)
+    try:
+        with AtomicFile(sidecar_path(path)) as f:
+            f.write(content.encode('utf-8'))
+            f.commit()
+    except (IOError, OSError):
+        # Only a cache, a directory we cannot write to costs a parse on every run
+        pass
+
+
+def read_certificate_metadata(path, cache=False, write=True):
+    """The metadata of the certificate at path, see support.parse_certificate_metadata, and whether it came from the cache.
+
+    With cache, the metadata is kept in a sidecar file along with the inode, modification time, size and
+    SHA-256 of path. While the first three are the same, path is not even read. When only its content is the same,
+    e.g. it was copied again, the sidecar is refreshed without parsing path.
+    Without write, e.g. in check mode, an existing sidecar is used but no sidecar is written or refreshed.
+    Raises OSError when path cannot be read and ValueError when it does not hold a certificate.
+    """
+    key = _stat_key(os.stat(path))
+    cached = _read_sidecar(path) if cache else None
+    if cached is not None:
+        if cached.get('stat') == key:
+            return cached['certificate'], True
+        if cached.get('sha256') == file_digest(path):
+            if write:
+                _write_sidecar(path, key, cached['sha256'], cached['certificate'])
+            return cached['certificate'], True
+
+    # Imported only now, a hit of the cache does not need cryptography at all
+    from ansible_collections.entrust.crypto.plugins.module_utils.cagw.support import parse_certificate_metadata
+
+    with open(path, 'rb') as f:
+        content = f.read()
+    metadata = parse_certificate_metadata(content)
+    if cache and write:
+        _write_sidecar(path, key, hashlib.sha256(content).hexdigest(), metadata)
+    return metadata, False
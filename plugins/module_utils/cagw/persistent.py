@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c), Entrust Corporation, 2023
+# Author: Sapna Jain, Entrust
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import functools
+import os
+
+from ansible.module_utils.connection import Connection, ConnectionError
+
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.api import (
+    cagw_client_kwargs,
+    CAGWClient,
+    Resource,
+    SessionConfigurationException,
+)
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.exceptions import (
+    CircuitOpenException,
+    RequestValidationException,
+    RestOperationException,
+)
+
+# Exceptions raised in the process of the connection which are raised again in the module
+REMOTE_EXCEPTIONS = dict((cls.__name__, cls) for cls in (RestOperationException, CircuitOpenException, RequestValidationException))
+
+# Code of the JSON-RPC error of a method the persistent connection does not have, i.e. it is not entrust.crypto.cagw
+METHOD_NOT_FOUND = -32601
+
+# Arguments of CAGWClient naming local files, sent as absolute paths as the process of the connection has its own directory
+PATH_KWARGS = ("cagw_api_cert", "cagw_api_cert_key", "cagw_api_specification_path", "cagw_api_specification_cache_dir", "trace_path")
+
+
+def cagw_client_for(module, workers=1):
+    """The client a module sends its requests with, from the options of cagw_client_argument_spec().
+
+    When the module runs on the entrust.crypto.cagw persistent connection, this is a PersistentResource using the
+    session kept warm by the connection, with its spec, client certificate and TLS connections. A module sending its
+    requests from several workers creates a CAGWClient of its own, the connection serves one request at a time.
+    Raises SessionConfigurationException when the session cannot be created.
+    """
+    client_kwargs = cagw_client_kwargs(module.params)
+    socket_path = getattr(module, "_socket_path", None)
+    if socket_path and workers <= 1:
+        try:
+            return PersistentSession(Connection(socket_path), client_kwargs).client()
+        except ConnectionError as e:
+            # Another persistent connection, e.g. of a network device, the module opens its own session
+            if getattr(e, "code", None) != METHOD_NOT_FOUND:
+                raise SessionConfigurationException("Failed to use the persistent connection to CAGW: {0}".format(e))
+    return CAGWClient(**client_kwargs)
+
+
+def persistent_client_kwargs(client_kwargs):
+    """client_kwargs with absolute paths, as sent to the process of the connection"""
+    kwargs = dict(client_kwargs)
+    for name in PATH_KWARGS:
+        value = kwargs.get(name)
+        if value and not value.startswith("http"):
+            kwargs[name] = os.path.abspath(value)
+    return kwargs
+
+
+def raise_remote_error(error):
+    """Raise again an exception of a request which was sent by the process of the connection"""
+    cls = REMOTE_EXCEPTIONS.get(error.get("type"))
+    if cls is not None:
+        raise cls.from_error(error)
+    if error.get("type") == "SessionConfigurationException":
+        raise SessionConfigurationException(error.get("message"))
+    # The gateway could not be reached, as CONNECTION_ERRORS of a local session
+    raise OSError(error.get("message"))
+
+
+class PersistentSession(object):
+    """ Stand-in for the CAGWSession kept by the entrust.crypto.cagw connection for the same client options.
+
+    Every call of an operation is one request to the process of the connection, which sends it to CAGW with the
+    retries, circuit breaker and validation of its session. Only the counters of the calls of this client are kept here.
+    """
+
+    def __init__(self, connection, client_kwargs):
+        self.connection = connection
+        self.client_kwargs = persistent_client_kwargs(client_kwargs)
+        opened = self.connection.cagw_open(self.client_kwargs)
+        if opened.get("error"):
+            raise_remote_error(opened["error"])
+        # Zeros once another task built the session, the spec and client certificate are loaded already
+        self.setup_timings = opened["setup_timings"]
+        self.operations = frozenset(opened["operations"])
+        self.retries = 0
+        self.pool = PersistentPool(self)
+
+    def client(self):
+        return PersistentResource(self)
+
+    def pop_setup_timings(self):
+        timings, self.setup_timings = self.setup_timings, {}
+        return timings
+
+    def call(self, operation, profiler=None, **kwargs):
+        response = self.connection.cagw_request(self.client_kwargs, operation, kwargs)
+        self.retries += response["retries"]
+        if profiler is not None:
+            # The connect, request, response_parse and retry_wait of the attempts, measured by the connection
+            for phase, seconds in response["timings"].items():
+                profiler.add(phase, seconds)
+        if response.get("error"):
+            raise_remote_error(response["error"])
+        return response["result"]
+
+    def stats(self):
+        return self.connection.cagw_stats(self.client_kwargs)
+
+    def retry_stats(self):
+        stats = self.stats()["retry"]
+        # The circuit breaker is that of the connection, the retries those of this client
+        stats["retries"] = self.retries
+        return stats
+
+
+class PersistentPool(object):
+    """ The connection pool of the session of the connection, as far as its statistics go """
+
+    def __init__(self, session):
+        self.session = session
+
+    def stats(self):
+        return self.session.stats()["pool"]
+
+
+class PersistentResource(Resource):
+    """ Resource whose operations are sent by the entrust.crypto.cagw connection, see cagw_client_for """
+
+    def __getattr__(self, name):
+        if name.startswith("__") or "session" not in self.__dict__:
+            raise AttributeError(name)
+        if name not in self.session.operations:
+            raise AttributeError("{0} object has no operation {1}".format(type(self).__name__, name))
+        operation = functools.partial(self.session.call, name)
+        setattr(self, name, operation)
+        return operation
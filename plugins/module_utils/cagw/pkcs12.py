@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c), Entrust Corporation, 2023
+# Author: Sapna Jain, Entrust
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import base64
+import binascii
+import traceback
+
+CRYPTOGRAPHY_IMP_ERR = None
+try:
+    from cryptography.hazmat.backends import default_backend as cryptography_backend
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.serialization import pkcs12
+except ImportError:
+    CRYPTOGRAPHY_IMP_ERR = traceback.format_exc()
+
+# Characters of base64 decoded at a time, a multiple of 4 so that every chunk but the last decodes on its own
+BASE64_CHUNK_SIZE = 64 * 1024
+
+
+def write_base64(fh, data, chunk_size=BASE64_CHUNK_SIZE):
+    """Decode the base64 string data into the binary file fh, one chunk at a time.
+
+    Only a chunk of the decoded content is in memory at any time. Line breaks in data are ignored,
+    any other character outside of the base64 alphabet raises ValueError.
+    """
+    pending = ''
+    for offset in range(0, len(data), chunk_size):
+        chunk = pending + ''.join(data[offset:offset + chunk_size].split())
+        end = len(chunk) - len(chunk) % 4
+        try:
+            fh.write(base64.b64decode(chunk[:end], validate=True))
+        except binascii.Error as e:
+            raise ValueError('Invalid base64 content: {0}'.format(e))
+        pending = chunk[end:]
+    if pending:
+        raise ValueError('Invalid base64 content: truncated after {0} characters'.format(len(data)))
+
+
+def load_pkcs12(path, password=None):
+    """The (private key, certificate, additional certificates) of the PKCS12 file at path"""
+    with open(path, 'rb') as f:
+        content = f.read()
+    return pkcs12.load_key_and_certificates(content, password.encode('utf-8') if password else None, cryptography_backend())
+
+
+def write_certificates(path, certificates):
+    """Write certificates to path in PEM, one after the other"""
+    with open(path, 'wb') as f:
+        for certificate in certificates:
+            f.write(certificate.public_bytes(serialization.Encoding.PEM))
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c), Entrust Corporation, 2023
+# Author: Sapna Jain, Entrust
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import json
+import os
+import socket
+import threading
+import time
+import tracemalloc
+
+# Phases of a request reported by Profiler.result(), in seconds
+PHASES = ("spec_load", "client_build", "connect", "request", "response_parse", "retry_wait", "write")
+
+
+class Profiler(object):
+    """ Accumulates the time a request spends in each of PHASES.
+
+    With trace_memory, tracemalloc runs from start() to result() and the peak of the memory allocated
+    by Python in between is reported. tracemalloc slows every allocation down, so only profile on demand.
+    """
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.timings = dict.fromkeys(PHASES, 0.0)
+        self.started = None
+        self._started_tracemalloc = False
+
+    def start(self):
+        if self.started is None:
+            self.started = time.monotonic()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        return self
+
+    def add(self, phase, seconds):
+        self.timings[phase] += seconds
+
+    def add_setup(self, session):
+        """Charge the spec parsing and client construction of session, unless another request already paid for them"""
+        for phase, seconds in session.pop_setup_timings().items():
+            self.add(phase, seconds)
+
+    def add_call(self, record):
+        """Account for one attempt of a REST call, described by a record of RestOperation"""
+        self.add("connect", record["connect"])
+        self.add("request", record["duration"] - record["connect"] - record["response_parse"])
+        self.add("response_parse", record["response_parse"])
+
+    def result(self):
+        """The timings in seconds, with their total and the peak memory in bytes, stopping tracemalloc"""
+        result = dict((phase, round(seconds, 6)) for phase, seconds in self.timings.items())
+        if self.started is not None:
+            result["total"] = round(time.monotonic() - self.started, 6)
+        if self.trace_memory and tracemalloc.is_tracing():
+            result["tracemalloc_peak"] = tracemalloc.get_traced_memory()[1]
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+        return result
+
+
+class JsonlTraceWriter(object):
+    """ Trace hook appending every REST call as a line of JSON to path.
+
+    The lines of all processes tracing to the same file stay whole, as each one is written by a single
+    append, so the traces of a fleet can be collected in one place and aggregated later.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+        self.node = socket.gethostname()
+        self._lock = threading.Lock()
+        # Fail when the session is created rather than on its first request
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def __call__(self, record):
+        line = dict((key, round(value, 6) if isinstance(value, float) else value) for key, value in record.items())
+        line.update(node=self.node, pid=os.getpid())
+        data = (json.dumps(line, sort_keys=True) + "\n").encode("utf-8")
+        with self._lock:
+            os.write(self._fd, data)
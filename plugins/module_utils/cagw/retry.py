@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c), Entrust Corporation, 2023
+# Author: Sapna Jain, Entrust
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import random
+import socket
+import sys
+import threading
+import time
+
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from ansible.module_utils.six.moves import http_client
+
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.connection import ConnectTimeout, IDEMPOTENT_METHODS
+
+# Statuses of a gateway which is overloaded or cannot reach the CA, the request was not processed
+RETRYABLE_STATUSES = (429, 502, 503, 504)
+
+# Statuses which count as a failure of the gateway for the circuit breaker, a 429 only asks us to slow down
+GATEWAY_FAILURE_STATUSES = (502, 503, 504)
+
+# Failures before any response was received, the request may have been processed by the gateway.
+# EOFError covers asyncio.IncompleteReadError; asyncio.TimeoutError is the builtin TimeoutError, an OSError,
+# from Python 3.11 on, so asyncio is only imported for it on older versions
+if sys.version_info < (3, 11):
+    import asyncio
+    CONNECTION_ERRORS = (OSError, http_client.HTTPException, EOFError, asyncio.TimeoutError)
+else:
+    CONNECTION_ERRORS = (OSError, http_client.HTTPException, EOFError)
+
+# Failures to connect, the request never left this host
+CONNECT_ERRORS = (ConnectionRefusedError, socket.gaierror, ConnectTimeout)
+
+
+def parse_retry_after(value):
+    """Return the seconds to wait from a Retry-After header, given in seconds or as an HTTP date, None if absent or invalid"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if when is None:
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryPolicy(object):
+    """ When and how long to wait before an operation is sent again.
+
+    Exceptions which are instances of retry_errors, and responses with one of retry_statuses, are retried
+    after a jittered exponential backoff, or after the Retry-After of the response when it has one, never
+    waiting longer than max_delay.
+    """
+
+    def __init__(self, max_retries=3, backoff=0.5, max_delay=30.0, retry_statuses=RETRYABLE_STATUSES, retry_errors=CONNECTION_ERRORS):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_delay = max_delay
+        self.retry_statuses = tuple(retry_statuses)
+        self.retry_errors = tuple(retry_errors)
+
+    @classmethod
+    def for_method(cls, method, **kwargs):
+        """Default policy of an operation.
+
+        A non-idempotent operation, e.g. NewCertRequest, is only sent again when the previous attempt
+        could not even connect, any later failure might have been processed and would be duplicated.
+        """
+        if method.lower() not in IDEMPOTENT_METHODS:
+            kwargs.setdefault('retry_statuses', ())
+            kwargs.setdefault('retry_errors', CONNECT_ERRORS)
+        return cls(**kwargs)
+
+    def delay(self, attempt, retry_after=None):
+        """Seconds to wait before retry number attempt + 1"""
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        # Full jitter, so that the clients of an overloaded gateway do not come back all at once
+        return random.uniform(0, min(self.max_delay, self.backoff * (2 ** attempt)))
+
+    def retry_error(self, error, attempt):
+        # The URLError of a request sent through a proxy wraps the socket error
+        reason = getattr(error, "reason", None)
+        return attempt < self.max_retries and (isinstance(error, self.retry_errors) or isinstance(reason, self.retry_errors))
+
+    def retry_status(self, status, attempt):
+        return status in self.retry_statuses and attempt < self.max_retries
+
+
+# What CircuitBreaker.allow_request returns for the trial request of a half-open circuit, truthy as any request let through
+TRIAL = "trial"
+
+
+class CircuitBreaker(object):
+    """ Fail fast while the gateway is down, instead of sending every request and waiting for its retries.
+
+    After failure_threshold consecutive failures the circuit opens and requests are refused for reset_timeout
+    seconds. Then a single trial request is let through: the circuit closes again if it succeeds, and stays
+    open for another reset_timeout otherwise. A failure_threshold of 0 disables the breaker.
+    The trial must be resolved, by record_success, record_failure or, whatever it raised, resolve_trial.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.trips = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if self._trial or time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow_request(self):
+        """Whether a request may be sent now, TRIAL for the single request a half-open circuit lets through"""
+        if not self.failure_threshold:
+            return True
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if not self._trial and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._trial = True
+                return TRIAL
+            return False
+
+    def retry_in(self):
+        """Seconds until the open circuit lets a trial request through"""
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        if not self.failure_threshold:
+            return
+        with self._lock:
+            self._record_failure()
+
+    def _record_failure(self):
+        self.failures += 1
+        if self._trial or (self.opened_at is None and self.failures >= self.failure_threshold):
+            if self.opened_at is None:
+                self.trips += 1
+            self.opened_at = time.monotonic()
+            self._trial = False
+
+    def resolve_trial(self):
+        """Count the trial as a failure unless its outcome was recorded, e.g. it raised an error which is not a connection error"""
+        with self._lock:
+            if self._trial:
+                self._record_failure()
+
+    def stats(self):
+        return dict(
+            circuit_breaker_state=self.state,
+            circuit_breaker_trips=self.trips,
+        )
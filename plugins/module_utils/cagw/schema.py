@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c), Entrust Corporation, 2023
+# Author: Sapna Jain, Entrust
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import re
+
+# Python types of the swagger 2.0 types, bool is excluded from the numbers separately as it is an int
+SCHEMA_TYPES = {
+    "string": (str,),
+    "integer": (int,),
+    "number": (int, float),
+    "boolean": (bool,),
+    "array": (list, tuple),
+    "object": (dict,),
+}
+
+# A date and time of ISO 8601, as the format date-time of swagger
+DATE_TIME = re.compile(r"^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}(:?\d{2})?)?$", re.IGNORECASE)
+
+
+def _accept(value, path, errors):
+    pass
+
+
+def _describe(value):
+    text = repr(value)
+    return text if len(text) <= 40 else text[:37] + "..."
+
+
+def _conceal(value):
+    return "The value"
+
+
+def compile_schema(schema, secret=False):
+    """Compile a ref-resolved JSON schema of swagger 2.0 into a function(value, path, errors).
+
+    The function appends to the list errors a message, prefixed with path, for every way in which value does not
+    match the schema. The keywords are read once here, so that a call only runs the checks the schema needs.
+    Keywords which are not supported, and C($ref) pointers which were not resolved, accept any value.
+    The messages never quote a value of the format password, or of any schema within a secret one.
+    """
+    if not isinstance(schema, dict):
+        return _accept
+    secret = secret or schema.get("format") == "password"
+    describe = _conceal if secret else _describe
+    checks = []
+
+    enum = schema.get("enum")
+    if enum:
+        allowed = frozenset(value for value in enum if not isinstance(value, (dict, list)))
+        expected = ", ".join(str(value) for value in enum)
+
+        def check_enum(value, path, errors):
+            try:
+                found = value in allowed
+            except TypeError:
+                found = False
+            if not found:
+                errors.append("{0}: {1} is not one of {2}".format(path, describe(value), expected))
+
+        checks.append(check_enum)
+
+    type_name = schema.get("type")
+    if type_name is None:
+        # An untyped schema describing properties or items is checked as an object or an array
+        type_name = "object" if "properties" in schema else "array" if "items" in schema else None
+    if type_name == "string":
+        checks.extend(_string_checks(schema, describe))
+    elif type_name in ("integer", "number"):
+        checks.extend(_number_checks(schema, describe))
+    elif type_name == "array":
+        checks.extend(_array_checks(schema, secret))
+    elif type_name == "object":
+        checks.extend(_object_checks(schema, secret))
+
+    types = SCHEMA_TYPES.get(type_name)
+    nullable = schema.get("x-nullable", False)
+    if types is None and not checks:
+        return _accept
+    numeric = type_name in ("integer", "number")
+
+    def validate(value, path, errors):
+        if value is None and nullable:
+            return
+        if types is not None and (not isinstance(value, types) or (numeric and isinstance(value, bool))):
+            errors.append("{0}: {1} is not of type {2}".format(path, describe(value), type_name))
+            return
+        for check in checks:
+            check(value, path, errors)
+
+    return validate
+
+
+def _string_checks(schema, describe):
+    checks = []
+    min_length, max_length = schema.get("minLength"), schema.get("maxLength")
+    if min_length is not None or max_length is not None:
+
+        def check_length(value, path, errors):
+            if min_length is not None and len(value) < min_length:
+                errors.append("{0}: {1} is shorter than {2} characters".format(path, describe(value), min_length))
+            if max_length is not None and len(value) > max_length:
+                errors.append("{0}: {1} is longer than {2} characters".format(path, describe(value), max_length))
+
+        checks.append(check_length)
+    pattern = schema.get("pattern")
+    if pattern:
+        regex = re.compile(pattern)
+
+        def check_pattern(value, path, errors):
+            if not regex.search(value):
+                errors.append("{0}: {1} does not match {2}".format(path, describe(value), pattern))
+
+        checks.append(check_pattern)
+    if schema.get("format") == "date-time":
+
+        def check_date_time(value, path, errors):
+            if not DATE_TIME.match(value):
+                errors.append("{0}: {1} is not a date and time in ISO 8601 format".format(path, describe(value)))
+
+        checks.append(check_date_time)
+    return checks
+
+
+def _number_checks(schema, describe):
+    checks = []
+    minimum, maximum = schema.get("minimum"), schema.get("maximum")
+    if minimum is not None or maximum is not None:
+
+        def check_range(value, path, errors):
+            if minimum is not None and value < minimum:
+                errors.append("{0}: {1} is less than {2}".format(path, describe(value), minimum))
+            if maximum is not None and value > maximum:
+                errors.append("{0}: {1} is greater than {2}".format(path, describe(value), maximum))
+
+        checks.append(check_range)
+    return checks
+
+
+def _array_checks(schema, secret):
+    checks = []
+    min_items, max_items = schema.get("minItems"), schema.get("maxItems")
+    if min_items is not None or max_items is not None:
+
+        def check_size(value, path, errors):
+            if min_items is not None and len(value) < min_items:
+                errors.append("{0}: has fewer than {1} items".format(path, min_items))
+            if max_items is not None and len(value) > max_items:
+                errors.append("{0}: has more than {1} items".format(path, max_items))
+
+        checks.append(check_size)
+    items = compile_schema(schema.get("items"), secret)
+    if items is not _accept:
+
+        def check_items(value, path, errors):
+            for index, item in enumerate(value):
+                items(item, "{0}[{1}]".format(path, index), errors)
+
+        checks.append(check_items)
+    return checks
+
+
+def _object_checks(schema, secret):
+    checks = []
+    required = tuple(schema.get("required") or ())
+    if required:
+
+        def check_required(value, path, errors):
+            for name in required:
+                if value.get(name) is None:
+                    errors.append("{0}: {1} is required".format(path, name))
+
+        checks.append(check_required)
+    properties = tuple((name, compile_schema(property_schema, secret)) for name, property_schema in (schema.get("properties") or {}).items())
+    properties = tuple((name, validator) for name, validator in properties if validator is not _accept)
+    if properties:
+
+        def check_properties(value, path, errors):
+            for name, validator in properties:
+                # A required property which is None was reported already
+                if name in value and not (value[name] is None and name in required):
+                    validator(value[name], path + "." + name, errors)
+
+        checks.append(check_properties)
+    additional = schema.get("additionalProperties", True)
+    if additional is not True:
+        known = frozenset(schema.get("properties") or ())
+        additional_validator = compile_schema(additional, secret) if isinstance(additional, dict) else None
+
+        def check_additional(value, path, errors):
+            for name in value:
+                if name in known:
+                    continue
+                if additional_validator is None:
+                    errors.append("{0}: {1} is not an allowed property".format(path, name))
+                else:
+                    additional_validator(value[name], path + "." + name, errors)
+
+        checks.append(check_additional)
+    return checks
+
+
+def compile_parameters(operation_spec):
+    """Compile the parameters of an operation of the spec into a function(kwargs) returning the list of errors of a call.
+
+    The errors are prefixed with the name of the parameter, e.g. Body.requiredFormat.format.
+    """
+    parameters = []
+    for parameter in operation_spec.get("parameters") or []:
+        name = parameter.get("name")
+        if not name:
+            continue
+        if parameter.get("in") == "body":
+            validator = compile_schema(parameter.get("schema"))
+        else:
+            # The other parameters carry their type, enum, format... themselves
+            validator = compile_schema(parameter)
+        required = parameter.get("required", False) or parameter.get("in") == "path"
+        parameters.append((name, required, validator))
+    parameters = tuple(parameters)
+
+    def validate(kwargs):
+        errors = []
+        for name, required, validator in parameters:
+            value = kwargs.get(name)
+            if value is None or value == "":
+                if required:
+                    errors.append("{0} is required".format(name))
+                continue
+            validator(value, name, errors)
+        return errors
+
+    return validate
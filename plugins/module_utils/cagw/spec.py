@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c), Entrust Corporation, 2023
+# Author: Sapna Jain, Entrust
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import hashlib
+import importlib.util
+import json
+import os
+import tempfile
+import traceback
+
+from ansible.module_utils._text import to_bytes, to_native, to_text
+from ansible.module_utils.basic import missing_required_lib
+from ansible.module_utils.six.moves.urllib.error import HTTPError
+
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.exceptions import (
+    SessionConfigurationException,
+)
+
+# PyYAML is only imported by parse_spec: a specification served from the cache, or written in JSON, does without it
+YAML_IMP_ERR = None
+YAML_FOUND = importlib.util.find_spec("yaml") is not None
+
+# Bump whenever the layout of a cache entry or the ref resolution changes so stale entries are ignored
+SPEC_CACHE_VERSION = 1
+
+
+def resolve_refs(spec):
+    """Inline the local C($ref) pointers (C(#/...)) of a swagger document.
+
+    References that cannot be resolved, and references that would recurse into themselves,
+    are left untouched so the document stays serializable.
+    """
+
+    def lookup(ref):
+        node = spec
+        for part in ref[2:].split("/"):
+            part = part.replace("~1", "/").replace("~0", "~")
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return node
+
+    def resolve(node, seen):
+        if isinstance(node, dict):
+            ref = node.get("$ref")
+            if isinstance(ref, str) and ref.startswith("#/") and ref not in seen:
+                target = lookup(ref)
+                if target is not None:
+                    return resolve(target, seen + (ref,))
+            return dict((key, resolve(value, seen)) for key, value in node.items())
+        if isinstance(node, list):
+            return [resolve(item, seen) for item in node]
+        return node
+
+    return resolve(spec, ())
+
+
+def parse_spec(content, location):
+    """Parse the raw bytes of a JSON or YAML specification found at location."""
+    if location.endswith(".json"):
+        try:
+            return json.loads(to_text(content))
+        except ValueError as e:
+            raise SessionConfigurationException(to_native("OpenAPI specification {0} is not valid JSON: {1}".format(location, e)))
+
+    try:
+        import yaml
+    except ImportError:
+        raise SessionConfigurationException(to_native("{0}\n{1}".format(missing_required_lib("PyYAML"), traceback.format_exc())))
+    # libyaml's C loader is an order of magnitude faster than the pure Python one
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    try:
+        return yaml.load(content, Loader=loader)
+    except yaml.YAMLError as e:
+        raise SessionConfigurationException(to_native("OpenAPI specification {0} is not valid YAML: {1}".format(location, e)))
+
+
+class SpecCache(object):
+    """ On-disk cache of parsed, ref-resolved specifications.
+
+    An entry is keyed by the specification location. It is reused as-is while the modification time and
+    size of the source file are unchanged, and revalidated against the SHA-256 of the content otherwise,
+    so touching or re-copying an unchanged file does not cost a re-parse.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def _entry_path(self, location):
+        digest = hashlib.sha1(to_bytes(location, errors="surrogate_or_strict")).hexdigest()
+        return os.path.join(self.cache_dir, "spec-{0}.json".format(digest))
+
+    def get(self, location):
+        try:
+            with open(self._entry_path(location), "rb") as f:
+                entry = json.loads(to_text(f.read()))
+        except (IOError, OSError, ValueError):
+            return None
+        if not isinstance(entry, dict) or entry.get("version") != SPEC_CACHE_VERSION or entry.get("location") != location:
+            return None
+        return entry
+
+    def put(self, location, spec, sha256, mtime=None, size=None):
+        """Write the entry atomically. Failures are ignored, the cache is only an optimization."""
+        entry = {
+            "version": SPEC_CACHE_VERSION,
+            "location": location,
+            "mtime": mtime,
+            "size": size,
+            "sha256": sha256,
+            "spec": spec,
+        }
+        tmp_path = None
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir, 0o700)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".spec-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(to_bytes(json.dumps(entry, separators=(",", ":"))))
+            os.rename(tmp_path, self._entry_path(location))
+            tmp_path = None
+        except (IOError, OSError, TypeError, ValueError):
+            pass
+        finally:
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+
+def _read_spec_source(location):
+    if location.startswith("http"):
+        # Imported only now, a specification read from a file or the cache does not need it
+        from ansible.module_utils.urls import open_url
+
+        try:
+            response = open_url(location, timeout=120)
+            try:
+                return response.read()
+            finally:
+                response.close()
+        except HTTPError as e:
+            raise SessionConfigurationException(to_native("Error downloading specification from address '{0}', received error code '{1}'".format(
+                location, e.getcode())))
+    with open(location, "rb") as f:
+        return f.read()
+
+
+def load_spec(location, cache_dir=None):
+    """Return the parsed and ref-resolved specification at location (file path or URL).
+
+    When cache_dir is set the result is persisted there and served from the cache on subsequent calls.
+    """
+    cache = SpecCache(cache_dir) if cache_dir else None
+    is_url = location.startswith("http")
+    if not is_url:
+        location = os.path.abspath(location)
+
+    mtime = size = entry = None
+    if cache:
+        entry = cache.get(location)
+        if not is_url:
+            stat = os.stat(location)
+            mtime, size = stat.st_mtime, stat.st_size
+            if entry and entry.get("mtime") == mtime and entry.get("size") == size:
+                return entry["spec"]
+
+    content = _read_spec_source(location)
+    sha256 = hashlib.sha256(content).hexdigest()
+    if entry and entry.get("sha256") == sha256:
+        spec = entry["spec"]
+        if not is_url:
+            # Same content under a new timestamp, refresh the entry so the next lookup skips hashing
+            cache.put(location, spec, sha256, mtime, size)
+        return spec
+
+    spec = resolve_refs(parse_spec(content, location))
+    if cache:
+        cache.put(location, spec, sha256, mtime, size)
+    return spec
@@ -8,8 +8,11 @@
 from __future__ import absolute_import, division, print_function
 __metaclass__ = type
 
+import re
 import traceback
 
+from datetime import timezone
+
 CRYPTOGRAPHY_IMP_ERR = None
 try:
     from cryptography import x509
@@ -17,26 +20,110 @@ try:
 except ImportError:
     CRYPTOGRAPHY_IMP_ERR = traceback.format_exc()
 
+# A certificate of a PEM file, which may hold a whole chain, keys or text in between
+PEM_CERTIFICATE = re.compile(br'-----BEGIN CERTIFICATE-----.+?-----END CERTIFICATE-----', re.DOTALL)
+
+# Prefixes of the subject alternative names, as printed by openssl x509 -text
+GENERAL_NAME_PREFIXES = {
+    'DNSName': 'DNS',
+    'IPAddress': 'IP',
+    'RFC822Name': 'email',
+    'UniformResourceIdentifier': 'URI',
+    'DirectoryName': 'dirName',
+}
+
+
+def is_pem(content):
+    return b'-----BEGIN' in content
+
+
+def load_certificate(path, content=None, backend='cryptography', der_support_enabled=None):
+    """Load the specified certificate.
+
+    The encoding is detected from the content unless der_support_enabled selects DER (true) or PEM (false).
+    Of a PEM chain, the end-entity certificate is returned, see end_entity_certificate.
+    Raises OSError when path cannot be read and ValueError when it does not hold a certificate.
+    """
+    if content is None:
+        with open(path, 'rb') as cert_fh:
+            content = cert_fh.read()
+    if backend != 'cryptography':
+        raise ValueError('Unsupported backend {0}'.format(backend))
+    der = not is_pem(content) if der_support_enabled is None else der_support_enabled
+    return end_entity_certificate(load_certificates(content, der=der))
+
+
+def load_certificates(content, der=None):
+    """All the certificates of content: those of a PEM file in their order, or the one of a DER file.
+
+    Raises ValueError when content holds no certificate.
+    """
+    if der is None:
+        der = not is_pem(content)
+    if der:
+        return [x509.load_der_x509_certificate(content, cryptography_backend())]
+    blocks = PEM_CERTIFICATE.findall(content)
+    if not blocks:
+        raise ValueError('No PEM certificate found')
+    return [x509.load_pem_x509_certificate(block, cryptography_backend()) for block in blocks]
+
 
-def load_certificate(path, content=None, backend='cryptography', der_support_enabled=False):
-    """Load the specified certificate."""
+def end_entity_certificate(certificates):
+    """The certificate of a chain which issued none of the others, whatever the order of the chain"""
+    for cert in certificates:
+        if not any(other is not cert and other.issuer == cert.subject for other in certificates):
+            return cert
+    return certificates[0]
 
+
+def get_not_valid_before(cert):
+    """Return the start of the validity of a cryptography certificate as a timezone aware datetime."""
+    if hasattr(cert, 'not_valid_before_utc'):
+        return cert.not_valid_before_utc
+    return cert.not_valid_before.replace(tzinfo=timezone.utc)
+
+
+def get_not_valid_after(cert):
+    """Return the expiry of a cryptography certificate as a timezone aware datetime."""
+
+    # not_valid_after_utc exists since cryptography 42, not_valid_after is naive UTC and deprecated there
+    if hasattr(cert, 'not_valid_after_utc'):
+        return cert.not_valid_after_utc
+    return cert.not_valid_after.replace(tzinfo=timezone.utc)
+
+
+def subject_alt_names(cert):
+    """The subject alternative names of cert as strings, e.g. DNS:www.example.com"""
     try:
-        if content is None:
-            with open(path, 'rb') as cert_fh:
-                cert_content = cert_fh.read()
-        else:
-            cert_content = content
-    except (IOError, OSError) as exc:
-        pass
-    if backend == 'cryptography':
-        if der_support_enabled is False:
-            try:
-                return x509.load_pem_x509_certificate(cert_content, cryptography_backend())
-            except ValueError as exc:
-                pass
-        elif der_support_enabled:
-            try:
-                return x509.load_der_x509_certificate(cert_content, cryptography_backend())
-            except ValueError as exc:
-                pass
+        extension = cert.extensions.get_extension_for_class(x509.SubjectAlternativeName)
+    except x509.ExtensionNotFound:
+        return []
+    names = []
+    for name in extension.value:
+        prefix = GENERAL_NAME_PREFIXES.get(type(name).__name__)
+        if prefix is None:
+            continue
+        value = name.value.rfc4514_string() if isinstance(name, x509.DirectoryName) else name.value
+        names.append('{0}:{1}'.format(prefix, value))
+    return names
+
+
+def certificate_metadata(cert):
+    """What the modules need to know about cert, as a dict which can be serialized to JSON"""
+    return dict(
+        serial_number='{0:X}'.format(cert.serial_number),
+        not_before=get_not_valid_before(cert).isoformat(),
+        not_after=get_not_valid_after(cert).isoformat(),
+        subject=cert.subject.rfc4514_string(),
+        issuer=cert.issuer.rfc4514_string(),
+        subject_alt_names=subject_alt_names(cert),
+    )
+
+
+def parse_certificate_metadata(content):
+    """The metadata of the end-entity certificate of a PEM or DER file, with that of the rest of its chain in chain"""
+    certificates = load_certificates(content)
+    cert = end_entity_certificate(certificates)
+    metadata = certificate_metadata(cert)
+    metadata['chain'] = [certificate_metadata(other) for other in certificates if other is not cert]
+    return metadata
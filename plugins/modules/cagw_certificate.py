@@ -20,47 +20,112 @@ description:
     - Requires credentials for calling the CAGW API.
 notes:
     - C(path) must be specified as the output location of the certificate.
+    - Supports check mode, in which no request is sent to CAGW.
+    - O(path) is replaced atomically, through a temporary file in the same directory, and only when its content changes.
+      A O(request_type=get) which fetches the certificate already at O(path) is not reported as a change.
 requirements:
-    - cryptography >= 1.6
+    - cryptography >= 1.6, for O(request_type=new)
     - Ansible Core >= 2.14.0
     - Minimum Python Version = 3.6
+extends_documentation_fragment:
+    - ansible.builtin.files
+    - entrust.crypto.cagw_client
 options:
     force:
         description:
             - If O(force=true) then a certificate is requested regardless of whether I(path) points to an existing valid certificate.
         type: bool
         default: False
+    backup:
+        description:
+            - Create a backup file including the timestamp information so you can get the original certificate back
+              if you somehow clobbered it incorrectly.
+        type: bool
+        default: False
+        version_added: 1.1.0
+    fsync:
+        description:
+            - Flush the certificate and the directory entry of O(path) to disk before returning, so that a crash
+              right after the task cannot leave an empty or old file behind.
+            - Ignored when O(execution_mode=controller), where the certificate is copied by M(ansible.builtin.copy).
+        type: bool
+        default: False
+        version_added: 1.1.0
+    metadata_cache:
+        description:
+            - Cache the serial number, expiry, subject, subject alternative names and issuer of the certificate at O(path)
+              in a hidden file next to it, named after it as C(.<name>.cagw-metadata.json).
+            - The cache is keyed by the inode, modification time, size and SHA-256 of O(path), so a certificate which did
+              not change is not parsed again by later runs, which pays off for large chain bundles.
+            - Not used for O(enrollment_format=PKCS12), nor when O(execution_mode=controller).
+            - In check mode an existing cache file is used, none is written.
+        type: bool
+        default: False
+        version_added: 1.1.0
     path:
         description:
             - The destination path for the generated certificate as a PEM encoded cert.
             - If there is already a certificate at this location and O(force=true) then it will be replaced always.
               but if I(force) is not specified then we get the certificate validity for existing certificate from Entrust CAGW.
               If C(cert_days < remaining_days) then only a new certificate will be obtained.
-            - If O(enrollment_format=PKCS12) then it will have Base64 encoded PKCS12 body.
+            - An existing certificate may be in PEM or DER format. When it is followed or preceded by its chain,
+              the certificate which issued none of the others is the one checked.
+            - If O(enrollment_format=PKCS12) then it will be the binary PKCS12 returned by CAGW, protected by
+              O(p12_protection_password) and readable only by its owner.
         type: path
     csr:
         description:
-            - Base-64 encoded Certificate Signing Request (CSR). csr is accepted without PEM formatting around the Base-64 string.
-            - If no csr is provided when O(request_type=new) and O(enrollment_format=X509),
-              the certificate will not be generated and module will be failed.
+            - Path of the Certificate Signing Request (CSR), in PEM or DER format.
+            - One of O(csr) and O(private_key_path) is required when O(request_type=new) and O(enrollment_format=X509).
         type: path
 
-    cagw_api_client_cert_path:
+    private_key_path:
         description:
-            - Path for the Client cert issued by the same CA.
+            - Path of the private key of the certificate, to enroll without a CSR file.
+            - The module builds and signs the CSR itself, with O(dn) as its subject and the names of O(subject_alt_name).
+            - If there is no key at this path, a new one is generated as described by O(private_key_type) and written here,
+              readable only by its owner. An existing key is reused, also for renewals.
+            - Mutually exclusive with O(csr).
         type: path
-        required: true
+        version_added: 1.1.0
 
-    cagw_api_client_cert_key_path:
+    private_key_type:
         description:
-            - Path for the Client cert key issued by the same CA.
-        type: path
-        required: true
+            - Type of the private key generated at O(private_key_path).
+        type: str
+        choices: [ 'RSA', 'ECC', 'Ed25519' ]
+        default: RSA
+        version_added: 1.1.0
+
+    private_key_size:
+        description:
+            - Size in bits of an RSA private key generated at O(private_key_path).
+        type: int
+        default: 2048
+        version_added: 1.1.0
+
+    private_key_curve:
+        description:
+            - Curve of an ECC private key generated at O(private_key_path).
+        type: str
+        choices: [ 'secp256r1', 'secp384r1', 'secp521r1' ]
+        default: secp256r1
+        version_added: 1.1.0
+
+    private_key_passphrase:
+        description:
+            - Passphrase protecting the private key at O(private_key_path).
+        type: str
+        version_added: 1.1.0
 
     host:
         description:
             - Host or IP address for Entrust CAGW.
-        type: str
+            - A list of gateway endpoints, each a host optionally followed by C(:port), e.g. C(cagw2.example.com:8443) or
+              C([2001:db8::1]:8443), with O(port) by default. The requests go to the healthiest endpoint, by latency and
+              error rate, and to the next one when it cannot be connected to, see O(cagw_api_connect_timeout).
+        type: list
+        elements: str
         required: true
 
     port:
@@ -115,16 +180,52 @@ options:
     serial_no:
         description:
             - Serial number of the already issued certificate.
+            - Required with O(request_type=get). With O(request_type=action) it may be left out when O(inventory_path)
+              is set, to act on the certificate last recorded there for O(path).
         type: str
 
+    inventory_path:
+        description:
+            - Path of a local SQLite database recording every certificate requested, fetched or acted on,
+              with its CA, profile, path, validity, status and SHA-256 fingerprint. It is created if it does not exist,
+              except in check mode, which only reads an existing one.
+            - It is indexed by expiry, CA and path, see M(entrust.crypto.cagw_certificate_inventory_info) to query it.
+            - With O(execution_mode=controller) the database is on the controller.
+        type: path
+        version_added: 1.1.0
+
     p12_protection_password:
         description:
             - PKCS12 password for server side generation of the private key and CSR.
         type: str
 
+    p12_private_key_path:
+        description:
+            - Also write the private key of the PKCS12 to this path as PEM, readable only by its owner.
+            - The key is encrypted with O(private_key_passphrase) when it is set.
+            - Only used when O(enrollment_format=PKCS12), and only written along with a new PKCS12.
+        type: path
+        version_added: 1.1.0
+
+    p12_certificate_path:
+        description:
+            - Also write the certificate of the PKCS12 to this path as PEM.
+            - Only used when O(enrollment_format=PKCS12), and only written along with a new PKCS12.
+        type: path
+        version_added: 1.1.0
+
+    p12_chain_path:
+        description:
+            - Also write the chain certificates of the PKCS12 to this path as PEM.
+            - Only used when O(enrollment_format=PKCS12), and only written along with a new PKCS12.
+        type: path
+        version_added: 1.1.0
+
     dn:
         description:
             - Distinguished name given for the enrollment.
+            - Also the subject of the CSR built for O(private_key_path), either as C(CN=www.example.com,O=Example,C=US)
+              or as C(/C=US/O=Example/CN=www.example.com).
         type: str
 
     validity_period:
@@ -141,12 +242,6 @@ options:
               C(P1Y3M10DT0H0M)
         type: str
 
-    cagw_api_specification_path:
-        description:
-            - Path for CAGW api specification doc.
-        type: path
-        required: true
-
     remaining_days:
         description:
             - The number of days the certificate must have left being valid.
@@ -154,9 +249,61 @@ options:
               we get the certificate validity for existing certificate from Entrust CAGW.
               If C(cert_days < remaining_days) then a new certificate will be obtained.
             - The O(force=true) option may be used to ensure that a new certificate is always obtained.
+            - Ignored with O(renewal_window), when the validity of the certificate is known.
         type: int
         default: 30
 
+    renewal_window:
+        description:
+            - Renew the certificate once less than this fraction of its lifetime is left, e.g. V(0.33) for its last third,
+              rather than O(remaining_days) days before its expiry.
+            - Certificates of different lifetimes are then all renewed at the same point of their life.
+        type: float
+        version_added: 1.1.0
+
+    renewal_jitter:
+        description:
+            - Move the renewal date earlier by up to this fraction of the lifetime of the certificate, e.g. V(0.1).
+            - The amount is derived from O(renewal_jitter_seed), so a certificate always gets the same renewal date,
+              while certificates issued together, e.g. by a rollout, are renewed at a steady rate over a period
+              rather than all on the same day.
+            - See RV(renewal_date) for the resulting date.
+        type: float
+        default: 0
+        version_added: 1.1.0
+
+    renewal_jitter_seed:
+        description:
+            - The value the jitter of O(renewal_jitter) is derived from.
+            - Defaults to the serial number of the certificate. Set it to e.g. the inventory hostname to spread
+              the renewals by host instead.
+        type: str
+        version_added: 1.1.0
+
+    status_check:
+        description:
+            - How the certificate already present at I(path) is checked when O(request_type=new) and O(force=false).
+            - V(remote) gets the certificate status and validity from Entrust CAGW, so a revoked or held certificate is renewed too.
+            - V(local) computes the remaining days from the certificate at I(path) and never contacts CAGW.
+            - V(local_then_remote) computes the remaining days locally, and only gets the certificate from CAGW
+              when fewer than O(status_check_threshold) days are left.
+            - V(inventory) computes the remaining days locally, and takes the status last recorded in O(inventory_path).
+              CAGW is only asked about a certificate the inventory does not know, so a revocation done elsewhere
+              goes unnoticed until it is recorded.
+            - In check mode the certificate is always checked locally.
+        type: str
+        choices: [ 'remote', 'local', 'local_then_remote', 'inventory' ]
+        default: remote
+        version_added: 1.1.0
+
+    status_check_threshold:
+        description:
+            - With O(status_check=local_then_remote), the number of days left under which CAGW is asked about the certificate.
+            - By default CAGW is asked once the certificate is due for renewal, see RV(renewal_date). A certificate due for
+              renewal is always checked with CAGW, whatever the number of days left.
+        type: int
+        version_added: 1.1.0
+
     connector_name:
         description:
             - This parameter defines which CA type connected at the backend.
@@ -166,6 +313,34 @@ options:
         type: str
         choices: [ 'SM', 'ECS', 'PKIaaS', 'MSCA' ]
 
+    execution_mode:
+        description:
+            - Where the requests to Entrust CAGW are sent from.
+            - V(target) runs the module on the managed host, which needs network access to CAGW, the client credentials,
+              the API specification doc and the Python requirements of the module.
+            - V(controller) sends the requests from the Ansible controller. The CSR and the certificate at I(path) are read from the
+              managed host and only the resulting certificate is copied to it. I(cagw_api_client_cert_path),
+              I(cagw_api_client_cert_key_path) and I(cagw_api_specification_path) are then paths on the controller.
+            - With V(controller) and O(private_key_path), an existing key is read from the managed host, a new one is generated on
+              the controller and copied to the managed host.
+            - With V(controller) the hosts of a fork batch are dispatched concurrently by their worker processes, and the items of a
+              loop share one API session.
+            - On the P(entrust.crypto.cagw#connection) connection, both modes send the requests through the API session it keeps
+              for the whole play, the spec and client certificate are only loaded by the first task.
+        type: str
+        choices: [ 'target', 'controller' ]
+        default: target
+        version_added: 1.1.0
+
+    profile:
+        description:
+            - Measure where the time of the request goes and return it as RV(timings).
+            - Also traces the memory allocations of the module, which slows it down. Keep it disabled outside of investigations.
+            - See O(cagw_api_trace_path) for a record of every request to CAGW.
+        type: bool
+        default: false
+        version_added: 1.1.0
+
     subject_alt_name:
         description:
             - The subject alternative name identifiers.
@@ -365,6 +540,69 @@ EXAMPLES = r'''
       rfc822Name: server.example.com
     validate_certs: false
 
+- name: Request a certificate for a new ECC key, without creating a CSR first
+  entrust.crypto.cagw_certificate:
+    path: /etc/ssl/crt/ansible.com.crt
+    private_key_path: /etc/ssl/private/ansible.com.key
+    private_key_type: ECC
+    dn: CN=ansible.com,O=Example,C=US
+    subject_alt_name:
+      dNSName: ansible.com
+    cagw_api_client_cert_path: /etc/ssl/entrust/cagw-client.crt
+    cagw_api_client_cert_key_path: /etc/ssl/entrust/cagw-client.key
+    certificate_authority_id: ca_id
+    certificate_profile_id: profile_id
+    request_type: new
+    enrollment_format: X509
+    connector_name: SM
+    cagw_api_specification_path: /etc/ssl/entrust/cagw-api.yaml
+
+- name: Renew a certificate, asking CAGW about it only during its last 60 days
+  entrust.crypto.cagw_certificate:
+    path: /etc/ssl/crt/ansible.com.crt
+    csr: /etc/ssl/csr/ansible.com.csr
+    cagw_api_client_cert_path: /etc/ssl/entrust/cagw-client.crt
+    cagw_api_client_cert_key_path: /etc/ssl/entrust/cagw-client.key
+    certificate_authority_id: ca_id
+    certificate_profile_id: profile_id
+    request_type: new
+    enrollment_format: X509
+    connector_name: SM
+    cagw_api_specification_path: /etc/ssl/entrust/cagw-api.yaml
+    remaining_days: 30
+    status_check: local_then_remote
+    status_check_threshold: 60
+
+- name: Renew during the last third of the lifetime, spread over a tenth of it so a fleet does not renew on the same day
+  entrust.crypto.cagw_certificate:
+    path: /etc/ssl/crt/ansible.com.crt
+    csr: /etc/ssl/csr/ansible.com.csr
+    cagw_api_client_cert_path: /etc/ssl/entrust/cagw-client.crt
+    cagw_api_client_cert_key_path: /etc/ssl/entrust/cagw-client.key
+    certificate_authority_id: ca_id
+    certificate_profile_id: profile_id
+    request_type: new
+    enrollment_format: X509
+    connector_name: SM
+    cagw_api_specification_path: /etc/ssl/entrust/cagw-api.yaml
+    renewal_window: 0.33
+    renewal_jitter: 0.1
+    renewal_jitter_seed: '{{ inventory_hostname }}'
+
+- name: Request a certificate from the controller, the managed host only receives the certificate file
+  entrust.crypto.cagw_certificate:
+    path: /etc/ssl/crt/ansible.com.crt
+    csr: /etc/ssl/csr/ansible.com.csr
+    cagw_api_client_cert_path: /etc/ssl/entrust/cagw-client.crt
+    cagw_api_client_cert_key_path: /etc/ssl/entrust/cagw-client.key
+    certificate_authority_id: ca_id
+    certificate_profile_id: profile_id
+    request_type: new
+    enrollment_format: X509
+    connector_name: SM
+    cagw_api_specification_path: /etc/ssl/entrust/cagw-api.yaml
+    execution_mode: controller
+
 - name: Get an already issued certificate from CAGW with valid serial num in hexadecimal format
   entrust.crypto.cagw_certificate:
     path: /etc/ssl/crt/ansible.com.crt
@@ -389,6 +627,23 @@ EXAMPLES = r'''
     dn: /C=CA/O=iotrust/CN=CA/CN=ans-test-101
     cagw_api_specification_path: /etc/ssl/entrust/cagw-api.yaml
 
+- name: Request a PKCS12 and also split it into PEM files for a web server
+  entrust.crypto.cagw_certificate:
+    path: /etc/ssl/private/ansible.com.p12
+    p12_private_key_path: /etc/ssl/private/ansible.com.key
+    p12_certificate_path: /etc/ssl/crt/ansible.com.crt
+    p12_chain_path: /etc/ssl/crt/ansible.com.chain.crt
+    cagw_api_client_cert_path: /etc/ssl/entrust/cagw-client.crt
+    cagw_api_client_cert_key_path: /etc/ssl/entrust/cagw-client.key
+    certificate_authority_id: ca_id
+    certificate_profile_id: profile_id
+    request_type: new
+    enrollment_format: PKCS12
+    connector_name: SM
+    p12_protection_password: 'Password@2023'
+    dn: CN=ansible.com,O=Example,C=US
+    cagw_api_specification_path: /etc/ssl/entrust/cagw-api.yaml
+
 - name: Request a new SSL certificate from ECS via CAGW with bare minimum parameters.  Will request a new certificate
   entrust.crypto.cagw_certificate:
     path: /etc/ssl/crt/ansible.com.crt
@@ -458,6 +713,39 @@ EXAMPLES = r'''
     action_reason: unspecified
     serial_no: 5b9ba13d
     cagw_api_specification_path: /etc/ssl/entrust/cagw-api.yaml
+
+- name: Revoke the certificate last requested for a path, looking up its serial number in the inventory
+  entrust.crypto.cagw_certificate:
+    path: /etc/ssl/crt/ansible.com.crt
+    inventory_path: /var/lib/entrust/inventory.db
+    cagw_api_client_cert_path: /etc/ssl/entrust/cagw-client.crt
+    cagw_api_client_cert_key_path: /etc/ssl/entrust/cagw-client.key
+    certificate_authority_id: ca_id
+    request_type: action
+    action_type: RevokeAction
+    action_reason: keyCompromise
+    cagw_api_specification_path: /etc/ssl/entrust/cagw-api.yaml
+
+- name: Find out why renewals are slow, appending every request to CAGW to a trace file
+  entrust.crypto.cagw_certificate:
+    path: /etc/ssl/crt/ansible.com.crt
+    csr: /etc/ssl/csr/ansible.com.csr
+    host: cagw.example.com
+    cagw_api_client_cert_path: /etc/ssl/entrust/cagw-client.crt
+    cagw_api_client_cert_key_path: /etc/ssl/entrust/cagw-client.key
+    cagw_api_specification_path: /etc/ssl/entrust/cagw-api.yaml
+    cagw_api_trace_path: /var/log/cagw-trace.jsonl
+    certificate_authority_id: ca_id
+    certificate_profile_id: profile_id
+    connector_name: SM
+    request_type: new
+    enrollment_format: X509
+    profile: true
+  register: renewal
+
+- name: Show the phases of the renewal
+  ansible.builtin.debug:
+    var: renewal.timings
 '''
 
 RETURN = '''
@@ -479,6 +767,15 @@ cert_days:
     type: int
     sample: 253
 
+renewal_date:
+    description:
+        - When the certificate at O(path) is due for renewal, in ISO 8601 format.
+        - Computed from O(remaining_days), O(renewal_window) and O(renewal_jitter).
+        - None when the validity of the certificate is unknown, e.g. for a validity period given as a duration.
+    returned: success
+    type: str
+    sample: '2025-02-13T09:00:00+00:00'
+
 cert_status:
     description:
         - The certificate status in CAGW.
@@ -492,12 +789,70 @@ message:
     returned: success
     type: dict
 
+backup_file:
+    description: Name of the backup file created for the previous certificate at O(path).
+    returned: changed and if O(backup=true)
+    type: str
+    sample: /etc/ssl/crt/www.ansible.com.crt.2325.2023-07-06@13:00:00~
+
+retries:
+    description:
+        - Number of requests to CAGW which were sent again after a failure, see O(cagw_api_retries).
+    returned: always
+    type: int
+    sample: 0
+
+timings:
+    description:
+        - Seconds spent in each phase of the request, and the peak memory allocated by Python.
+    returned: when O(profile=true)
+    type: dict
+    contains:
+        spec_load:
+            description: Loading and compiling the API specification doc, or its cached copy.
+            type: float
+        client_build:
+            description: Building the rest of the CAGW client, e.g. reading the client certificate.
+            type: float
+        connect:
+            description: Opening connections to CAGW, including the TLS handshakes.
+            type: float
+        request:
+            description: Sending the requests and receiving the responses, i.e. the network and CAGW time.
+            type: float
+        response_parse:
+            description: Parsing the responses.
+            type: float
+        retry_wait:
+            description: Waiting between the retries of failed requests.
+            type: float
+        write:
+            description: Writing the certificate to O(path).
+            type: float
+        total:
+            description: The time of the whole request, including what no phase accounts for.
+            type: float
+        tracemalloc_peak:
+            description: The peak of the memory allocated by Python during the request, in bytes.
+            type: int
+    sample:
+        spec_load: 0.0031
+        client_build: 0.0012
+        connect: 0.0415
+        request: 0.2286
+        response_parse: 0.0002
+        retry_wait: 0.0
+        write: 0.0003
+        total: 0.2814
+        tracemalloc_peak: 1482753
+
 cert_details:
     description:
         - The full response JSON from the New/Get Certificate call of the CAGW API.
         - While the response contents are guaranteed to be forwards compatible with new CAGW API releases,
           Entrust recommends that you do not make any playbooks take actions based on the content of this field.
           However it may be useful for debugging, logging, or auditing purposes.
+        - The PKCS12 of a O(enrollment_format=PKCS12) enrollment is not included, it is only written to O(path).
     returned: success
     type: dict
 
@@ -505,29 +860,24 @@ cert_details:
 
 from ansible_collections.entrust.crypto.plugins.module_utils.cagw.api import (
     cagw_client_argument_spec,
-    CAGWClient,
-    RestOperationException,
-    SessionConfigurationException,
+)
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.certificate import (
+    CagwCertificate,
+    custom_fields_spec,
+    private_key_argument_spec,
+    subject_alt_name_spec,
+    version_tuple,
 )
 
-from dateutil.parser import parse
-from datetime import datetime, timezone
 import os
 import traceback
 
-from ansible.module_utils.compat.version import LooseVersion
-
 from ansible.module_utils.basic import AnsibleModule, missing_required_lib
-from ansible.module_utils._text import to_native
-
-from ansible_collections.entrust.crypto.plugins.module_utils.cagw.support import (
-    load_certificate,
-)
 
 CRYPTOGRAPHY_IMP_ERR = None
 try:
     import cryptography
-    CRYPTOGRAPHY_VERSION = LooseVersion(cryptography.__version__)
+    CRYPTOGRAPHY_VERSION = version_tuple(cryptography.__version__)
 except ImportError:
     CRYPTOGRAPHY_IMP_ERR = traceback.format_exc()
     CRYPTOGRAPHY_FOUND = False
@@ -537,320 +887,37 @@ else:
 MINIMAL_CRYPTOGRAPHY_VERSION = '1.6'
 
 
-def calculate_cert_days(validityPeriod):
-    expiry = validityPeriod.split("/")
-    expiresAfter = expiry[1]
-    cert_days = 0
-    if expiresAfter:
-        expires_after_datetime = parse(expiresAfter)
-        cert_days = (expires_after_datetime - datetime.now(timezone.utc)).days
-    return cert_days
-
-
-class CagwCertificate(object):
-    '''
-    CA gateway certificate class
-    '''
-    def __init__(self, module):
-        self.request_type = module.params['request_type']
-        self.path = module.params['path']
-        self.force = module.params['force']
-
-        # All return values
-        self.changed = False
-        self.filename = None
-        self.cert_details = None
-        self.cert_status = None
-        self.serialNumber = None
-        self.cert_days = None
-        self.message = None
-
-        self.cert = None
-        self.cagw_client = None
-        if self.path and os.path.exists(self.path):
-            try:
-                self.cert = load_certificate(self.path, backend='cryptography')
-            except Exception as dummy:
-                self.cert = None
-        # Instantiate the CAGW client
-        try:
-            self.cagw_client = CAGWClient(
-                cagw_api_cert=module.params['cagw_api_client_cert_path'],
-                cagw_api_cert_key=module.params['cagw_api_client_cert_key_path'],
-                cagw_api_specification_path=module.params['cagw_api_specification_path']
-            )
-        except SessionConfigurationException as e:
-            module.fail_json(msg='Failed to initialize Entrust Provider: {0}'.format(to_native(e)))
-
-    def write_cert_to_file(self):
-        fh = open(self.path, "w")
-        try:
-            fh.write(self.cert)
-        finally:
-            fh.close()
-
-    def update_csr(self, module):
-        body = {}
-        csr = ''
-        with open(module.params['csr']) as csr_file:
-            lines = csr_file.readlines()
-            # Remove first line
-            lines = lines[1:]
-            # Remove last line
-            lines = lines[:-1]
-            # Remove all linespaces
-            csr = "".join(line.rstrip("\n") for line in lines)
-        body['csr'] = csr
-        return body
-
-    def update_optional_certificate_request_details(self, module):
-        body = {}
-        optionalCertificateRequestDetails = {}
-        optionalCertificateRequestDetails['subjectDn'] = module.params['dn']
-        if module.params['validity_period']:
-            optionalCertificateRequestDetails['validityPeriod'] = module.params['validity_period']
-        body['optionalCertificateRequestDetails'] = optionalCertificateRequestDetails
-        return body
-
-    def update_properties(self, module):
-        body = {}
-        properties = {}
-        if module.params['requester_name']:
-            properties['tracking.requesterName'] = module.params['requester_name']
-        if module.params['requester_email']:
-            properties['tracking.requesterEmail'] = module.params['requester_email']
-        if module.params['requester_phone']:
-            properties['tracking.requesterPhone'] = module.params['requester_phone']
-        if module.params['tracking_info']:
-            properties['tracking.trackingInfo'] = module.params['tracking_info']
-        if module.params['additional_emails']:
-            properties['tracking.additionalEmails'] = module.params['additional_emails']
-        if module.params['custom_fields']:
-            # Omit custom fields from submitted dict if not present, instead of submitting them with value of 'null'
-            # The ECS API does technically accept null without error, but it complicates debugging user escalations and is unnecessary bandwidth.
-            for k, v in module.params['custom_fields'].items():
-                if v is not None:
-                    key = "tracking.customFields.{k}".format(k=k)
-                    properties[key] = v
-        body['properties'] = properties
-        return body
-
-    def update_protection(self, module):
-        requiredFormat = {}
-        protection = {}
-
-        protection['type'] = "PasswordProtection"
-        protection['password'] = module.params['p12_protection_password']
-
-        requiredFormat['protection'] = protection
-        return requiredFormat
-
-    def update_required_format(self, module):
-        body = {}
-        requiredFormat = {}
-        module_params_format = module.params['enrollment_format']
-        requiredFormat['format'] = module_params_format
-        if module_params_format == 'PKCS12':
-            requiredFormat.update(self.update_protection(module))
-        body['requiredFormat'] = requiredFormat
-        return body
-
-    def update_cert_subject_alt_name(self, module):
-        body = {}
-        subjectAltNames = []
-        if module.params['subject_alt_name']:
-            for k, v in module.params['subject_alt_name'].items():
-                if v is not None:
-                    options = {}
-                    options['type'] = k
-                    options['value'] = v
-                    subjectAltNames.append(options)
-            body['subjectAltNames'] = subjectAltNames
-        return body
-
-    def update_action(self, module):
-        body = {}
-        action = {}
-        action['type'] = module.params['action_type']
-        action['reason'] = module.params['action_reason']
-        body['action'] = action
-        return body
-
-    def set_cert_details(self, module):
-        module_params_format = module.params['enrollment_format']
-        if module_params_format == 'X509':
-            self.serialNumber = self.cert_details.get('serialNumber')
-            self.validityPeriod = self.cert_details.get('validityPeriod')
-            self.cert_days = calculate_cert_days(self.cert_details.get('validityPeriod'))
-
-        if self.request_type == 'new':
-            self.cert = self.cert_details.get('body')
-        elif self.request_type == 'get':
-            self.cert = self.cert_details.get('certificateData')
-
-    def check(self, module):
-        if self.cert:
-            serial_number = "{0:X}".format(self.cert.serial_number)
-            result = self.cagw_client.GetCertificate(ca_id=module.params['certificate_authority_id'],
-                                                     serial_no=serial_number,
-                                                     validate_certs=module.params['validate_certs'],
-                                                     host=module.params['host'], port=module.params['port'])
-            self.cert_details = result.get('certificate')
-            # Changing the request type to get since we are getting the certificate here on the basis of
-            # serial number and we need to populate the cert details on the get response only.
-            self.request_type = 'get'
-            self.set_cert_details(module)
-            # Changing the request back to new
-            self.request_type = 'new'
-
-            module_params_connector_name = module.params['connector_name']
-            # ECS CA getCertificate api through CAGW doesn't return status of the certificate
-            if module_params_connector_name == 'SM':
-                self.cert_status = self.cert_details.get('status')
-                if self.cert_status == 'EXPIRED' or self.cert_status == 'expired' or \
-                   self.cert_status == 'SUSPENDED' or self.cert_status == 'suspended' or \
-                   self.cert_status == 'REVOKED' or self.cert_status == 'revoked' or self.cert_status == 'held':
-                    return False
-
-            if self.cert_days < module.params['remaining_days']:
-                return False
-
-            return True
-
-        return False
-
-    def request_cert(self, module):
-        body = {}
-        begin_line = "-----BEGIN CERTIFICATE-----\n"
-        end_line = "\n-----END CERTIFICATE-----"
-        try:
-            if self.request_type == 'new':
-                if self.force or not self.check(module):
-                    body['profileId'] = module.params['certificate_profile_id']
-                    body.update(self.update_required_format(module))
-                    body.update(self.update_cert_subject_alt_name(module))
-                    module_params_format = module.params['enrollment_format']
-                    body.update(self.update_optional_certificate_request_details(module))
-                    if module_params_format == 'X509':
-                        body.update(self.update_csr(module))
-                    module_params_connector_name = module.params['connector_name']
-                    if module_params_connector_name == 'ECS':
-                        body.update(self.update_properties(module))
-                    result = self.cagw_client.NewCertRequest(Body=body, ca_id=module.params['certificate_authority_id'],
-                                                             validate_certs=module.params['validate_certs'],
-                                                             host=module.params['host'], port=module.params['port'])
-                    self.cert_details = result.get('enrollment')
-                    self.set_cert_details(module)
-                    if module_params_format == 'X509':
-                        self.cert = begin_line + self.cert + end_line
-                    self.write_cert_to_file()
-                    self.changed = True
-                else:
-                    return
-            elif self.request_type == 'action':
-                body.update(self.update_action(module))
-                result = self.cagw_client.ActionOnCertificate(Body=body, ca_id=module.params['certificate_authority_id'],
-                                                              serial_no=module.params['serial_no'],
-                                                              validate_certs=module.params['validate_certs'],
-                                                              host=module.params['host'], port=module.params['port'])
-                self.cert_details = result.get('action')
-            elif self.request_type == 'get':
-                result = self.cagw_client.GetCertificate(ca_id=module.params['certificate_authority_id'],
-                                                         serial_no=module.params['serial_no'],
-                                                         validate_certs=module.params['validate_certs'],
-                                                         host=module.params['host'], port=module.params['port'])
-                self.cert_details = result.get('certificate')
-                self.set_cert_details(module)
-                self.cert = begin_line + self.cert + end_line
-                self.write_cert_to_file()
-                self.changed = True
-        except RestOperationException as e:
-            module.fail_json(msg='Failed in certificate operation from Entrust (CAGW) {0} Error:'.format(e))
-
-        self.message = result.get('message')
-        self.cert_status = self.cert_details.get('status')
-
-    def dump(self):
-        result = {
-            'changed': self.changed,
-            'filename': self.path,
-            'cert_status': self.cert_status,
-            'serialNumber': self.serialNumber,
-            'cert_days': self.cert_days,
-            'cert_details': self.cert_details,
-            'message': self.message,
-        }
-        return result
-
-
-def custom_fields_spec():
-    return dict(
-        text1=dict(type='str'),
-        text2=dict(type='str'),
-        text3=dict(type='str'),
-        text4=dict(type='str'),
-        text5=dict(type='str'),
-        text6=dict(type='str'),
-        text7=dict(type='str'),
-        text8=dict(type='str'),
-        text9=dict(type='str'),
-        text10=dict(type='str'),
-        text11=dict(type='str'),
-        text12=dict(type='str'),
-        text13=dict(type='str'),
-        text14=dict(type='str'),
-        text15=dict(type='str'),
-        number1=dict(type='float'),
-        number2=dict(type='float'),
-        number3=dict(type='float'),
-        number4=dict(type='float'),
-        number5=dict(type='float'),
-        date1=dict(type='str'),
-        date2=dict(type='str'),
-        date3=dict(type='str'),
-        date4=dict(type='str'),
-        date5=dict(type='str'),
-        email1=dict(type='str'),
-        email2=dict(type='str'),
-        email3=dict(type='str'),
-        email4=dict(type='str'),
-        email5=dict(type='str'),
-        dropdown1=dict(type='str'),
-        dropdown2=dict(type='str'),
-        dropdown3=dict(type='str'),
-        dropdown4=dict(type='str'),
-        dropdown5=dict(type='str'),
-    )
-
-
-def subject_alt_name_spec():
-    return dict(
-        dNSName=dict(type='str'),
-        iPAddress=dict(type='str'),
-        directoryName=dict(type='str'),
-        uniformResourceIdentifier=dict(type='str'),
-        rfc822Name=dict(type='str'),
-    )
-
-
 def cagw_certificate_argument_spec():
-    return dict(
+    spec = dict(
         force=dict(type='bool', default=False),
+        backup=dict(type='bool', default=False),
+        fsync=dict(type='bool', default=False),
+        metadata_cache=dict(type='bool', default=False),
         path=dict(type='path'),
         request_type=dict(type='str', required=True, choices=['new', 'action', 'get']),
         action_type=dict(type='str', choices=['RevokeAction', 'HoldAction', 'UnholdAction']),
         action_reason=dict(type='str'),
         enrollment_format=dict(type='str', choices=['X509', 'PKCS12']),
-        host=dict(type='str', required=True),
+        host=dict(type='list', elements='str', required=True),
         port=dict(type='int', default=443),
         certificate_authority_id=dict(type='str', required=True),
         serial_no=dict(type='str'),
+        inventory_path=dict(type='path'),
         p12_protection_password=dict(type='str', no_log=True),
+        p12_private_key_path=dict(type='path'),
+        p12_certificate_path=dict(type='path'),
+        p12_chain_path=dict(type='path'),
         dn=dict(type='str'),
         validity_period=dict(type='str'),
         certificate_profile_id=dict(type='str'),
         csr=dict(type='path'),
+        private_key_path=dict(type='path'),
         remaining_days=dict(type='int', default=30),
+        renewal_window=dict(type='float'),
+        renewal_jitter=dict(type='float', default=0),
+        renewal_jitter_seed=dict(type='str'),
+        status_check=dict(type='str', default='remote', choices=['remote', 'local', 'local_then_remote', 'inventory']),
+        status_check_threshold=dict(type='int'),
         connector_name=dict(type='str', choices=['SM', 'ECS', 'PKIaaS', 'MSCA']),
         tracking_info=dict(type='str'),
         requester_name=dict(type='str'),
@@ -860,6 +927,27 @@ def cagw_certificate_argument_spec():
         custom_fields=dict(type='dict', default=None, options=custom_fields_spec()),
         subject_alt_name=dict(type='dict', default=None, options=subject_alt_name_spec()),
         validate_certs=dict(type='bool', default=True),
+        execution_mode=dict(type='str', default='target', choices=['target', 'controller']),
+        profile=dict(type='bool', default=False),
+    )
+    spec.update(private_key_argument_spec())
+    return spec
+
+
+def cagw_certificate_required_if():
+    return (
+        ['request_type', 'new', ['path', 'enrollment_format', 'certificate_profile_id', 'connector_name']],
+        ['request_type', 'action', ['action_type', 'action_reason']],
+        ['request_type', 'get', ['path', 'serial_no']],
+        ['enrollment_format', 'X509', ['csr', 'private_key_path'], True],
+        ['enrollment_format', 'PKCS12', ['p12_protection_password', 'dn']],
+        ['connector_name', 'ECS', ['requester_name', 'requester_email']],
+    )
+
+
+def cagw_certificate_mutually_exclusive():
+    return (
+        ['csr', 'private_key_path'],
     )
 
 
@@ -868,16 +956,13 @@ def main():
     cagw_argument_spec.update(cagw_certificate_argument_spec())
     module = AnsibleModule(
         argument_spec=cagw_argument_spec,
-        required_if=(
-            ['request_type', 'new', ['path', 'enrollment_format', 'certificate_profile_id', 'connector_name']],
-            ['request_type', 'action', ['action_type', 'serial_no', 'action_reason']],
-            ['request_type', 'get', ['path', 'serial_no']],
-            ['enrollment_format', 'X509', ['csr']],
-            ['enrollment_format', 'PKCS12', ['p12_protection_password', 'dn']],
-            ['connector_name', 'ECS', ['requester_name', 'requester_email']],
-        )
+        required_if=cagw_certificate_required_if(),
+        mutually_exclusive=cagw_certificate_mutually_exclusive(),
+        supports_check_mode=True,
+        add_file_common_args=True,
     )
-    if not CRYPTOGRAPHY_FOUND or CRYPTOGRAPHY_VERSION < LooseVersion(MINIMAL_CRYPTOGRAPHY_VERSION):
+    # Only an enrollment parses certificates or builds a CSR, actions and gets do without cryptography
+    if module.params['request_type'] == 'new' and (not CRYPTOGRAPHY_FOUND or CRYPTOGRAPHY_VERSION < version_tuple(MINIMAL_CRYPTOGRAPHY_VERSION)):
         module.fail_json(msg=missing_required_lib('cryptography >= {0}'.format(MINIMAL_CRYPTOGRAPHY_VERSION)),
                          exception=CRYPTOGRAPHY_IMP_ERR)
 
@@ -886,7 +971,7 @@ def main():
         module_params_format = module.params['enrollment_format']
         if module_params_format == "X509":
             module_params_csr = module.params['csr']
-            if not os.path.exists(module_params_csr):
+            if module_params_csr and not os.path.exists(module_params_csr):
                 module.fail_json(msg='The csr field of {0} was not a valid path.'.format(module_params_csr))
 
     certificate = CagwCertificate(module)
@@ -0,0 +1,803 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright (c), Entrust Corporation, 2023
+# Author: Sapna Jain, Entrust
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = '''
+---
+module: cagw_certificate_batch
+author:
+    - Sapna Jain (@sapnajainEntrust)
+short_description: Enroll many SSL/TLS certificates concurrently with the Certificate Authority Gateway (CAGW) API
+version_added: 1.1.0
+description:
+    - Request a list of new certificates with the Certificate Authority Gateway (CAGW) API in a single task.
+    - All enrollments share one API session and are sent concurrently, by a pool of O(workers) threads or
+      with O(engine=asyncio) by as many coroutines on one event loop.
+    - Every certificate is handled like O(entrust.crypto.cagw_certificate#module:request_type=new), an existing valid certificate
+      at C(path) is only renewed when it has less than C(remaining_days) left or O(force=true).
+    - A failure of one enrollment does not stop the others, the result of every item is reported in RV(results).
+notes:
+    - Supports check mode, in which no request is sent to CAGW.
+    - The custom_fields of the M(entrust.crypto.cagw_certificate) module are not supported per item, use that module for ECS custom fields.
+requirements:
+    - cryptography >= 1.6
+    - Ansible Core >= 2.14.0
+    - Minimum Python Version = 3.6
+extends_documentation_fragment:
+    - ansible.builtin.files
+    - entrust.crypto.cagw_client
+options:
+    host:
+        description:
+            - Host or IP address for Entrust CAGW.
+            - A list of gateway endpoints, each a host optionally followed by C(:port), e.g. C(cagw2.example.com:8443) or
+              C([2001:db8::1]:8443), with O(port) by default. The requests go to the healthiest endpoint, by latency and
+              error rate, and to the next one when it cannot be connected to, see O(cagw_api_connect_timeout).
+        type: list
+        elements: str
+        required: true
+
+    port:
+        description:
+            - Port for Entrust CAGW.
+        type: int
+        default: 443
+
+    validate_certs:
+        description:
+            - If set to false then SSL validation with Server is skipped.
+              This should be set to false only for testing purposes.
+        type: bool
+        default: True
+
+    certificate_authority_id:
+        description:
+            - Unique id for the Certificate Authority.
+            - Used for every item which does not set its own C(certificate_authority_id).
+        type: str
+        required: true
+
+    certificate_profile_id:
+        description:
+            - Profile id for the Certificate Authority.
+            - Used for every item which does not set its own C(certificate_profile_id).
+        type: str
+
+    connector_name:
+        description:
+            - The CA type connected at the backend.
+            - Used for every item which does not set its own C(connector_name).
+        type: str
+        choices: [ 'SM', 'ECS', 'PKIaaS', 'MSCA' ]
+
+    enrollment_format:
+        description:
+            - enrollment_format that is X509 or PKCS12.
+            - Used for every item which does not set its own C(enrollment_format).
+        type: str
+        choices: [ 'X509', 'PKCS12' ]
+        default: X509
+
+    force:
+        description:
+            - If O(force=true) then certificates are requested regardless of whether C(path) points to an existing valid certificate.
+            - Used for every item which does not set its own C(force).
+        type: bool
+        default: False
+
+    remaining_days:
+        description:
+            - The number of days a certificate at C(path) must have left being valid, otherwise a new certificate is obtained.
+            - Used for every item which does not set its own C(remaining_days).
+        type: int
+        default: 30
+
+    status_check:
+        description:
+            - How a certificate already present at C(path) is checked, see O(entrust.crypto.cagw_certificate#module:status_check).
+            - In check mode the certificates are always checked locally.
+        type: str
+        choices: [ 'remote', 'local', 'local_then_remote', 'inventory' ]
+        default: remote
+
+    renewal_window:
+        description:
+            - Renew every certificate once less than this fraction of its lifetime is left,
+              see O(entrust.crypto.cagw_certificate#module:renewal_window).
+        type: float
+
+    renewal_jitter:
+        description:
+            - Move the renewal date of every certificate earlier by up to this fraction of its lifetime, by an amount
+              derived from its serial number, see O(entrust.crypto.cagw_certificate#module:renewal_jitter).
+        type: float
+        default: 0
+
+    status_check_threshold:
+        description:
+            - With O(status_check=local_then_remote), the number of days left under which CAGW is asked about a certificate.
+            - By default CAGW is asked once the certificate is due for renewal.
+        type: int
+
+    backup:
+        description:
+            - Create a backup file including the timestamp information of every certificate that is replaced.
+        type: bool
+        default: False
+
+    fsync:
+        description:
+            - Flush every certificate and the directory entry of its path to disk before returning,
+              see O(entrust.crypto.cagw_certificate#module:fsync).
+        type: bool
+        default: False
+
+    inventory_path:
+        description:
+            - Path of a local SQLite database recording every certificate of the batch,
+              see O(entrust.crypto.cagw_certificate#module:inventory_path).
+        type: path
+
+    metadata_cache:
+        description:
+            - Cache the metadata of every certificate in a hidden file next to it, so that certificates which did not
+              change are not parsed again, see O(entrust.crypto.cagw_certificate#module:metadata_cache).
+        type: bool
+        default: False
+
+    workers:
+        description:
+            - Maximum number of enrollments sent to CAGW at the same time.
+        type: int
+        default: 8
+
+    engine:
+        description:
+            - How the enrollments are sent concurrently.
+            - V(threads) runs every enrollment on a pool of O(workers) threads.
+            - V(asyncio) runs them as coroutines on a single event loop, which scales to hundreds of O(workers)
+              without a thread each. The certificate and CSR files are still read and written synchronously.
+        type: str
+        choices: [ 'threads', 'asyncio' ]
+        default: threads
+
+    allow_partial_failure:
+        description:
+            - If set to false the module fails when any of the enrollments failed, after all of them were attempted.
+            - If set to true the module only fails when every enrollment failed.
+        type: bool
+        default: False
+
+    private_key_type:
+        description:
+            - Type of the private keys generated for the items with a C(private_key_path) but no key there yet.
+            - RSA keys are generated by a pool of worker processes, one per CPU, before the enrollments start.
+        type: str
+        choices: [ 'RSA', 'ECC', 'Ed25519' ]
+        default: RSA
+
+    private_key_size:
+        description:
+            - Size in bits of the RSA private keys generated for the items.
+        type: int
+        default: 2048
+
+    private_key_curve:
+        description:
+            - Curve of the ECC private keys generated for the items.
+        type: str
+        choices: [ 'secp256r1', 'secp384r1', 'secp521r1' ]
+        default: secp256r1
+
+    private_key_passphrase:
+        description:
+            - Passphrase protecting the private keys of the items.
+        type: str
+
+    profile:
+        description:
+            - Measure where the time of every enrollment goes and return it as RV(results[].timings), and the totals of the
+              batch as RV(stats.timings).
+            - Also traces the memory allocations of the module, which slows it down. Keep it disabled outside of investigations.
+        type: bool
+        default: false
+
+    certificates:
+        description:
+            - The certificates to enroll.
+        type: list
+        elements: dict
+        required: true
+        suboptions:
+            path:
+                description:
+                    - The destination path for the generated certificate.
+                    - The binary PKCS12 returned by CAGW, readable only by its owner, when the enrollment format is PKCS12.
+                    - Must be unique within O(certificates).
+                type: path
+                required: true
+            csr:
+                description:
+                    - Path of the Certificate Signing Request (CSR), in PEM or DER format.
+                    - One of C(csr) and C(private_key_path) is required when the enrollment format is X509.
+                type: path
+            private_key_path:
+                description:
+                    - Path of the private key of the certificate, to enroll without a CSR file, see
+                      O(entrust.crypto.cagw_certificate#module:private_key_path).
+                    - Mutually exclusive with C(csr).
+                type: path
+            private_key_type:
+                description:
+                    - Overrides O(private_key_type) for this certificate.
+                type: str
+                choices: [ 'RSA', 'ECC', 'Ed25519' ]
+            private_key_size:
+                description:
+                    - Overrides O(private_key_size) for this certificate.
+                type: int
+            private_key_curve:
+                description:
+                    - Overrides O(private_key_curve) for this certificate.
+                type: str
+                choices: [ 'secp256r1', 'secp384r1', 'secp521r1' ]
+            dn:
+                description:
+                    - Distinguished name given for the enrollment. Required when the enrollment format is PKCS12.
+                    - Also the subject of the CSR built for C(private_key_path).
+                type: str
+            p12_protection_password:
+                description:
+                    - PKCS12 password for server side generation of the private key and CSR. Required when the enrollment format is PKCS12.
+                type: str
+            validity_period:
+                description:
+                    - The certificate validity period, see O(entrust.crypto.cagw_certificate#module:validity_period).
+                type: str
+            subject_alt_name:
+                description:
+                    - The subject alternative name identifiers.
+                type: dict
+                suboptions:
+                    dNSName:
+                        description: DNS name of the target server.
+                        type: str
+                    iPAddress:
+                        description: IP address of the target server.
+                        type: str
+                    uniformResourceIdentifier:
+                        description:  URI of the target server.
+                        type: str
+                    directoryName:
+                        description: directoryName of the target server.
+                        type: str
+                    rfc822Name:
+                        description: rfc822 name of the target server.
+                        type: str
+            certificate_authority_id:
+                description:
+                    - Overrides O(certificate_authority_id) for this certificate.
+                type: str
+            certificate_profile_id:
+                description:
+                    - Overrides O(certificate_profile_id) for this certificate.
+                type: str
+            connector_name:
+                description:
+                    - Overrides O(connector_name) for this certificate.
+                type: str
+                choices: [ 'SM', 'ECS', 'PKIaaS', 'MSCA' ]
+            enrollment_format:
+                description:
+                    - Overrides O(enrollment_format) for this certificate.
+                type: str
+                choices: [ 'X509', 'PKCS12' ]
+            force:
+                description:
+                    - Overrides O(force) for this certificate.
+                type: bool
+            remaining_days:
+                description:
+                    - Overrides O(remaining_days) for this certificate.
+                type: int
+            requester_name:
+                description:
+                    - The requester name to associate with certificate tracking information. Required when the connector is ECS.
+                type: str
+            requester_email:
+                description:
+                    - The requester email to associate with certificate tracking information. Required when the connector is ECS.
+                type: str
+            requester_phone:
+                description: The requester phone number to associate with certificate tracking information.
+                type: str
+            tracking_info:
+                description: Free form tracking information to attach to the record for the certificate.
+                type: str
+            additional_emails:
+                description: A list of additional email addresses to receive the delivery notice and expiry notification for the certificate.
+                type: list
+                elements: str
+
+seealso:
+    - module: entrust.crypto.cagw_certificate
+      description: Request, get or take actions on a single certificate.
+'''
+
+EXAMPLES = r'''
+- name: Renew all vhost certificates of the ingress tier from SM via CAGW
+  entrust.crypto.cagw_certificate_batch:
+    host: cagw.example.com
+    cagw_api_client_cert_path: /etc/ssl/entrust/cagw-client.crt
+    cagw_api_client_cert_key_path: /etc/ssl/entrust/cagw-client.key
+    cagw_api_specification_path: /etc/ssl/entrust/cagw-api.yaml
+    certificate_authority_id: ca_id
+    certificate_profile_id: profile_id
+    connector_name: SM
+    workers: 16
+    certificates:
+      - path: /etc/ssl/crt/www.example.com.crt
+        csr: /etc/ssl/csr/www.example.com.csr
+        subject_alt_name:
+          dNSName: www.example.com
+      - path: /etc/ssl/crt/api.example.com.crt
+        csr: /etc/ssl/csr/api.example.com.csr
+        subject_alt_name:
+          dNSName: api.example.com
+
+- name: Enroll one certificate per vhost, tolerating individual failures
+  entrust.crypto.cagw_certificate_batch:
+    host: cagw.example.com
+    cagw_api_client_cert_path: /etc/ssl/entrust/cagw-client.crt
+    cagw_api_client_cert_key_path: /etc/ssl/entrust/cagw-client.key
+    cagw_api_specification_path: /etc/ssl/entrust/cagw-api.yaml
+    certificate_authority_id: ca_id
+    certificate_profile_id: profile_id
+    connector_name: SM
+    allow_partial_failure: true
+    certificates: "{{ vhost_certificates }}"
+  register: batch
+
+- name: Show the certificates which could not be enrolled
+  ansible.builtin.debug:
+    msg: "{{ batch.results | selectattr('failed') | map(attribute='path') | list }}"
+
+- name: Renew a whole fleet of certificates with 200 enrollments in flight on one event loop
+  entrust.crypto.cagw_certificate_batch:
+    host: cagw.example.com
+    cagw_api_client_cert_path: /etc/ssl/entrust/cagw-client.crt
+    cagw_api_client_cert_key_path: /etc/ssl/entrust/cagw-client.key
+    cagw_api_specification_path: /etc/ssl/entrust/cagw-api.yaml
+    certificate_authority_id: ca_id
+    certificate_profile_id: profile_id
+    connector_name: SM
+    engine: asyncio
+    workers: 200
+    certificates: "{{ fleet_certificates }}"
+'''
+
+RETURN = '''
+results:
+    description: The outcome of every item of O(certificates), in the same order.
+    returned: always
+    type: list
+    elements: dict
+    contains:
+        path:
+            description: The destination path of the certificate.
+            type: str
+            sample: /etc/ssl/crt/www.example.com.crt
+        changed:
+            description: Whether a new certificate was written to RV(results[].path), or its attributes were changed.
+            type: bool
+        backup_file:
+            description: Name of the backup file created for the previous certificate.
+            type: str
+            returned: changed and if O(backup=true)
+        failed:
+            description: Whether the enrollment failed.
+            type: bool
+        msg:
+            description: The error message when the enrollment failed.
+            type: str
+            returned: failure
+        serialNumber:
+            description: The serial number of the certificate.
+            type: str
+            sample: 5b9ba13d
+        cert_days:
+            description: The number of days the certificate remains valid from now.
+            type: int
+            sample: 253
+        renewal_date:
+            description: When the certificate is due for renewal, in ISO 8601 format, None when its validity is unknown.
+            type: str
+            sample: '2025-02-13T09:00:00+00:00'
+        cert_status:
+            description: The certificate status in CAGW.
+            type: str
+        message:
+            description: Message we get from CAGW.
+            type: dict
+        elapsed:
+            description: Seconds spent on this certificate.
+            type: float
+        timings:
+            description:
+                - Seconds this certificate spent in C(connect), C(request), C(response_parse), C(retry_wait) and C(write),
+                  see RV(entrust.crypto.cagw_certificate#module:timings).
+            type: dict
+            returned: when O(profile=true)
+
+stats:
+    description: Aggregate statistics of the batch.
+    returned: always
+    type: dict
+    contains:
+        total:
+            description: Number of certificates in the batch.
+            type: int
+        changed:
+            description: Number of certificates which were enrolled.
+            type: int
+        unchanged:
+            description: Number of existing certificates which did not need a renewal.
+            type: int
+        failed:
+            description: Number of certificates which could not be enrolled.
+            type: int
+        workers:
+            description: Number of worker threads, or coroutines with O(engine=asyncio), used.
+            type: int
+        elapsed:
+            description: Wall clock seconds for the whole batch.
+            type: float
+        requests_per_second:
+            description: Certificates processed per second.
+            type: float
+        connections_opened:
+            description: Number of HTTPS connections opened to CAGW.
+            type: int
+        connections_reused:
+            description: Number of requests sent over an already open HTTPS connection.
+            type: int
+        tls_sessions_resumed:
+            description: Number of new HTTPS connections which resumed a previous TLS session instead of a full handshake.
+            type: int
+        retries:
+            description: Number of requests which were sent again after a failure, see O(cagw_api_retries).
+            type: int
+        circuit_breaker_state:
+            description: State of the circuit breaker at the end of the batch.
+            type: str
+            choices: [ closed, open, half_open ]
+        circuit_breaker_trips:
+            description: Number of times the circuit breaker opened, see O(cagw_api_circuit_breaker_threshold).
+            type: int
+        failovers:
+            description: Number of requests which went to another endpoint of O(host) because one could not be connected to.
+            type: int
+            returned: when O(host) lists several endpoints or O(cagw_api_hedge_delay) is set
+        hedged_requests:
+            description: Number of requests which were sent again after O(cagw_api_hedge_delay).
+            type: int
+            returned: when O(host) lists several endpoints or O(cagw_api_hedge_delay) is set
+        hedges_won:
+            description: Number of hedged requests whose second request answered first.
+            type: int
+            returned: when O(host) lists several endpoints or O(cagw_api_hedge_delay) is set
+        endpoints:
+            description:
+                - The endpoints of O(host) with their number of C(requests) and C(failures), and the moving averages
+                  of their C(latency) in seconds and of their C(error_rate), which the requests were balanced by.
+            type: list
+            elements: dict
+            returned: when O(host) lists several endpoints or O(cagw_api_hedge_delay) is set
+        timings:
+            description:
+                - Seconds spent building the client, C(spec_load) and C(client_build), and the phases of all the certificates
+                  added up. With concurrent enrollments the sum exceeds the wall clock RV(stats.elapsed).
+                - C(tracemalloc_peak) is the peak of the memory allocated by Python during the batch, in bytes.
+            type: dict
+            returned: when O(profile=true)
+    sample:
+        total: 200
+        changed: 198
+        unchanged: 1
+        failed: 1
+        workers: 16
+        elapsed: 12.4
+        requests_per_second: 16.13
+        connections_opened: 16
+        connections_reused: 383
+        tls_sessions_resumed: 15
+        retries: 2
+        circuit_breaker_state: closed
+        circuit_breaker_trips: 0
+'''
+
+import os
+import sqlite3
+import traceback
+
+from ansible.module_utils.basic import AnsibleModule, missing_required_lib
+from ansible.module_utils._text import to_native
+
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.api import (
+    AsyncCAGWClient,
+    cagw_client_argument_spec,
+    cagw_client_kwargs,
+    SessionConfigurationException,
+)
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.certificate import (
+    CagwCertificate,
+    CURVES,
+    KEY_TYPES,
+    ParamsModule,
+    private_key_argument_spec,
+    subject_alt_name_spec,
+    version_tuple,
+)
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.inventory import Inventory
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.keygen import generate_private_keys
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.persistent import cagw_client_for
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.profiling import Profiler
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.concurrency import (
+    run_concurrently,
+    run_on_event_loop,
+    throughput_stats,
+    Stopwatch,
+)
+
+CRYPTOGRAPHY_IMP_ERR = None
+try:
+    import cryptography
+    CRYPTOGRAPHY_VERSION = version_tuple(cryptography.__version__)
+except ImportError:
+    CRYPTOGRAPHY_IMP_ERR = traceback.format_exc()
+    CRYPTOGRAPHY_FOUND = False
+else:
+    CRYPTOGRAPHY_FOUND = True
+
+MINIMAL_CRYPTOGRAPHY_VERSION = '1.6'
+
+# Options of an item which fall back to the option of the same name of the module
+INHERITED_OPTIONS = ('certificate_authority_id', 'certificate_profile_id', 'connector_name', 'enrollment_format', 'force', 'remaining_days',
+                     'private_key_type', 'private_key_size', 'private_key_curve', 'private_key_passphrase')
+
+
+class BatchItem(ParamsModule):
+    '''
+    Presents one item of the batch to CagwCertificate as if it was the module
+    '''
+    def __init__(self, module, item):
+        params = dict(
+            request_type='new',
+            host=module.params['host'],
+            port=module.params['port'],
+            validate_certs=module.params['validate_certs'],
+            status_check=module.params['status_check'],
+            status_check_threshold=module.params['status_check_threshold'],
+            renewal_window=module.params['renewal_window'],
+            renewal_jitter=module.params['renewal_jitter'],
+            serial_no=None,
+            action_type=None,
+            action_reason=None,
+            custom_fields=None,
+            backup=module.params['backup'],
+            fsync=module.params['fsync'],
+            metadata_cache=module.params['metadata_cache'],
+        )
+        params.update(item)
+        for option in INHERITED_OPTIONS:
+            if params.get(option) is None:
+                params[option] = module.params[option]
+        super(BatchItem, self).__init__(params, check_mode=module.check_mode)
+        # Generated ahead of the enrollments, when private_key_path does not exist yet
+        self.private_key = None
+
+    def needs_private_key(self):
+        params = self.params
+        return (params['enrollment_format'] == 'X509' and not params['csr'] and params['private_key_path']
+                and not os.path.exists(params['private_key_path']))
+
+    def validate(self):
+        params = self.params
+        missing = []
+        if not params['certificate_profile_id']:
+            missing.append('certificate_profile_id')
+        if not params['connector_name']:
+            missing.append('connector_name')
+        if params['enrollment_format'] == 'X509' and not params['csr'] and not params['private_key_path']:
+            missing.append('csr or private_key_path')
+        if params['enrollment_format'] == 'PKCS12':
+            missing.extend(option for option in ('p12_protection_password', 'dn') if not params[option])
+        if params['connector_name'] == 'ECS':
+            missing.extend(option for option in ('requester_name', 'requester_email') if not params[option])
+        if missing:
+            self.fail_json(msg='missing required arguments: {0}'.format(', '.join(missing)))
+        if params['csr'] and params['private_key_path']:
+            self.fail_json(msg='parameters are mutually exclusive: csr|private_key_path')
+        if params['enrollment_format'] == 'X509' and params['csr'] and not os.path.exists(params['csr']):
+            self.fail_json(msg='The csr field of {0} was not a valid path.'.format(params['csr']))
+
+
+def item_profiler(module):
+    # tracemalloc is process wide, its peak is reported once for the whole batch
+    return Profiler(trace_memory=False) if module.params['profile'] else None
+
+
+def enroll(module, cagw_client, inventory, item):
+    with Stopwatch() as timer:
+        item.validate()
+        certificate = CagwCertificate(item, cagw_client=cagw_client, profiler=item_profiler(module), private_key=item.private_key,
+                                      inventory=inventory)
+        certificate.request_cert(item)
+    return enrollment_result(certificate, item, timer)
+
+
+async def enroll_async(module, cagw_client, inventory, item):
+    with Stopwatch() as timer:
+        item.validate()
+        certificate = CagwCertificate(item, cagw_client=cagw_client, profiler=item_profiler(module), private_key=item.private_key,
+                                      inventory=inventory)
+        await certificate.request_cert_async(item)
+    return enrollment_result(certificate, item, timer)
+
+
+def enrollment_result(certificate, item, timer):
+    result = certificate.dump()
+    result.pop('cert_details')
+    # Counted on the shared session, the aggregate is in stats
+    result.pop('retries')
+    result.pop('filename')
+    result.update(path=item.params['path'], failed=False, elapsed=round(timer.elapsed, 3))
+    return result
+
+
+def cagw_certificate_batch_argument_spec():
+    item_spec = dict(
+        path=dict(type='path', required=True),
+        csr=dict(type='path'),
+        private_key_path=dict(type='path'),
+        private_key_type=dict(type='str', choices=list(KEY_TYPES)),
+        private_key_size=dict(type='int'),
+        private_key_curve=dict(type='str', choices=list(CURVES)),
+        dn=dict(type='str'),
+        p12_protection_password=dict(type='str', no_log=True),
+        validity_period=dict(type='str'),
+        subject_alt_name=dict(type='dict', default=None, options=subject_alt_name_spec()),
+        certificate_authority_id=dict(type='str'),
+        certificate_profile_id=dict(type='str'),
+        connector_name=dict(type='str', choices=['SM', 'ECS', 'PKIaaS', 'MSCA']),
+        enrollment_format=dict(type='str', choices=['X509', 'PKCS12']),
+        force=dict(type='bool'),
+        remaining_days=dict(type='int'),
+        requester_name=dict(type='str'),
+        requester_email=dict(type='str'),
+        requester_phone=dict(type='str'),
+        tracking_info=dict(type='str'),
+        additional_emails=dict(type='list', elements='str'),
+    )
+    spec = dict(
+        host=dict(type='list', elements='str', required=True),
+        port=dict(type='int', default=443),
+        validate_certs=dict(type='bool', default=True),
+        certificate_authority_id=dict(type='str', required=True),
+        certificate_profile_id=dict(type='str'),
+        connector_name=dict(type='str', choices=['SM', 'ECS', 'PKIaaS', 'MSCA']),
+        enrollment_format=dict(type='str', choices=['X509', 'PKCS12'], default='X509'),
+        force=dict(type='bool', default=False),
+        backup=dict(type='bool', default=False),
+        fsync=dict(type='bool', default=False),
+        metadata_cache=dict(type='bool', default=False),
+        inventory_path=dict(type='path'),
+        remaining_days=dict(type='int', default=30),
+        renewal_window=dict(type='float'),
+        renewal_jitter=dict(type='float', default=0),
+        status_check=dict(type='str', default='remote', choices=['remote', 'local', 'local_then_remote', 'inventory']),
+        status_check_threshold=dict(type='int'),
+        workers=dict(type='int', default=8),
+        engine=dict(type='str', default='threads', choices=['threads', 'asyncio']),
+        allow_partial_failure=dict(type='bool', default=False),
+        profile=dict(type='bool', default=False),
+        certificates=dict(type='list', elements='dict', required=True, options=item_spec),
+    )
+    spec.update(private_key_argument_spec())
+    return spec
+
+
+def main():
+    cagw_argument_spec = cagw_client_argument_spec()
+    cagw_argument_spec.update(cagw_certificate_batch_argument_spec())
+    module = AnsibleModule(argument_spec=cagw_argument_spec, supports_check_mode=True, add_file_common_args=True)
+    if not CRYPTOGRAPHY_FOUND or CRYPTOGRAPHY_VERSION < version_tuple(MINIMAL_CRYPTOGRAPHY_VERSION):
+        module.fail_json(msg=missing_required_lib('cryptography >= {0}'.format(MINIMAL_CRYPTOGRAPHY_VERSION)),
+                         exception=CRYPTOGRAPHY_IMP_ERR)
+    if module.params['workers'] < 1:
+        module.fail_json(msg='workers must be at least 1, got {0}.'.format(module.params['workers']))
+
+    # Two items writing the same file would race each other
+    paths = [item['path'] for item in module.params['certificates']]
+    duplicates = sorted(set(path for path in paths if paths.count(path) > 1))
+    if duplicates:
+        module.fail_json(msg='Every certificate path must be unique, found duplicates: {0}'.format(', '.join(duplicates)))
+
+    workers = module.params['workers']
+    profiler = Profiler().start() if module.params['profile'] else None
+    try:
+        if module.params['engine'] == 'asyncio':
+            cagw_client = AsyncCAGWClient(max_concurrency=workers, **cagw_client_kwargs(module.params))
+        else:
+            cagw_client = cagw_client_for(module, workers)
+    except SessionConfigurationException as e:
+        module.fail_json(msg='Failed to initialize Entrust Provider: {0}'.format(to_native(e)))
+    if profiler is not None:
+        profiler.add_setup(cagw_client.session)
+    # One connection for all the items, they record their certificate one at a time
+    inventory = None
+    # Check mode reads an existing inventory, it does not create one
+    if module.params['inventory_path'] and not (module.check_mode and not os.path.exists(module.params['inventory_path'])):
+        try:
+            inventory = Inventory(module.params['inventory_path'], read_only=module.check_mode)
+        except (OSError, sqlite3.Error) as e:
+            module.fail_json(msg='Failed to open the inventory {0}: {1}'.format(module.params['inventory_path'], to_native(e)))
+
+    items = [BatchItem(module, item) for item in module.params['certificates']]
+    if not module.check_mode:
+        pending = [item for item in items if item.needs_private_key()]
+        try:
+            keys = generate_private_keys((item.params['private_key_type'], item.params['private_key_size'], item.params['private_key_curve'])
+                                         for item in pending)
+        except (ValueError, TypeError):
+            # An invalid key size or curve, every item generates its own key and reports the error
+            keys = [None] * len(pending)
+        for item, key in zip(pending, keys):
+            item.private_key = key
+    with Stopwatch() as timer:
+        if module.params['engine'] == 'asyncio':
+            outcomes = run_on_event_loop(lambda item: enroll_async(module, cagw_client, inventory, item), items, workers,
+                                         cleanup=cagw_client.session.pool.aclose)
+        else:
+            outcomes = run_concurrently(lambda item: enroll(module, cagw_client, inventory, item), items, workers)
+
+    results = []
+    for item, (result, error) in zip(items, outcomes):
+        for warning in item.warnings:
+            module.warn('{0}: {1}'.format(item.params['path'], warning))
+        if error is not None:
+            result = dict(path=item.params['path'], changed=False, failed=True, msg=to_native(error))
+        elif os.path.exists(result['path']):
+            # The owner, group and mode options apply to every certificate, the items only wrote their content
+            file_args = module.load_file_common_arguments(module.params, path=result['path'])
+            result['changed'] = module.set_fs_attributes_if_different(file_args, result['changed'])
+        results.append(result)
+
+    failed = sum(1 for result in results if result['failed'])
+    changed = sum(1 for result in results if result['changed'])
+    stats = throughput_stats(len(results), timer.elapsed, min(workers, max(len(results), 1)),
+                             changed=changed, unchanged=len(results) - changed - failed, failed=failed)
+    stats.update(cagw_client.session.pool.stats())
+    stats.update(cagw_client.session.retry_stats())
+    if profiler is not None:
+        for result in results:
+            for phase, seconds in result.get('timings', {}).items():
+                if phase != 'total':
+                    profiler.add(phase, seconds)
+        stats['timings'] = profiler.result()
+
+    if failed and (not module.params['allow_partial_failure'] or failed == len(results)):
+        module.fail_json(msg='{0} of {1} certificate enrollments failed.'.format(failed, len(results)),
+                         changed=changed > 0, results=results, stats=stats)
+    module.exit_json(changed=changed > 0, results=results, stats=stats)
+
+
+if __name__ == '__main__':
+    main()
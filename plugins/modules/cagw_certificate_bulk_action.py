@@ -0,0 +1,471 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright (c), Entrust Corporation, 2023
+# Author: Sapna Jain, Entrust
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = '''
+---
+module: cagw_certificate_bulk_action
+author:
+    - Sapna Jain (@sapnajainEntrust)
+short_description: Revoke, hold or unhold many certificates with the Certificate Authority Gateway (CAGW) API
+version_added: 1.1.0
+description:
+    - Take the same action on a large number of certificates in a single task, e.g. revoke every certificate
+      of a compromised key during an incident.
+    - The serial numbers are read from O(serial_numbers) and O(src) one at a time, rather than loaded all at once, and
+      the actions are sent concurrently by a pool of O(workers) threads sharing one API session, at most O(rate_limit) per second.
+    - The outcome of every action is appended to O(journal_path) as soon as CAGW answered it. Running the task again
+      with the same journal, e.g. after it was interrupted or some actions failed, only sends the actions which did not
+      complete yet.
+    - A failure of one action does not stop the others, the failed actions are reported in RV(failures).
+notes:
+    - Supports check mode, in which no request is sent to CAGW and the journal is not written.
+requirements:
+    - Ansible Core >= 2.14.0
+    - Minimum Python Version = 3.6
+extends_documentation_fragment:
+    - entrust.crypto.cagw_client
+options:
+    host:
+        description:
+            - Host or IP address for Entrust CAGW.
+            - A list of gateway endpoints, each a host optionally followed by C(:port), e.g. C(cagw2.example.com:8443) or
+              C([2001:db8::1]:8443), with O(port) by default. The requests go to the healthiest endpoint, by latency and
+              error rate, and to the next one when it cannot be connected to, see O(cagw_api_connect_timeout).
+        type: list
+        elements: str
+        required: true
+
+    port:
+        description:
+            - Port for Entrust CAGW.
+        type: int
+        default: 443
+
+    validate_certs:
+        description:
+            - If set to false then SSL validation with Server is skipped.
+              This should be set to false only for testing purposes.
+        type: bool
+        default: True
+
+    certificate_authority_id:
+        description:
+            - Unique id for the Certificate Authority which issued the certificates.
+        type: str
+        required: true
+
+    action_type:
+        description:
+            - The action taken on every certificate.
+        type: str
+        required: true
+        choices: [ 'RevokeAction', 'HoldAction', 'UnholdAction']
+
+    action_reason:
+        description:
+            - Reason given for every action.
+        type: str
+        required: true
+
+    serial_numbers:
+        description:
+            - Serial numbers, in hexadecimal format, of the certificates to take the action on.
+        type: list
+        elements: str
+
+    src:
+        description:
+            - Path of a file listing serial numbers of certificates to take the action on, after those of O(serial_numbers).
+            - See O(src_format) for its format.
+        type: path
+
+    src_format:
+        description:
+            - The format of O(src).
+            - V(lines) is one serial number per line, empty lines and lines starting with C(#) are skipped.
+            - V(csv) is a CSV file whose first row names the columns, the serial numbers are in the column O(serial_column).
+            - V(jsonl) is one JSON value per line, either a serial number or an object with the serial number under the key O(serial_column).
+            - V(auto) is V(csv) for a C(.csv) file, V(jsonl) for a C(.jsonl) or C(.ndjson) file and V(lines) otherwise.
+        type: str
+        choices: [ 'auto', 'lines', 'csv', 'jsonl' ]
+        default: auto
+
+    serial_column:
+        description:
+            - The column of a V(csv), or the key of a V(jsonl), O(src) holding the serial numbers.
+        type: str
+        default: serial_number
+
+    journal_path:
+        description:
+            - Path of a file recording the outcome of every action, one JSON object per line, which is created when it does not exist.
+            - The actions which completed according to the journal are skipped, see RV(stats.skipped). They are looked up
+              in a SQLite index next to it, O(journal_path) followed by C(.index), which is brought up to date with the journal
+              when the task starts, or built again from it when it is missing.
+            - Without it, every action is sent again by another run.
+        type: path
+
+    fsync:
+        description:
+            - Flush the journal to disk after every action, so that it survives a crash of the host and not only of the task.
+        type: bool
+        default: False
+
+    inventory_path:
+        description:
+            - Path of a local SQLite database in which the new status of every certificate is recorded,
+              see O(entrust.crypto.cagw_certificate#module:inventory_path).
+        type: path
+
+    workers:
+        description:
+            - Maximum number of actions sent at the same time.
+        type: int
+        default: 8
+
+    rate_limit:
+        description:
+            - Maximum number of actions sent per second, whatever the number of O(workers), e.g. to stay within the rate
+              limit of the gateway or of the CA behind it.
+            - By default the actions are sent as fast as the O(workers) allow.
+        type: float
+
+    allow_partial_failure:
+        description:
+            - If O(allow_partial_failure=true), the task only fails when every action failed.
+            - By default, the task fails when any action failed, after all the others were sent.
+        type: bool
+        default: False
+
+seealso:
+    - module: entrust.crypto.cagw_certificate
+      description: Take an action on a single certificate, or on the certificate last recorded for a path.
+    - module: entrust.crypto.cagw_certificate_inventory_info
+      description: Find the certificates recorded in the inventory, e.g. to list the serial numbers to revoke.
+'''
+
+EXAMPLES = r'''
+- name: Revoke the certificates listed in a CSV export, resuming where an earlier run stopped
+  entrust.crypto.cagw_certificate_bulk_action:
+    host: cagw.example.com
+    cagw_api_client_cert_path: /etc/ssl/entrust/cagw-client.crt
+    cagw_api_client_cert_key_path: /etc/ssl/entrust/cagw-client.key
+    cagw_api_specification_path: /etc/ssl/entrust/cagw-api.yaml
+    certificate_authority_id: ca_id
+    action_type: RevokeAction
+    action_reason: keyCompromise
+    src: /var/lib/entrust/compromised.csv
+    serial_column: serial
+    journal_path: /var/lib/entrust/revocations.jsonl
+    workers: 16
+    rate_limit: 50
+
+- name: Hold the certificates of the inventory which are still issued
+  block:
+    - name: Find the certificates
+      entrust.crypto.cagw_certificate_inventory_info:
+        inventory_path: /var/lib/entrust/inventory.db
+        certificate_authority_id: ca_id
+        statuses:
+          - issued
+      register: issued
+
+    - name: Hold them
+      entrust.crypto.cagw_certificate_bulk_action:
+        host: cagw.example.com
+        cagw_api_client_cert_path: /etc/ssl/entrust/cagw-client.crt
+        cagw_api_client_cert_key_path: /etc/ssl/entrust/cagw-client.key
+        cagw_api_specification_path: /etc/ssl/entrust/cagw-api.yaml
+        certificate_authority_id: ca_id
+        action_type: HoldAction
+        action_reason: unspecified
+        serial_numbers: "{{ issued.certificates | map(attribute='serial_number') | list }}"
+        inventory_path: /var/lib/entrust/inventory.db
+'''
+
+RETURN = '''
+failures:
+    description: The actions which failed in this run, in the order they completed.
+    returned: always
+    type: list
+    elements: dict
+    contains:
+        serial_number:
+            description: The serial number of the certificate.
+            type: str
+            sample: 5B9BA13D
+        msg:
+            description: Why the action failed.
+            type: str
+
+stats:
+    description: Counts and throughput of the run.
+    returned: always
+    type: dict
+    contains:
+        total:
+            description: Number of serial numbers read, duplicates included.
+            type: int
+        completed:
+            description: Number of actions which CAGW completed in this run, or would be sent in check mode.
+            type: int
+        skipped:
+            description: Number of serial numbers whose action already completed, in the journal or earlier in this run.
+            type: int
+        failed:
+            description: Number of actions which failed.
+            type: int
+        workers:
+            description: Number of worker threads used.
+            type: int
+        elapsed:
+            description: Wall clock seconds for the whole run.
+            type: float
+        requests_per_second:
+            description: Serial numbers processed per second.
+            type: float
+        connections_opened:
+            description: Number of HTTPS connections opened to CAGW.
+            type: int
+        connections_reused:
+            description: Number of requests sent over an already open HTTPS connection.
+            type: int
+        retries:
+            description: Number of requests which were sent again after a failure, see O(cagw_api_retries).
+            type: int
+        failovers:
+            description: Number of requests which went to another endpoint of O(host) because one could not be connected to.
+            type: int
+            returned: when O(host) lists several endpoints or O(cagw_api_hedge_delay) is set
+        hedged_requests:
+            description: Number of requests which were sent again after O(cagw_api_hedge_delay).
+            type: int
+            returned: when O(host) lists several endpoints or O(cagw_api_hedge_delay) is set
+        hedges_won:
+            description: Number of hedged requests whose second request answered first.
+            type: int
+            returned: when O(host) lists several endpoints or O(cagw_api_hedge_delay) is set
+        endpoints:
+            description:
+                - The endpoints of O(host) with their number of C(requests) and C(failures), and the moving averages
+                  of their C(latency) in seconds and of their C(error_rate), which the requests were balanced by.
+            type: list
+            elements: dict
+            returned: when O(host) lists several endpoints or O(cagw_api_hedge_delay) is set
+    sample:
+        total: 5000
+        completed: 3120
+        skipped: 1879
+        failed: 1
+        workers: 16
+        elapsed: 62.5
+        requests_per_second: 80.0
+        connections_opened: 16
+        connections_reused: 3105
+        retries: 3
+'''
+
+import csv
+import json
+import os
+import sqlite3
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils._text import to_native
+
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.api import (
+    cagw_client_argument_spec,
+    SessionConfigurationException,
+)
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.certificate import CagwCertificate, ParamsModule
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.concurrency import (
+    RateLimiter,
+    run_streaming,
+    throughput_stats,
+    Stopwatch,
+)
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.inventory import Inventory
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.journal import ActionJournal
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.persistent import cagw_client_for
+
+SRC_FORMATS_BY_EXTENSION = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+}
+
+
+def read_src(path, src_format, column):
+    """Yield the serial numbers of the file at path one at a time, raises ValueError for a line which cannot be read"""
+    if src_format == 'auto':
+        src_format = SRC_FORMATS_BY_EXTENSION.get(os.path.splitext(path)[1].lower(), 'lines')
+    with open(path, 'r', newline='') as f:
+        if src_format == 'csv':
+            reader = csv.DictReader(f)
+            if reader.fieldnames is not None and column not in reader.fieldnames:
+                raise ValueError('{0} has no column {1}, its columns are {2}'.format(path, column, ', '.join(reader.fieldnames)))
+            for row in reader:
+                yield row[column] or ''
+            return
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or (src_format == 'lines' and line.startswith('#')):
+                continue
+            if src_format == 'lines':
+                yield line
+                continue
+            try:
+                value = json.loads(line)
+            except ValueError as e:
+                raise ValueError('line {0} of {1} is not JSON: {2}'.format(number, path, to_native(e)))
+            yield (value.get(column) or '') if isinstance(value, dict) else to_native(value)
+
+
+def read_serial_numbers(params):
+    """Yield the serial numbers of serial_numbers, then of src, without the blanks around them"""
+    for serial_number in params['serial_numbers'] or []:
+        yield serial_number.strip()
+    if params['src']:
+        for serial_number in read_src(params['src'], params['src_format'], params['serial_column']):
+            yield to_native(serial_number).strip()
+
+
+class ActionItem(ParamsModule):
+    '''
+    Presents the action on one serial number to CagwCertificate as if it was the module
+    '''
+    def __init__(self, module, serial_number):
+        params = dict(
+            request_type='action',
+            path=None,
+            force=False,
+            serial_no=serial_number,
+            action_type=module.params['action_type'],
+            action_reason=module.params['action_reason'],
+            certificate_authority_id=module.params['certificate_authority_id'],
+            host=module.params['host'],
+            port=module.params['port'],
+            validate_certs=module.params['validate_certs'],
+        )
+        super(ActionItem, self).__init__(params, check_mode=module.check_mode)
+
+
+def take_action(cagw_client, inventory, rate_limiter, item):
+    rate_limiter.wait()
+    certificate = CagwCertificate(item, cagw_client=cagw_client, inventory=inventory)
+    certificate.request_cert(item)
+    return certificate.cert_details
+
+
+def cagw_certificate_bulk_action_argument_spec():
+    return dict(
+        host=dict(type='list', elements='str', required=True),
+        port=dict(type='int', default=443),
+        validate_certs=dict(type='bool', default=True),
+        certificate_authority_id=dict(type='str', required=True),
+        action_type=dict(type='str', required=True, choices=['RevokeAction', 'HoldAction', 'UnholdAction']),
+        action_reason=dict(type='str', required=True),
+        serial_numbers=dict(type='list', elements='str'),
+        src=dict(type='path'),
+        src_format=dict(type='str', default='auto', choices=['auto', 'lines', 'csv', 'jsonl']),
+        serial_column=dict(type='str', default='serial_number'),
+        journal_path=dict(type='path'),
+        fsync=dict(type='bool', default=False),
+        inventory_path=dict(type='path'),
+        workers=dict(type='int', default=8),
+        rate_limit=dict(type='float'),
+        allow_partial_failure=dict(type='bool', default=False),
+    )
+
+
+def main():
+    cagw_argument_spec = cagw_client_argument_spec()
+    cagw_argument_spec.update(cagw_certificate_bulk_action_argument_spec())
+    module = AnsibleModule(argument_spec=cagw_argument_spec, supports_check_mode=True,
+                           required_one_of=[['serial_numbers', 'src']])
+    params = module.params
+    if params['workers'] < 1:
+        module.fail_json(msg='workers must be at least 1, got {0}.'.format(params['workers']))
+    if params['rate_limit'] is not None and params['rate_limit'] <= 0:
+        module.fail_json(msg='rate_limit must be a positive number of actions per second, got {0}.'.format(params['rate_limit']))
+    if params['src'] and not os.path.exists(params['src']):
+        module.fail_json(msg='The src field of {0} was not a valid path.'.format(params['src']))
+
+    try:
+        cagw_client = cagw_client_for(module, params['workers'])
+    except SessionConfigurationException as e:
+        module.fail_json(msg='Failed to initialize Entrust Provider: {0}'.format(to_native(e)))
+    inventory = None
+    try:
+        # Without journal_path, it only knows the actions started in this run, so that a duplicate is not sent again
+        journal = ActionJournal(params['journal_path'], fsync=params['fsync'], writable=not module.check_mode)
+    except (IOError, OSError, sqlite3.Error) as e:
+        module.fail_json(msg='Failed to open the journal {0}: {1}'.format(params['journal_path'], to_native(e)))
+    try:
+        if params['inventory_path'] and not module.check_mode:
+            inventory = Inventory(params['inventory_path'])
+    except (OSError, sqlite3.Error) as e:
+        module.fail_json(msg='Failed to open the inventory {0}: {1}'.format(params['inventory_path'], to_native(e)))
+
+    ca_id, action_type = params['certificate_authority_id'], params['action_type']
+    counts = dict(total=0, completed=0, skipped=0, failed=0)
+    failures = []
+
+    def pending_items():
+        for serial_number in read_serial_numbers(params):
+            if not serial_number:
+                continue
+            counts['total'] += 1
+            if not journal.start(ca_id, serial_number, action_type):
+                counts['skipped'] += 1
+                continue
+            yield ActionItem(module, serial_number)
+
+    def on_result(item, cert_details, error):
+        serial_number = item.params['serial_no']
+        for warning in item.warnings:
+            module.warn('{0}: {1}'.format(serial_number, warning))
+        if error is not None:
+            counts['failed'] += 1
+            failures.append(dict(serial_number=serial_number, msg=to_native(error)))
+            journal.append(ca_id, serial_number, action_type, 'failed', msg=to_native(error))
+            return
+        counts['completed'] += 1
+        journal.append(ca_id, serial_number, action_type, 'completed', action_status=(cert_details or {}).get('status'))
+
+    rate_limiter = RateLimiter(params['rate_limit'])
+    error = None
+    with Stopwatch() as timer:
+        try:
+            run_streaming(lambda item: take_action(cagw_client, inventory, rate_limiter, item), pending_items(), params['workers'], on_result)
+        except (IOError, OSError, ValueError, csv.Error, sqlite3.Error) as e:
+            error = 'Failed to read the serial numbers: {0}'.format(to_native(e))
+    journal.close()
+    if inventory is not None:
+        inventory.close()
+
+    sent_count = counts['total'] - counts['skipped']
+    stats = throughput_stats(counts['total'], timer.elapsed, min(params['workers'], max(sent_count, 1)),
+                             completed=counts['completed'], skipped=counts['skipped'], failed=counts['failed'])
+    stats.update(cagw_client.session.pool.stats())
+    stats.update(cagw_client.session.retry_stats())
+    changed = counts['completed'] > 0
+    failed = counts['failed']
+    if error is not None:
+        module.fail_json(msg=error, changed=changed, failures=failures, stats=stats)
+    if failed and (not params['allow_partial_failure'] or failed == sent_count):
+        module.fail_json(msg='{0} of {1} certificate actions failed.'.format(failed, sent_count),
+                         changed=changed, failures=failures, stats=stats)
+    module.exit_json(changed=changed, failures=failures, stats=stats)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,435 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright (c), Entrust Corporation, 2023
+# Author: Sapna Jain, Entrust
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = '''
+---
+module: cagw_certificate_info
+author:
+    - Sapna Jain (@sapnajainEntrust)
+short_description: Find the certificates of a host which need a renewal, with the Certificate Authority Gateway (CAGW) API
+version_added: 1.1.0
+description:
+    - Scan directories, files and glob patterns for PEM or DER encoded certificates.
+      Of a file holding a chain, the certificate which issued none of the others is the one reported.
+    - Certificates found under several paths are deduplicated by serial number, and the status of every
+      serial number is then looked up with the CAGW API, concurrently by a pool of O(workers) threads
+      or with O(engine=asyncio) by as many coroutines on one event loop.
+    - Returns the certificates which are expiring, expired, revoked or held, so a single task can audit a whole host.
+requirements:
+    - cryptography >= 1.6
+    - Ansible Core >= 2.14.0
+    - Minimum Python Version = 3.6
+extends_documentation_fragment:
+    - entrust.crypto.cagw_client
+options:
+    paths:
+        description:
+            - Directories, certificate files or glob patterns to scan.
+            - Directories are scanned for files matching O(patterns).
+        type: list
+        elements: path
+        required: true
+
+    patterns:
+        description:
+            - Shell patterns the names of the files in a directory of O(paths) must match.
+        type: list
+        elements: str
+        default: [ '*.crt', '*.pem', '*.cer', '*.der' ]
+
+    recurse:
+        description:
+            - Whether directories of O(paths) are scanned recursively.
+        type: bool
+        default: False
+
+    host:
+        description:
+            - Host or IP address for Entrust CAGW.
+            - A list of gateway endpoints, each a host optionally followed by C(:port), e.g. C(cagw2.example.com:8443) or
+              C([2001:db8::1]:8443), with O(port) by default. The requests go to the healthiest endpoint, by latency and
+              error rate, and to the next one when it cannot be connected to, see O(cagw_api_connect_timeout).
+        type: list
+        elements: str
+        required: true
+
+    port:
+        description:
+            - Port for Entrust CAGW.
+        type: int
+        default: 443
+
+    validate_certs:
+        description:
+            - If set to false then SSL validation with Server is skipped.
+              This should be set to false only for testing purposes.
+        type: bool
+        default: True
+
+    certificate_authority_id:
+        description:
+            - Unique id for the Certificate Authority which issued the certificates.
+        type: str
+        required: true
+
+    remaining_days:
+        description:
+            - A certificate with fewer days left than this is reported as expiring.
+        type: int
+        default: 30
+
+    query_gateway:
+        description:
+            - Whether the status of the certificates is looked up in CAGW.
+            - If set to false only the local expiry is checked, and no request is sent to CAGW.
+        type: bool
+        default: True
+
+    workers:
+        description:
+            - Maximum number of status lookups sent to CAGW at the same time.
+        type: int
+        default: 8
+
+    engine:
+        description:
+            - How the status lookups are sent concurrently.
+            - V(threads) runs them on a pool of O(workers) threads, V(asyncio) as coroutines on a single event loop.
+        type: str
+        choices: [ 'threads', 'asyncio' ]
+        default: threads
+
+    metadata_cache:
+        description:
+            - Cache the metadata of every certificate found in a hidden file next to it, so that the certificates which
+              did not change are not parsed again by later scans, see O(entrust.crypto.cagw_certificate#module:metadata_cache).
+            - This writes a C(.<name>.cagw-metadata.json) file next to every certificate scanned which does not have an up to
+              date one, the only change the module makes on the host. In check mode the existing files are used and none is written.
+        type: bool
+        default: False
+
+    only_candidates:
+        description:
+            - If set to true only the certificates needing a renewal are returned in RV(certificates).
+            - If set to false every certificate found is returned.
+        type: bool
+        default: True
+
+seealso:
+    - module: entrust.crypto.cagw_certificate
+      description: Renew a single certificate.
+    - module: entrust.crypto.cagw_certificate_batch
+      description: Renew many certificates at once.
+'''
+
+EXAMPLES = r'''
+- name: Find the certificates of the web servers which need a renewal
+  entrust.crypto.cagw_certificate_info:
+    paths:
+      - /etc/ssl/crt
+      - /etc/nginx/certs/*.pem
+    host: cagw.example.com
+    cagw_api_client_cert_path: /etc/ssl/entrust/cagw-client.crt
+    cagw_api_client_cert_key_path: /etc/ssl/entrust/cagw-client.key
+    cagw_api_specification_path: /etc/ssl/entrust/cagw-api.yaml
+    certificate_authority_id: ca_id
+    remaining_days: 45
+  register: audit
+
+- name: Show the paths of the revoked certificates
+  ansible.builtin.debug:
+    msg: "{{ audit.certificates | selectattr('reasons', 'contains', 'revoked') | map(attribute='paths') | flatten }}"
+'''
+
+RETURN = '''
+certificates:
+    description: The certificates found, deduplicated by serial number.
+    returned: always
+    type: list
+    elements: dict
+    contains:
+        serial_number:
+            description: The serial number of the certificate in hexadecimal format.
+            type: str
+            sample: 5B9BA13D
+        paths:
+            description: The files holding the certificate.
+            type: list
+            elements: str
+            sample: [ /etc/ssl/crt/www.example.com.crt ]
+        subject:
+            description: The subject of the certificate.
+            type: str
+            sample: CN=www.example.com,O=Example
+        not_after:
+            description: The expiry of the certificate in ISO 8601 format.
+            type: str
+            sample: '2025-04-22T09:00:00+00:00'
+        cert_days:
+            description: The number of days the certificate remains valid from now.
+            type: int
+            sample: 12
+        cert_status:
+            description: The certificate status in CAGW.
+            type: str
+            returned: when the status was looked up in CAGW
+            sample: revoked
+        lookup_error:
+            description: The error of the status lookup in CAGW.
+            type: str
+            returned: when the status lookup failed
+        reasons:
+            description:
+                - Why the certificate needs a renewal, empty when it does not.
+                - 'Possible values are: expired, expiring, revoked, held, suspended'
+            type: list
+            elements: str
+            sample: [ expiring ]
+
+summary:
+    description: Statistics of the scan.
+    returned: always
+    type: dict
+    contains:
+        files:
+            description: Number of files holding a certificate.
+            type: int
+        skipped:
+            description: Number of files which could not be read or parsed as a certificate.
+            type: int
+        cached:
+            description: Number of files whose certificate was taken from the cache of O(metadata_cache) instead of parsed.
+            type: int
+        serials:
+            description: Number of distinct serial numbers found.
+            type: int
+        candidates:
+            description: Number of certificates needing a renewal.
+            type: int
+        lookup_failed:
+            description: Number of status lookups which failed.
+            type: int
+        elapsed:
+            description: Wall clock seconds spent on the status lookups.
+            type: float
+        retries:
+            description: Number of status lookups which were sent again after a failure, see O(cagw_api_retries).
+            type: int
+    sample:
+        files: 41
+        skipped: 3
+        cached: 38
+        serials: 37
+        candidates: 2
+        lookup_failed: 0
+        elapsed: 0.82
+        retries: 0
+'''
+
+import fnmatch
+import glob
+import os
+import traceback
+from datetime import datetime, timezone
+
+from ansible.module_utils.basic import AnsibleModule, missing_required_lib
+from ansible.module_utils._text import to_native
+
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.api import (
+    AsyncCAGWClient,
+    cagw_client_argument_spec,
+    cagw_client_kwargs,
+    cagw_gateway_kwargs,
+    SessionConfigurationException,
+)
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.certificate import (
+    parse_iso8601,
+    UNUSABLE_STATUSES,
+    version_tuple,
+)
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.concurrency import (
+    run_concurrently,
+    run_on_event_loop,
+    Stopwatch,
+)
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.metadata import read_certificate_metadata
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.persistent import cagw_client_for
+
+CRYPTOGRAPHY_IMP_ERR = None
+try:
+    import cryptography
+    CRYPTOGRAPHY_VERSION = version_tuple(cryptography.__version__)
+except ImportError:
+    CRYPTOGRAPHY_IMP_ERR = traceback.format_exc()
+    CRYPTOGRAPHY_FOUND = False
+else:
+    CRYPTOGRAPHY_FOUND = True
+
+MINIMAL_CRYPTOGRAPHY_VERSION = '1.6'
+
+
+def find_files(paths, patterns, recurse):
+    """Expand the directories and glob patterns of paths into a sorted list of files"""
+    files = set()
+    for path in paths:
+        for match in (glob.glob(path) if any(c in path for c in '*?[') else [path]):
+            if os.path.isfile(match):
+                files.add(match)
+            elif os.path.isdir(match):
+                for root, dirs, names in os.walk(match):
+                    for name in names:
+                        if any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+                            files.add(os.path.join(root, name))
+                    if not recurse:
+                        break
+    return sorted(files)
+
+
+class CagwCertificateInfo(object):
+    '''
+    Scan of the certificates of a host
+    '''
+    def __init__(self, module):
+        self.module = module
+        self.certificates = {}
+        self.files = 0
+        self.skipped = 0
+        self.cached = 0
+        self.lookup_failed = 0
+        self.retries = 0
+        self.elapsed = 0.0
+
+    def scan(self):
+        now = datetime.now(timezone.utc)
+        for path in find_files(self.module.params['paths'], self.module.params['patterns'], self.module.params['recurse']):
+            try:
+                metadata, cached = read_certificate_metadata(path, cache=self.module.params['metadata_cache'],
+                                                             write=not self.module.check_mode)
+            except (IOError, OSError, ValueError):
+                # Not a certificate, e.g. the private key of a *.pem
+                self.skipped += 1
+                continue
+            self.files += 1
+            self.cached += int(cached)
+            serial_number = metadata['serial_number']
+            entry = self.certificates.get(serial_number)
+            if entry is None:
+                entry = dict(
+                    serial_number=serial_number,
+                    paths=[],
+                    subject=metadata['subject'],
+                    not_after=metadata['not_after'],
+                    cert_days=(parse_iso8601(metadata['not_after']) - now).days,
+                )
+                self.certificates[serial_number] = entry
+            entry['paths'].append(path)
+
+    def lookup(self, cagw_client):
+        params = self.module.params
+
+        def get_status(serial_number):
+            result = cagw_client.GetCertificate(ca_id=params['certificate_authority_id'], serial_no=serial_number,
+                                                validate_certs=params['validate_certs'], **cagw_gateway_kwargs(params))
+            return (result.get('certificate') or {}).get('status')
+
+        async def get_status_async(serial_number):
+            result = await cagw_client.GetCertificate(ca_id=params['certificate_authority_id'], serial_no=serial_number,
+                                                      validate_certs=params['validate_certs'], **cagw_gateway_kwargs(params))
+            return (result.get('certificate') or {}).get('status')
+
+        serial_numbers = sorted(self.certificates)
+        with Stopwatch() as timer:
+            if params['engine'] == 'asyncio':
+                outcomes = run_on_event_loop(get_status_async, serial_numbers, params['workers'], cleanup=cagw_client.session.pool.aclose)
+            else:
+                outcomes = run_concurrently(get_status, serial_numbers, params['workers'])
+        self.elapsed = timer.elapsed
+        self.retries = cagw_client.session.retries
+        for serial_number, (status, error) in zip(serial_numbers, outcomes):
+            entry = self.certificates[serial_number]
+            if error is not None:
+                self.lookup_failed += 1
+                entry['lookup_error'] = to_native(error) or type(error).__name__
+            else:
+                entry['cert_status'] = status
+
+    def dump(self):
+        certificates = []
+        for serial_number in sorted(self.certificates):
+            entry = self.certificates[serial_number]
+            reasons = []
+            if entry['cert_days'] < 0:
+                reasons.append('expired')
+            elif entry['cert_days'] < self.module.params['remaining_days']:
+                reasons.append('expiring')
+            status = (entry.get('cert_status') or '').lower()
+            if status in UNUSABLE_STATUSES and status not in reasons:
+                reasons.append(status)
+            entry['reasons'] = reasons
+            if reasons or not self.module.params['only_candidates']:
+                certificates.append(entry)
+        summary = dict(
+            files=self.files,
+            skipped=self.skipped,
+            cached=self.cached,
+            serials=len(self.certificates),
+            candidates=sum(1 for entry in self.certificates.values() if entry['reasons']),
+            lookup_failed=self.lookup_failed,
+            elapsed=round(self.elapsed, 3),
+            retries=self.retries,
+        )
+        return dict(changed=False, certificates=certificates, summary=summary)
+
+
+def cagw_certificate_info_argument_spec():
+    return dict(
+        paths=dict(type='list', elements='path', required=True),
+        patterns=dict(type='list', elements='str', default=['*.crt', '*.pem', '*.cer', '*.der']),
+        recurse=dict(type='bool', default=False),
+        host=dict(type='list', elements='str', required=True),
+        port=dict(type='int', default=443),
+        validate_certs=dict(type='bool', default=True),
+        certificate_authority_id=dict(type='str', required=True),
+        remaining_days=dict(type='int', default=30),
+        query_gateway=dict(type='bool', default=True),
+        metadata_cache=dict(type='bool', default=False),
+        workers=dict(type='int', default=8),
+        engine=dict(type='str', default='threads', choices=['threads', 'asyncio']),
+        only_candidates=dict(type='bool', default=True),
+    )
+
+
+def main():
+    cagw_argument_spec = cagw_client_argument_spec()
+    cagw_argument_spec.update(cagw_certificate_info_argument_spec())
+    module = AnsibleModule(argument_spec=cagw_argument_spec, supports_check_mode=True)
+    if not CRYPTOGRAPHY_FOUND or CRYPTOGRAPHY_VERSION < version_tuple(MINIMAL_CRYPTOGRAPHY_VERSION):
+        module.fail_json(msg=missing_required_lib('cryptography >= {0}'.format(MINIMAL_CRYPTOGRAPHY_VERSION)),
+                         exception=CRYPTOGRAPHY_IMP_ERR)
+    if module.params['workers'] < 1:
+        module.fail_json(msg='workers must be at least 1, got {0}.'.format(module.params['workers']))
+
+    info = CagwCertificateInfo(module)
+    info.scan()
+    if module.params['query_gateway'] and info.certificates:
+        try:
+            if module.params['engine'] == 'asyncio':
+                cagw_client = AsyncCAGWClient(max_concurrency=module.params['workers'], **cagw_client_kwargs(module.params))
+            else:
+                cagw_client = cagw_client_for(module, module.params['workers'])
+        except SessionConfigurationException as e:
+            module.fail_json(msg='Failed to initialize Entrust Provider: {0}'.format(to_native(e)))
+        info.lookup(cagw_client)
+    module.exit_json(**info.dump())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright (c), Entrust Corporation, 2023
+# Author: Sapna Jain, Entrust
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = '''
+---
+module: cagw_certificate_inventory_info
+author:
+    - Sapna Jain (@sapnajainEntrust)
+short_description: Query the local inventory of the certificates requested with the Certificate Authority Gateway (CAGW) modules
+version_added: 1.1.0
+description:
+    - Find certificates in the SQLite inventory written by M(entrust.crypto.cagw_certificate) and
+      M(entrust.crypto.cagw_certificate_batch) with their C(inventory_path) option, e.g. those expiring in the next days.
+    - Only the inventory is read, CAGW is not contacted, so the statuses are those last recorded.
+requirements:
+    - Ansible Core >= 2.14.0
+    - Minimum Python Version = 3.6
+options:
+    inventory_path:
+        description:
+            - Path of the inventory, which must exist.
+        type: path
+        required: true
+
+    certificate_authority_id:
+        description:
+            - Only return the certificates of this Certificate Authority.
+        type: str
+
+    path:
+        description:
+            - Only return the certificates recorded for this path.
+        type: path
+
+    serial_no:
+        description:
+            - Only return the certificate with this serial number in hexadecimal format.
+        type: str
+
+    expiring_within_days:
+        description:
+            - Only return the certificates which expire in fewer days than this, including those which already expired.
+        type: int
+
+    statuses:
+        description:
+            - Only return the certificates last recorded with one of these statuses, e.g. V(issued) or V(revoked).
+        type: list
+        elements: str
+
+seealso:
+    - module: entrust.crypto.cagw_certificate
+      description: Record the certificates in the inventory with O(entrust.crypto.cagw_certificate#module:inventory_path).
+    - module: entrust.crypto.cagw_certificate_info
+      description: Scan the files of a host for certificates and look their status up in CAGW.
+'''
+
+EXAMPLES = r'''
+- name: Find the certificates which expire in the next 30 days
+  entrust.crypto.cagw_certificate_inventory_info:
+    inventory_path: /var/lib/entrust/inventory.db
+    expiring_within_days: 30
+    statuses:
+      - issued
+  register: expiring
+
+- name: Show the paths of these certificates
+  ansible.builtin.debug:
+    msg: "{{ expiring.certificates | map(attribute='path') | list }}"
+'''
+
+RETURN = '''
+certificates:
+    description: The certificates recorded in the inventory which match every option given, those expiring first first.
+    returned: always
+    type: list
+    elements: dict
+    contains:
+        ca_id:
+            description: The Certificate Authority which issued the certificate.
+            type: str
+            sample: ca_id
+        serial_number:
+            description: The serial number of the certificate in hexadecimal format.
+            type: str
+            sample: 5B9BA13D
+        path:
+            description: The path the certificate was last requested or fetched for.
+            type: str
+            sample: /etc/ssl/crt/www.example.com.crt
+        profile_id:
+            description: The profile the certificate was requested with.
+            type: str
+        enrollment_format:
+            description: The format the certificate was requested in.
+            type: str
+            sample: X509
+        not_before:
+            description: The start of the validity of the certificate, in UTC.
+            type: str
+            sample: '2024-04-22T09:00:00Z'
+        not_after:
+            description: The expiry of the certificate, in UTC.
+            type: str
+            sample: '2025-04-22T09:00:00Z'
+        cert_days:
+            description: The number of days the certificate remains valid from now, when its expiry is known.
+            type: int
+            sample: 12
+        status:
+            description: The status last recorded for the certificate, in lower case.
+            type: str
+            sample: issued
+        fingerprint:
+            description: The SHA-256 of the DER encoding of the certificate, unknown for a PKCS12.
+            type: str
+        updated:
+            description: When the certificate was last recorded, in UTC.
+            type: str
+            sample: '2024-04-22T09:00:12Z'
+'''
+
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils._text import to_native
+
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.certificate import parse_iso8601
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.inventory import Inventory
+
+
+def cagw_certificate_inventory_info_argument_spec():
+    return dict(
+        inventory_path=dict(type='path', required=True),
+        certificate_authority_id=dict(type='str'),
+        path=dict(type='path'),
+        serial_no=dict(type='str'),
+        expiring_within_days=dict(type='int'),
+        statuses=dict(type='list', elements='str'),
+    )
+
+
+def main():
+    module = AnsibleModule(argument_spec=cagw_certificate_inventory_info_argument_spec(), supports_check_mode=True)
+    params = module.params
+    # A clearer message than the one of SQLite
+    if not os.path.exists(params['inventory_path']):
+        module.fail_json(msg='The inventory {0} does not exist.'.format(params['inventory_path']))
+
+    try:
+        inventory = Inventory(params['inventory_path'], read_only=True)
+        certificates = inventory.search(ca_id=params['certificate_authority_id'], path=params['path'], serial_number=params['serial_no'],
+                                        expiring_within=params['expiring_within_days'], statuses=params['statuses'])
+        inventory.close()
+    except (OSError, sqlite3.Error) as e:
+        module.fail_json(msg='Failed to read the inventory {0}: {1}'.format(params['inventory_path'], to_native(e)))
+
+    now = datetime.now(timezone.utc)
+    for certificate in certificates:
+        not_after = parse_iso8601(certificate['not_after'] or '')
+        if not_after is not None:
+            certificate['cert_days'] = (not_after - now).days
+    module.exit_json(changed=False, certificates=certificates)
+
+
+if __name__ == '__main__':
+    main()
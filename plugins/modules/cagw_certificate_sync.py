@@ -0,0 +1,440 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright (c), Entrust Corporation, 2023
+# Author: Sapna Jain, Entrust
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = '''
+---
+module: cagw_certificate_sync
+author:
+    - Sapna Jain (@sapnajainEntrust)
+short_description: Mirror the certificates a CA issued, revoked or held with the Certificate Authority Gateway (CAGW) API
+version_added: 1.1.0
+description:
+    - List the events of the certificates of a Certificate Authority, e.g. their issuance or revocation, and write every
+      certificate concerned to O(dest) and/or record it in the inventory at O(inventory_path).
+    - The run is incremental, only the events since the previous run are listed. The end of the period listed
+      is kept in O(cursor_path) once every event of the period was handled, the next run starts from there.
+    - The events are read one page of O(page_size) at a time, the next page is only requested once those of
+      the current one were handled.
+notes:
+    - Supports check mode, in which the events are listed but nothing is written and the cursor is not moved. The task
+      is then changed when a certificate file of O(dest) or a record of O(inventory_path) would be written.
+    - Requires a gateway serving the C(GetCertificateEvents) operation of the CAGW API specification.
+requirements:
+    - Ansible Core >= 2.14.0
+    - Minimum Python Version = 3.6
+extends_documentation_fragment:
+    - entrust.crypto.cagw_client
+options:
+    host:
+        description:
+            - Host or IP address for Entrust CAGW.
+            - A list of gateway endpoints, each a host optionally followed by C(:port), e.g. C(cagw2.example.com:8443) or
+              C([2001:db8::1]:8443), with O(port) by default. The requests go to the healthiest endpoint, by latency and
+              error rate, and to the next one when it cannot be connected to, see O(cagw_api_connect_timeout).
+        type: list
+        elements: str
+        required: true
+
+    port:
+        description:
+            - Port for Entrust CAGW.
+        type: int
+        default: 443
+
+    validate_certs:
+        description:
+            - If set to false then SSL validation with Server is skipped.
+              This should be set to false only for testing purposes.
+        type: bool
+        default: True
+
+    certificate_authority_id:
+        description:
+            - Unique id for the Certificate Authority whose certificates are mirrored.
+        type: str
+        required: true
+
+    dest:
+        description:
+            - Directory in which every certificate concerned by an event is written in PEM format, as C(<serial number>.crt).
+            - It is created when it does not exist.
+            - A certificate whose serial number is not made of letters and digits only is not written, with a warning.
+        type: path
+
+    inventory_path:
+        description:
+            - Path of a local SQLite database in which every certificate concerned by an event is recorded with its status,
+              see O(entrust.crypto.cagw_certificate#module:inventory_path).
+        type: path
+
+    cursor_path:
+        description:
+            - Path of the JSON file keeping the end of the period last listed, per Certificate Authority.
+            - Defaults to C(.cagw-sync-cursor.json) in O(dest), or to O(inventory_path) followed by C(.cursor.json).
+        type: path
+
+    start_date:
+        description:
+            - List the events from this date, in ISO 8601 format, rather than from the end of the previous run.
+            - The events of a Certificate Authority which was never synchronized are listed from its first one by default.
+        type: str
+
+    page_size:
+        description:
+            - Maximum number of events requested at a time.
+        type: int
+        default: 100
+
+seealso:
+    - module: entrust.crypto.cagw_certificate_inventory_info
+      description: Query the inventory filled by this module.
+'''
+
+EXAMPLES = r'''
+- name: Mirror the certificates of a CA into a directory and the inventory, every run picking up where the last one stopped
+  entrust.crypto.cagw_certificate_sync:
+    host: cagw.example.com
+    cagw_api_client_cert_path: /etc/ssl/entrust/cagw-client.crt
+    cagw_api_client_cert_key_path: /etc/ssl/entrust/cagw-client.key
+    cagw_api_specification_path: /etc/ssl/entrust/cagw-api.yaml
+    certificate_authority_id: ca_id
+    dest: /var/lib/entrust/certificates
+    inventory_path: /var/lib/entrust/inventory.db
+  register: sync
+
+- name: Show the certificates revoked since the last run
+  ansible.builtin.debug:
+    msg: "{{ sync.certificates | selectattr('status', 'equalto', 'revoked') | map(attribute='serial_number') | list }}"
+'''
+
+RETURN = '''
+start_date:
+    description: The start of the period listed.
+    returned: success
+    type: str
+    sample: '2024-04-22T09:00:00Z'
+
+cursor:
+    description: The end of the period listed, the start of the next run.
+    returned: success
+    type: str
+    sample: '2024-04-23T09:00:00Z'
+
+certificates:
+    description: The certificates concerned by the events of the period, once each, in the order of their last event.
+    returned: success
+    type: list
+    elements: dict
+    contains:
+        serial_number:
+            description: The serial number of the certificate in hexadecimal format.
+            type: str
+            sample: 5B9BA13D
+        event_type:
+            description: The type of the last event of the certificate.
+            type: str
+            sample: revoked
+        event_date:
+            description: The date of the last event of the certificate.
+            type: str
+            sample: '2024-04-22T15:04:00Z'
+        status:
+            description: The status of the certificate after that event.
+            type: str
+            sample: revoked
+        path:
+            description: The file of the certificate in O(dest).
+            type: str
+            sample: /var/lib/entrust/certificates/5B9BA13D.crt
+        changed:
+            description: Whether the file of the certificate was written, or would be in check mode.
+            type: bool
+
+stats:
+    description: Counts of the run.
+    returned: success
+    type: dict
+    contains:
+        events:
+            description: Number of events listed.
+            type: int
+        pages:
+            description: Number of pages requested.
+            type: int
+        certificates:
+            description: Number of certificates concerned by the events.
+            type: int
+        written:
+            description: Number of certificate files written to O(dest), or which would be in check mode.
+            type: int
+        recorded:
+            description: Number of certificates added to or updated in O(inventory_path), or which would be in check mode.
+            type: int
+        elapsed:
+            description: Wall clock seconds for the whole run.
+            type: float
+'''
+
+import base64
+import binascii
+import hashlib
+import json
+import os
+import re
+import sqlite3
+from datetime import datetime, timezone
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils._text import to_native
+
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.api import (
+    cagw_client_argument_spec,
+    cagw_gateway_kwargs,
+    RestOperationException,
+    SessionConfigurationException,
+)
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.certificate import (
+    parse_iso8601,
+    PEM_BEGIN_LINE,
+    PEM_END_LINE,
+    validity_bounds,
+)
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.concurrency import Stopwatch
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.files import AtomicFile, file_digest
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.inventory import format_date, Inventory
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.persistent import cagw_client_for
+
+# Start of the events of a Certificate Authority which was never synchronized
+EPOCH = '1970-01-01T00:00:00Z'
+
+# The serial numbers which name a file of dest, one from the gateway cannot name a path outside of it
+SERIAL_NUMBER_PATTERN = re.compile(r'[0-9A-Za-z]+\Z')
+
+# Bumped whenever the content of the cursor file changes, a cursor of another version is ignored
+CURSOR_VERSION = 1
+
+
+def default_cursor_path(params):
+    if params['dest']:
+        return os.path.join(params['dest'], '.cagw-sync-cursor.json')
+    return params['inventory_path'] + '.cursor.json'
+
+
+def read_cursors(path):
+    """The end of the period last listed of every Certificate Authority, by its id"""
+    try:
+        with open(path, 'r') as f:
+            content = json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+    if not isinstance(content, dict) or content.get('version') != CURSOR_VERSION:
+        return {}
+    return content.get('cursors') or {}
+
+
+def write_cursors(path, cursors):
+    """Write the cursors to path, return whether they changed"""
+    with AtomicFile(path) as f:
+        f.write(json.dumps(dict(version=CURSOR_VERSION, cursors=cursors), sort_keys=True).encode('utf-8'))
+        return f.commit()[0]
+
+
+class CertificateMirror(object):
+    '''
+    Writes and records the certificates of the events listed by cagw_certificate_sync
+    '''
+    def __init__(self, module, cagw_client, inventory):
+        self.module = module
+        self.cagw_client = cagw_client
+        self.inventory = inventory
+        # The summary of every certificate met, by serial number; it only grows with the events of one period
+        self.certificates = {}
+        # The inventory columns of every certificate met after its last event, recorded by record_all
+        self.columns = {}
+        self.written = 0
+        self.recorded = 0
+
+    def certificate_of(self, event):
+        """The certificate of the event, fetched from CAGW when the event does not carry its content"""
+        certificate = event.get('certificate') or {}
+        if certificate.get('certificateData') or not self.module.params['dest']:
+            return certificate
+        params = self.module.params
+        result = self.cagw_client.GetCertificate(ca_id=params['certificate_authority_id'], serial_no=event['serialNumber'],
+                                                 validate_certs=params['validate_certs'], **cagw_gateway_kwargs(params))
+        return result.get('certificate') or {}
+
+    def handle(self, event):
+        serial_number = event.get('serialNumber')
+        if not serial_number:
+            return
+        certificate = self.certificate_of(event)
+        summary = dict(serial_number=serial_number, event_type=event.get('eventType'), event_date=event.get('eventDate'),
+                       status=(certificate.get('status') or '').lower() or None, path=None, changed=False)
+        if self.module.params['dest'] and not SERIAL_NUMBER_PATTERN.match(serial_number):
+            self.module.warn('The certificate {0!r} is not written to {1}, its serial number is not made of letters and digits only.'.format(
+                serial_number, self.module.params['dest']))
+        elif self.module.params['dest']:
+            summary['path'] = os.path.join(self.module.params['dest'], '{0}.crt'.format(serial_number.upper()))
+            # The file written for an earlier event of the certificate, in check mode too, is not written again
+            previous = self.certificates.get(serial_number)
+            if previous is not None and previous['changed']:
+                summary['changed'] = True
+            elif certificate.get('certificateData'):
+                summary['changed'] = self.write(summary['path'], certificate['certificateData'])
+        # Its previous event, if any, is superseded
+        self.certificates.pop(serial_number, None)
+        self.certificates[serial_number] = summary
+        if self.module.params['inventory_path']:
+            self.merge(serial_number, certificate, summary)
+
+    def write(self, path, certificate_data):
+        """Write the certificate to path unless it is there already, return whether it was written, or would be in check mode"""
+        content = PEM_BEGIN_LINE + certificate_data.encode('ascii') + PEM_END_LINE
+        try:
+            if self.module.check_mode:
+                changed = file_digest(path) != hashlib.sha256(content).hexdigest()
+            else:
+                with AtomicFile(path) as f:
+                    f.write(content)
+                    changed = f.commit()[0]
+        except (IOError, OSError) as e:
+            self.module.fail_json(msg='Failed to write the certificate to {0}: {1}'.format(path, to_native(e)))
+        if changed:
+            self.written += 1
+        return changed
+
+    def merge(self, serial_number, certificate, summary):
+        """Update the columns of the certificate with its event, those the event does not give keep their value"""
+        not_before, not_after = validity_bounds(certificate.get('validityPeriod'))
+        fingerprint = None
+        if certificate.get('certificateData'):
+            try:
+                fingerprint = hashlib.sha256(base64.b64decode(''.join(certificate['certificateData'].split()), validate=True)).hexdigest()
+            except (binascii.Error, ValueError):
+                pass
+        columns = dict(path=summary['path'], not_before=format_date(not_before), not_after=format_date(not_after),
+                       status=summary['status'], fingerprint=fingerprint)
+        self.columns.setdefault(serial_number, {}).update((name, value) for name, value in columns.items() if value is not None)
+
+    def record_all(self):
+        """Record the certificates met since the last call whose columns differ from those of the inventory.
+
+        Only the state after the last event of a certificate is compared and recorded, the events which
+        led to it, e.g. its issuance before its revocation, do not change the inventory on their own.
+        """
+        ca_id = self.module.params['certificate_authority_id']
+        for serial_number, columns in self.columns.items():
+            try:
+                # Without an inventory, check mode has not opened one which does not exist yet, every certificate is new to it
+                recorded = self.inventory.get(ca_id, serial_number) if self.inventory is not None else None
+                # A certificate recorded as it is keeps the date it was last updated
+                if recorded is not None and all(recorded[name] == value for name, value in columns.items()):
+                    continue
+                if not self.module.check_mode:
+                    self.inventory.record(ca_id, serial_number, **columns)
+            except sqlite3.Error as e:
+                self.module.fail_json(msg='Failed to record the certificate {0} in the inventory {1}: {2}'.format(
+                    serial_number, self.inventory.path, to_native(e)))
+            self.recorded += 1
+        self.columns = {}
+
+    @property
+    def changed(self):
+        return self.written > 0 or self.recorded > 0
+
+
+def cagw_certificate_sync_argument_spec():
+    return dict(
+        host=dict(type='list', elements='str', required=True),
+        port=dict(type='int', default=443),
+        validate_certs=dict(type='bool', default=True),
+        certificate_authority_id=dict(type='str', required=True),
+        dest=dict(type='path'),
+        inventory_path=dict(type='path'),
+        cursor_path=dict(type='path'),
+        start_date=dict(type='str'),
+        page_size=dict(type='int', default=100),
+    )
+
+
+def main():
+    cagw_argument_spec = cagw_client_argument_spec()
+    cagw_argument_spec.update(cagw_certificate_sync_argument_spec())
+    module = AnsibleModule(argument_spec=cagw_argument_spec, supports_check_mode=True,
+                           required_one_of=[['dest', 'inventory_path']])
+    params = module.params
+    if params['page_size'] < 1:
+        module.fail_json(msg='page_size must be at least 1, got {0}.'.format(params['page_size']))
+    ca_id = params['certificate_authority_id']
+    cursor_path = params['cursor_path'] or default_cursor_path(params)
+    cursors = read_cursors(cursor_path)
+
+    start_date = params['start_date'] or cursors.get(ca_id) or EPOCH
+    start = parse_iso8601(start_date)
+    if start is None:
+        module.fail_json(msg='start_date must be a date in ISO 8601 format, got {0}.'.format(start_date))
+    start_date = format_date(start)
+    # Whole seconds, an event of the current second is listed by the next run
+    end_date = format_date(datetime.now(timezone.utc).replace(microsecond=0))
+
+    try:
+        cagw_client = cagw_client_for(module)
+    except SessionConfigurationException as e:
+        module.fail_json(msg='Failed to initialize Entrust Provider: {0}'.format(to_native(e)))
+    inventory = None
+    try:
+        if not module.check_mode:
+            if params['dest'] and not os.path.isdir(params['dest']):
+                os.makedirs(params['dest'])
+            if params['inventory_path']:
+                inventory = Inventory(params['inventory_path'])
+        # Check mode compares the certificates with an existing inventory, it does not create one
+        elif params['inventory_path'] and os.path.exists(params['inventory_path']):
+            inventory = Inventory(params['inventory_path'], read_only=True)
+    except (OSError, sqlite3.Error) as e:
+        module.fail_json(msg='Failed to prepare {0}: {1}'.format(params['dest'] or params['inventory_path'], to_native(e)))
+
+    mirror = CertificateMirror(module, cagw_client, inventory)
+    events = pages = 0
+    with Stopwatch() as timer:
+        try:
+            for page in cagw_client.pages('GetCertificateEvents', ca_id=ca_id, startDate=start_date, endDate=end_date, pageSize=params['page_size'],
+                                          validate_certs=params['validate_certs'], **cagw_gateway_kwargs(params)):
+                pages += 1
+                for event in page.get('events') or []:
+                    events += 1
+                    mirror.handle(event)
+        except RestOperationException as e:
+            # The cursor stays where it was, the next run lists the whole period again
+            mirror.record_all()
+            module.fail_json(msg='Failed to list the certificate events from Entrust (CAGW) {0} Error:'.format(e),
+                             changed=mirror.changed and not module.check_mode, start_date=start_date, certificates=list(mirror.certificates.values()))
+    mirror.record_all()
+    if inventory is not None:
+        inventory.close()
+
+    cursor_moved = False
+    if not module.check_mode:
+        cursors[ca_id] = end_date
+        try:
+            cursor_moved = write_cursors(cursor_path, cursors)
+        except (IOError, OSError) as e:
+            module.fail_json(msg='Failed to write the cursor to {0}: {1}'.format(cursor_path, to_native(e)))
+
+    stats = dict(events=events, pages=pages, certificates=len(mirror.certificates), written=mirror.written, recorded=mirror.recorded,
+                 elapsed=round(timer.elapsed, 3))
+    module.exit_json(changed=mirror.changed or cursor_moved, start_date=start_date, cursor=end_date,
+                     certificates=list(mirror.certificates.values()), stats=stats)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c), Entrust Corporation, 2023
+# Author: Sapna Jain, Entrust
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Stand-in for the Certificate Authority Gateway, serving the operations of cagw-api.yaml over mutual TLS.
+
+A throwaway CA, a server certificate for localhost and a client certificate for the modules are created in
+--pki-dir on first start, together with a sample CSR. Enrollments are signed by that CA and kept in memory,
+so certificates can then be fetched and acted on by serial number, and every enrollment and action is listed as an event.
+
+Latency and failures can be injected to exercise the retries and the concurrency of the client:
+--latency delays every response, --error-rate answers that share of the requests with --error-status.
+
+Once listening, a JSON line with the port and the PKI paths is printed on stdout.
+"""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import argparse
+import base64
+import datetime
+import json
+import os
+import random
+import re
+import ssl
+import sys
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.serialization import pkcs12
+from cryptography.x509.oid import NameOID
+
+BASE_PATH = '/cagw/v1/certificate-authorities'
+ENROLLMENTS = re.compile(r'^{0}/([^/]+)/enrollments$'.format(BASE_PATH))
+CERTIFICATE = re.compile(r'^{0}/([^/]+)/certificates/([^/]+)$'.format(BASE_PATH))
+ACTIONS = re.compile(r'^{0}/([^/]+)/certificates/([^/]+)/actions$'.format(BASE_PATH))
+EVENTS = re.compile(r'^{0}/([^/]+)/certificate-events$'.format(BASE_PATH))
+
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+# Status of a certificate after each action type
+ACTION_STATUSES = {
+    'RevokeAction': 'revoked',
+    'HoldAction': 'held',
+    'UnholdAction': 'issued',
+}
+
+# Type of the event listed for each action type
+ACTION_EVENTS = {
+    'RevokeAction': 'revoked',
+    'HoldAction': 'held',
+    'UnholdAction': 'unheld',
+}
+
+
+def name(common_name):
+    return x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, common_name)])
+
+
+def write_pem(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def private_key_pem(key):
+    return key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+
+
+class MockPKI(object):
+    """ The CA of the mock, with the server and client certificates it issued """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.ca_cert = os.path.join(directory, 'ca.crt')
+        self.ca_key = os.path.join(directory, 'ca.key')
+        self.server_cert = os.path.join(directory, 'server.crt')
+        self.server_key = os.path.join(directory, 'server.key')
+        self.client_cert = os.path.join(directory, 'client.crt')
+        self.client_key = os.path.join(directory, 'client.key')
+        self.csr = os.path.join(directory, 'request.csr')
+        if not os.path.exists(self.ca_key):
+            self.create()
+        with open(self.ca_cert, 'rb') as f:
+            self.ca = x509.load_pem_x509_certificate(f.read())
+        with open(self.ca_key, 'rb') as f:
+            self.key = serialization.load_pem_private_key(f.read(), None)
+
+    def create(self):
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        now = datetime.datetime.now(datetime.timezone.utc)
+        ca_key = ec.generate_private_key(ec.SECP256R1())
+        ca = (x509.CertificateBuilder().subject_name(name('CAGW mock CA')).issuer_name(name('CAGW mock CA'))
+              .public_key(ca_key.public_key()).serial_number(x509.random_serial_number())
+              .not_valid_before(now).not_valid_after(now + datetime.timedelta(days=3650))
+              .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+              .sign(ca_key, hashes.SHA256()))
+        write_pem(self.ca_cert, ca.public_bytes(serialization.Encoding.PEM))
+        write_pem(self.ca_key, private_key_pem(ca_key))
+
+        for common_name, cert_path, key_path in (('localhost', self.server_cert, self.server_key),
+                                                 ('cagw-client', self.client_cert, self.client_key)):
+            key = ec.generate_private_key(ec.SECP256R1())
+            builder = (x509.CertificateBuilder().subject_name(name(common_name)).issuer_name(ca.subject)
+                       .public_key(key.public_key()).serial_number(x509.random_serial_number())
+                       .not_valid_before(now).not_valid_after(now + datetime.timedelta(days=3650)))
+            if common_name == 'localhost':
+                builder = builder.add_extension(x509.SubjectAlternativeName([x509.DNSName('localhost')]), critical=False)
+            write_pem(cert_path, builder.sign(ca_key, hashes.SHA256()).public_bytes(serialization.Encoding.PEM))
+            write_pem(key_path, private_key_pem(key))
+
+        key = ec.generate_private_key(ec.SECP256R1())
+        csr = x509.CertificateSigningRequestBuilder().subject_name(name('www.example.com')).sign(key, hashes.SHA256())
+        write_pem(self.csr, csr.public_bytes(serialization.Encoding.PEM))
+
+    def issue(self, subject, public_key, days):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        return (x509.CertificateBuilder().subject_name(subject).issuer_name(self.ca.subject).public_key(public_key)
+                .serial_number(x509.random_serial_number())
+                .not_valid_before(now).not_valid_after(now + datetime.timedelta(days=days))
+                .sign(self.key, hashes.SHA256()))
+
+    def paths(self):
+        return dict(ca_cert=self.ca_cert, client_cert=self.client_cert, client_key=self.client_key, csr=self.csr)
+
+
+class MockGateway(object):
+    """ State of the mock: the issued certificates and the request counters """
+
+    def __init__(self, pki, latency=0.0, error_rate=0.0, error_status=503, retry_after=None, validity_days=365):
+        self.pki = pki
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.validity_days = validity_days
+        self.certificates = {}
+        self.events = []
+        self.counters = dict(requests=0, errors_injected=0, enrollments=0, gets=0, actions=0, event_pages=0)
+        self.lock = threading.Lock()
+
+    def count(self, counter):
+        with self.lock:
+            self.counters[counter] += 1
+
+    def add_event(self, event_type, certificate):
+        """List an event of the certificate, with a copy of the certificate as it is after the event; call with the lock"""
+        self.events.append(dict(eventType=event_type, eventDate=time.strftime(DATE_FORMAT, time.gmtime()),
+                                serialNumber=certificate['serialNumber'], certificate=dict(certificate)))
+
+    def list_events(self, start_date, end_date=None, page_index=0, page_size=100):
+        """A page of the events from start_date until end_date, excluded, and the index of the next page or None"""
+        with self.lock:
+            events = [event for event in self.events
+                      if event['eventDate'] >= start_date and (end_date is None or event['eventDate'] < end_date)]
+        page = events[page_index * page_size:(page_index + 1) * page_size]
+        return page, page_index + 1 if (page_index + 1) * page_size < len(events) else None
+
+    def enroll(self, body):
+        required_format = (body.get('requiredFormat') or {}).get('format', 'X509')
+        subject_dn = (body.get('optionalCertificateRequestDetails') or {}).get('subjectDn')
+        if required_format == 'PKCS12':
+            key = ec.generate_private_key(ec.SECP256R1())
+            cert = self.pki.issue(name(subject_dn or 'pkcs12'), key.public_key(), self.validity_days)
+            password = ((body['requiredFormat'].get('protection') or {}).get('password') or '').encode('utf-8')
+            encryption = serialization.BestAvailableEncryption(password) if password else serialization.NoEncryption()
+            content = pkcs12.serialize_key_and_certificates(b'cagw', key, cert, None, encryption)
+        else:
+            csr = x509.load_der_x509_csr(base64.b64decode(body['csr']))
+            cert = self.pki.issue(csr.subject, csr.public_key(), self.validity_days)
+            content = cert.public_bytes(serialization.Encoding.DER)
+
+        serial_number = '{0:X}'.format(cert.serial_number)
+        validity_period = '{0}/{1}'.format(cert.not_valid_before_utc.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                                           cert.not_valid_after_utc.strftime('%Y-%m-%dT%H:%M:%SZ'))
+        certificate = dict(
+            serialNumber=serial_number,
+            certificateData=base64.b64encode(cert.public_bytes(serialization.Encoding.DER)).decode('ascii'),
+            status='issued',
+            validityPeriod=validity_period,
+        )
+        with self.lock:
+            self.certificates[serial_number] = certificate
+            self.add_event('issued', certificate)
+        return dict(serialNumber=serial_number, body=base64.b64encode(content).decode('ascii'), status='ISSUED',
+                    validityPeriod=validity_period)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        # The TLS handshake runs in the thread of the connection, not in the accept loop
+        self.request = self.server.ssl_context.wrap_socket(self.request, server_side=True)
+        BaseHTTPRequestHandler.setup(self)
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for header, value in (headers or {}).items():
+            self.send_header(header, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_error_json(self, status, message, headers=None):
+        self.send_json(status, dict(status=status, errors=[dict(message=message)]), headers)
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def inject(self):
+        """Delay the response, and answer it with the injected error if it is drawn, return True then"""
+        gateway = self.server.gateway
+        gateway.count('requests')
+        if gateway.latency:
+            time.sleep(gateway.latency)
+        if gateway.error_rate and random.random() < gateway.error_rate:
+            gateway.count('errors_injected')
+            headers = {'Retry-After': gateway.retry_after} if gateway.retry_after is not None else None
+            self.send_error_json(gateway.error_status, 'Injected failure of the CAGW mock', headers)
+            return True
+        return False
+
+    def do_GET(self):
+        gateway = self.server.gateway
+        if self.path == '/_mock/stats':
+            return self.send_json(200, dict(gateway.counters, certificates=len(gateway.certificates)))
+        if self.inject():
+            return
+        url = urlsplit(self.path)
+        match = EVENTS.match(url.path)
+        if match:
+            return self.send_events(parse_qs(url.query))
+        match = CERTIFICATE.match(self.path)
+        if not match:
+            return self.send_error_json(404, 'No operation at {0}'.format(self.path))
+        gateway.count('gets')
+        certificate = gateway.certificates.get(match.group(2).upper())
+        if certificate is None:
+            return self.send_error_json(404, 'Certificate not found')
+        self.send_json(200, dict(certificate=certificate, message=dict(message='Certificate found.')))
+
+    def send_events(self, query):
+        gateway = self.server.gateway
+        gateway.count('event_pages')
+        try:
+            start_date = datetime.datetime.strptime(query['startDate'][0], DATE_FORMAT).strftime(DATE_FORMAT)
+            end_date = query['endDate'][0] if 'endDate' in query else None
+            if end_date is not None:
+                end_date = datetime.datetime.strptime(end_date, DATE_FORMAT).strftime(DATE_FORMAT)
+            page_index = int(query.get('pageIndex', ['0'])[0])
+            page_size = int(query.get('pageSize', ['100'])[0])
+        except (KeyError, ValueError) as e:
+            return self.send_error_json(400, 'Invalid event query: {0}'.format(e))
+        events, next_page_index = gateway.list_events(start_date, end_date, page_index, max(page_size, 1))
+        page = dict(events=events, message=dict(message='{0} events found.'.format(len(events))))
+        if next_page_index is not None:
+            page['nextPageIndex'] = next_page_index
+        self.send_json(200, page)
+
+    def do_POST(self):
+        gateway = self.server.gateway
+        body = self.read_body()
+        if self.inject():
+            return
+        if ENROLLMENTS.match(self.path):
+            gateway.count('enrollments')
+            try:
+                enrollment = gateway.enroll(body)
+            except (KeyError, ValueError) as e:
+                return self.send_error_json(400, 'Invalid enrollment: {0}'.format(e))
+            return self.send_json(201, dict(enrollment=enrollment, message=dict(message='Enrollment was successful.')))
+
+        match = ACTIONS.match(self.path)
+        if match:
+            gateway.count('actions')
+            certificate = gateway.certificates.get(match.group(2).upper())
+            if certificate is None:
+                return self.send_error_json(404, 'Certificate not found')
+            action_type = (body.get('action') or {}).get('type')
+            if action_type not in ACTION_STATUSES:
+                return self.send_error_json(400, 'Unknown action type {0}'.format(action_type))
+            with gateway.lock:
+                certificate['status'] = ACTION_STATUSES[action_type]
+                gateway.add_event(ACTION_EVENTS[action_type], certificate)
+            action = dict(type=action_type, status='COMPLETED')
+            return self.send_json(200, dict(action=action, message=dict(message='Action completed.')))
+
+        self.send_error_json(404, 'No operation at {0}'.format(self.path))
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, gateway):
+        ThreadingHTTPServer.__init__(self, address, MockHandler)
+        self.gateway = gateway
+        self.ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self.ssl_context.load_cert_chain(gateway.pki.server_cert, gateway.pki.server_key)
+        self.ssl_context.load_verify_locations(gateway.pki.ca_cert)
+        self.ssl_context.verify_mode = ssl.CERT_REQUIRED
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=0, help='0 picks a free port')
+    parser.add_argument('--pki-dir', required=True, help='directory of the CA and the client credentials, created if needed')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of the requests answered with --error-status')
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--retry-after', help='Retry-After header of the injected errors')
+    parser.add_argument('--validity-days', type=int, default=365)
+    parser.add_argument('--pid-file')
+    args = parser.parse_args()
+
+    gateway = MockGateway(MockPKI(args.pki_dir), latency=args.latency, error_rate=args.error_rate,
+                          error_status=args.error_status, retry_after=args.retry_after, validity_days=args.validity_days)
+    server = MockServer((args.host, args.port), gateway)
+    if args.pid_file:
+        with open(args.pid_file, 'w') as f:
+            f.write(str(os.getpid()))
+    info = dict(host='localhost', port=server.server_address[1], pid=os.getpid())
+    info.update(gateway.pki.paths())
+    sys.stdout.write(json.dumps(info) + '\n')
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
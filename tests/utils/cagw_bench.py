@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c), Entrust Corporation, 2023
+# Author: Sapna Jain, Entrust
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Load benchmark of the CAGW clients and of cagw_certificate_batch against the local CAGW mock.
+
+Starts tests/integration/targets/setup_cagw_mock/files/cagw_mock.py, then sends the requests at every
+concurrency level with CAGWClient on threads, with AsyncCAGWClient on an event loop and, with --module,
+through the cagw_certificate_batch module, and prints the latency percentiles and throughput:
+
+    python tests/utils/cagw_bench.py --collections-path ~/ansible_collections/.. --latency 0.02
+
+With --baseline, the requests per second are compared to a previous --json result and the exit code is 1
+when any of them dropped by more than --max-regression.
+"""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.dirname(os.path.dirname(HERE))
+MOCK = os.path.join(REPO, 'tests', 'integration', 'targets', 'setup_cagw_mock', 'files', 'cagw_mock.py')
+SPECIFICATION = os.path.join(REPO, 'roles', 'cagw_certificate', 'files', 'cagw-api.yaml')
+CA_ID = 'bench_ca'
+
+
+def default_collections_path():
+    """The directory holding ansible_collections/ when the repository is checked out as entrust/crypto"""
+    parts = REPO.split(os.sep)
+    if len(parts) > 3 and parts[-3] == 'ansible_collections':
+        return os.sep.join(parts[:-3])
+    return None
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return None
+    index = max(0, min(len(values) - 1, int(round(fraction * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def summarize(name, concurrency, latencies, failures, elapsed):
+    latencies = sorted(latencies)
+    return dict(
+        name=name,
+        concurrency=concurrency,
+        requests=len(latencies) + failures,
+        failures=failures,
+        p50_ms=round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        p95_ms=round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+        p99_ms=round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        requests_per_second=round(len(latencies) / elapsed, 1) if elapsed > 0 else None,
+    )
+
+
+class Mock(object):
+    """ The CAGW mock running in a subprocess """
+
+    def __init__(self, args):
+        self.pki_dir = tempfile.mkdtemp(prefix='cagw_bench.')
+        command = [sys.executable, MOCK, '--port', '0', '--pki-dir', self.pki_dir,
+                   '--latency', str(args.latency), '--error-rate', str(args.error_rate)]
+        self.process = subprocess.Popen(command, stdout=subprocess.PIPE, universal_newlines=True)
+        line = self.process.stdout.readline()
+        if not line:
+            raise SystemExit('The CAGW mock did not start: exit code {0}'.format(self.process.wait()))
+        self.info = json.loads(line)
+
+    def close(self):
+        self.process.terminate()
+        self.process.wait()
+        shutil.rmtree(self.pki_dir, ignore_errors=True)
+
+
+class ClientBenchmark(object):
+    """ Sends one operation repeatedly with CAGWClient or AsyncCAGWClient """
+
+    def __init__(self, mock, args):
+        from ansible_collections.entrust.crypto.plugins.module_utils.cagw import api
+
+        self.api = api
+        self.mock = mock
+        self.args = args
+        self.client_args = dict(
+            cagw_api_cert=mock.info['client_cert'],
+            cagw_api_cert_key=mock.info['client_key'],
+            cagw_api_specification_path=SPECIFICATION,
+            max_retries=args.retries,
+        )
+        self.call_args = dict(ca_id=CA_ID, validate_certs=False, host=mock.info['host'], port=mock.info['port'])
+        with open(mock.info['csr']) as f:
+            csr = ''.join(line for line in f.read().splitlines() if not line.startswith('-----'))
+        self.enroll_body = dict(profileId='bench_profile', requiredFormat=dict(format='X509'), csr=csr)
+        # One certificate to look up for the GetCertificate benchmark
+        result = api.CAGWClient(**self.client_args).NewCertRequest(Body=self.enroll_body, **self.call_args)
+        self.serial_no = result['enrollment']['serialNumber']
+
+    def _operation(self, client):
+        if self.args.operation == 'enroll':
+            return lambda: client.NewCertRequest(Body=self.enroll_body, **self.call_args)
+        return lambda: client.GetCertificate(serial_no=self.serial_no, **self.call_args)
+
+    def threads(self, concurrency):
+        from ansible_collections.entrust.crypto.plugins.module_utils.cagw.concurrency import run_concurrently
+
+        operation = self._operation(self.api.CAGWClient(**self.client_args))
+
+        def call(dummy):
+            start = time.monotonic()
+            operation()
+            return time.monotonic() - start
+
+        return self._run(lambda: run_concurrently(call, range(self.requests(concurrency)), concurrency))
+
+    def asyncio(self, concurrency):
+        from ansible_collections.entrust.crypto.plugins.module_utils.cagw.concurrency import run_on_event_loop
+
+        client = self.api.AsyncCAGWClient(max_concurrency=concurrency, **self.client_args)
+        operation = self._operation(client)
+
+        async def call(dummy):
+            start = time.monotonic()
+            await operation()
+            return time.monotonic() - start
+
+        return self._run(lambda: run_on_event_loop(call, range(self.requests(concurrency)), concurrency,
+                                                   cleanup=client.session.pool.aclose))
+
+    def requests(self, concurrency):
+        return max(self.args.requests, concurrency * 2)
+
+    def _run(self, run):
+        start = time.monotonic()
+        results = run()
+        elapsed = time.monotonic() - start
+        latencies = [result for result, error in results if error is None]
+        return latencies, len(results) - len(latencies), elapsed
+
+
+class ModuleBenchmark(object):
+    """ Enrolls certificates with the cagw_certificate_batch module, run the way Ansible runs it """
+
+    def __init__(self, mock, args, collections_path):
+        self.mock = mock
+        self.args = args
+        self.env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [collections_path, os.environ.get('PYTHONPATH')])))
+        self.workdir = tempfile.mkdtemp(prefix='cagw_bench_module.', dir=mock.pki_dir)
+
+    def run(self, engine, concurrency):
+        count = max(self.args.requests, concurrency * 2)
+        params = dict(
+            host=self.mock.info['host'],
+            port=self.mock.info['port'],
+            validate_certs=False,
+            cagw_api_client_cert_path=self.mock.info['client_cert'],
+            cagw_api_client_cert_key_path=self.mock.info['client_key'],
+            cagw_api_specification_path=SPECIFICATION,
+            cagw_api_retries=self.args.retries,
+            certificate_authority_id=CA_ID,
+            certificate_profile_id='bench_profile',
+            connector_name='SM',
+            force=True,
+            engine=engine,
+            workers=concurrency,
+            allow_partial_failure=True,
+            certificates=[dict(path=os.path.join(self.workdir, '{0}.crt'.format(index)), csr=self.mock.info['csr'])
+                          for index in range(count)],
+        )
+        args_path = os.path.join(self.workdir, 'args.json')
+        with open(args_path, 'w') as f:
+            json.dump(dict(ANSIBLE_MODULE_ARGS=params), f)
+        output = subprocess.check_output([sys.executable, '-m', 'ansible_collections.entrust.crypto.plugins.modules.cagw_certificate_batch',
+                                          args_path], env=self.env, universal_newlines=True)
+        result = json.loads(output)
+        if 'results' not in result:
+            raise SystemExit('cagw_certificate_batch failed: {0}'.format(result.get('msg')))
+        latencies = [item['elapsed'] for item in result['results'] if not item['failed']]
+        return latencies, result['stats']['failed'], result['stats']['elapsed']
+
+
+def check_regressions(results, baseline_path, max_regression):
+    with open(baseline_path) as f:
+        baseline = dict(((entry['name'], entry['concurrency']), entry) for entry in json.load(f))
+    regressions = []
+    for entry in results:
+        previous = baseline.get((entry['name'], entry['concurrency']))
+        if not previous or not previous['requests_per_second'] or entry['requests_per_second'] is None:
+            continue
+        change = entry['requests_per_second'] / previous['requests_per_second'] - 1
+        if change < -max_regression:
+            regressions.append('{0} at concurrency {1}: {2} req/s, was {3} ({4:+.0%})'.format(
+                entry['name'], entry['concurrency'], entry['requests_per_second'], previous['requests_per_second'], change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--collections-path', default=default_collections_path(),
+                        help='Directory holding ansible_collections/entrust/crypto, by default found from the location of this script')
+    parser.add_argument('--concurrency', default='1,2,4,8,16,32,64,128,256', help='Comma separated concurrency levels')
+    parser.add_argument('--requests', type=int, default=256, help='Requests per level, at least twice the concurrency')
+    parser.add_argument('--operation', choices=['get', 'enroll'], default='get', help='Operation sent by the client benchmarks')
+    parser.add_argument('--engines', default='threads,asyncio', help='Comma separated engines to benchmark')
+    parser.add_argument('--module', action='store_true', help='Also benchmark the cagw_certificate_batch module')
+    parser.add_argument('--latency', type=float, default=0.0, help='Latency of the mock in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of the mock responses which fail with 503')
+    parser.add_argument('--retries', type=int, default=3, help='Retries of the clients')
+    parser.add_argument('--json', help='Write the results to this file')
+    parser.add_argument('--baseline', help='Results of a previous run written with --json')
+    parser.add_argument('--max-regression', type=float, default=0.2, help='Tolerated drop of the requests per second against the baseline')
+    args = parser.parse_args()
+
+    if not args.collections_path:
+        parser.error('the repository is not checked out as ansible_collections/entrust/crypto, pass --collections-path')
+    sys.path.insert(0, args.collections_path)
+    levels = [int(level) for level in args.concurrency.split(',')]
+    engines = args.engines.split(',')
+
+    mock = Mock(args)
+    results = []
+    try:
+        clients = ClientBenchmark(mock, args)
+        module = ModuleBenchmark(mock, args, args.collections_path) if args.module else None
+        print('{0:<24} {1:>6} {2:>8} {3:>6} {4:>9} {5:>9} {6:>9} {7:>9}'.format(
+            'benchmark', 'conc', 'requests', 'failed', 'p50 ms', 'p95 ms', 'p99 ms', 'req/s'))
+        for engine in engines:
+            benchmarks = [('client-{0}-{1}'.format(args.operation, engine), getattr(clients, engine))]
+            if module:
+                benchmarks.append(('module-enroll-{0}'.format(engine), lambda concurrency, engine=engine: module.run(engine, concurrency)))
+            for name, benchmark in benchmarks:
+                for concurrency in levels:
+                    entry = summarize(name, concurrency, *benchmark(concurrency))
+                    results.append(entry)
+                    print('{name:<24} {concurrency:>6} {requests:>8} {failures:>6} {p50_ms:>9} {p95_ms:>9} {p99_ms:>9} '
+                          '{requests_per_second:>9}'.format(**entry))
+                    sys.stdout.flush()
+    finally:
+        mock.close()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        regressions = check_regressions(results, args.baseline, args.max_regression)
+        for regression in regressions:
+            print('REGRESSION: {0}'.format(regression))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c), Entrust Corporation, 2023
+# Author: Sapna Jain, Entrust
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Generate plugins/module_utils/cagw/generated_client.py from the bundled roles/cagw_certificate/files/cagw-api.yaml.
+
+Run it whenever the specification changes, before building the collection, from a checkout which is importable
+as ansible_collections.entrust.crypto, e.g. with the parent of ansible_collections on PYTHONPATH:
+
+    python tools/generate_cagw_client.py          # writes the module
+    python tools/generate_cagw_client.py --check  # fails when the module is not up to date
+
+Building the module needs PyYAML, using it does not.
+"""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import argparse
+import hashlib
+import keyword
+import os
+import sys
+import textwrap
+
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.api import compile_operations
+from ansible_collections.entrust.crypto.plugins.module_utils.cagw.spec import parse_spec, resolve_refs
+
+COLLECTION_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SPEC_PATH = os.path.join("roles", "cagw_certificate", "files", "cagw-api.yaml")
+MODULE_PATH = os.path.join("plugins", "module_utils", "cagw", "generated_client.py")
+
+# Keys of an operation kept in the generated SPEC, the responses are not used by the client
+OPERATION_KEYS = ("operationId", "parameters")
+
+# Longest line of the generated module, that of the sanity tests
+MAX_LINE_LENGTH = 160
+
+HEADER = '''# -*- coding: utf-8 -*-
+
+# Copyright (c), Entrust Corporation, 2023
+# Author: Sapna Jain, Entrust
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+# Generated from {spec_path} by tools/generate_cagw_client.py, do not edit.
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import json
+
+from ansible.module_utils.six.moves.urllib.parse import urlencode
+
+# SHA-256 of the specification the operations were generated from, a session only uses them for that specification
+SPEC_SHA256 = "{sha256}"
+
+# The operations of the ref-resolved specification, which the session compiles its descriptors and validators from
+SPEC = {spec}
+
+
+class GeneratedOperations(object):
+    """ One method per operation of the specification, mixed into api.GeneratedResource.
+
+    The URLs are formatted from templates built once here, the arguments are checked by _check and the
+    request is sent by _send, with the retries, validation and tracing of the session.
+    """
+'''
+
+
+def strip_descriptions(value):
+    """value without the descriptions of its parameters and schemas, which only the docstrings need"""
+    if isinstance(value, dict):
+        return dict((key, strip_descriptions(item)) for key, item in value.items() if not (key == "description" and isinstance(item, str)))
+    if isinstance(value, list):
+        return [strip_descriptions(item) for item in value]
+    return value
+
+
+def literal(value, indent=0):
+    """value as a Python literal, a key or item per line"""
+    if isinstance(value, (dict, list)) and value:
+        padding = " " * (indent + 4)
+        if isinstance(value, dict):
+            items = ["{0}{1}: {2},".format(padding, repr(key), literal(value[key], indent + 4)) for key in sorted(value)]
+            return "{\n" + "\n".join(items) + "\n" + " " * indent + "}"
+        items = ["{0}{1},".format(padding, literal(item, indent + 4)) for item in value]
+        return "[\n" + "\n".join(items) + "\n" + " " * indent + "]"
+    return repr(value)
+
+
+def wrap(line, indent):
+    """line cut at its spaces into lines of at most MAX_LINE_LENGTH characters, continued at indent"""
+    if len(line) <= MAX_LINE_LENGTH:
+        return [line]
+    return textwrap.wrap(line, MAX_LINE_LENGTH, subsequent_indent=" " * indent, break_long_words=False, break_on_hyphens=False)
+
+
+def type_name(parameter, raw_parameter):
+    """The type of a parameter as documented, the name of the definition of a body"""
+    if parameter.get("in") == "body":
+        ref = (raw_parameter.get("schema") or {}).get("$ref", "")
+        return ref.rsplit("/", 1)[-1] if ref else (parameter.get("schema") or {}).get("type", "object")
+    return parameter.get("format") or parameter.get("type") or "string"
+
+
+def generate_operation(descriptor, raw_operation):
+    """The source of the method of an operation"""
+    parameters = [parameter for parameter in descriptor.operation_spec.get("parameters") or [] if parameter.get("name")]
+    raw_parameters = dict((parameter.get("name"), parameter) for parameter in raw_operation.get("parameters") or [])
+    names = [parameter["name"] for parameter in parameters]
+    for name in names:
+        if not name.isidentifier() or keyword.iskeyword(name) or name in ("host", "port", "validate_certs", "profiler", "self"):
+            raise ValueError("The parameter {0} of {1} cannot be the argument of a method".format(name, descriptor.name))
+
+    lines = []
+    arguments = ", ".join(["self"] + ["{0}=None".format(name) for name in names] + ["host=None", "port=None", "validate_certs=True", "profiler=None"])
+    lines.extend(wrap("    def {0}({1}):".format(descriptor.name, arguments), len(descriptor.name) + 9))
+    summary = (descriptor.operation_spec.get("summary") or descriptor.operation_spec.get("description") or descriptor.name).strip()
+    lines.append('        """{0}, {1} {2}'.format(summary.replace('"""', "'''"), descriptor.method.upper(), descriptor.uri))
+    if parameters:
+        lines.append("")
+        lines.append("        Arguments:")
+        for parameter in parameters:
+            lines.extend(wrap("            {0} ({1}, {2}{3}): {4}".format(
+                parameter["name"], type_name(parameter, raw_parameters.get(parameter["name"], {})), parameter.get("in"),
+                ", required" if parameter.get("required") or parameter.get("in") == "path" else "",
+                (parameter.get("description") or "").strip().replace('"""', "'''")), 16))
+    lines.append('        """')
+
+    lines.extend(wrap('        self._check("{0}", dict({1}))'.format(descriptor.name, ", ".join("{0}={0}".format(name) for name in names)),
+                      len(descriptor.name) + 27))
+    for name in descriptor.path_params:
+        # As build_request, which fails to format its URL template without them
+        lines.append("        if not {0}:".format(name))
+        lines.append('            raise KeyError("{0}")'.format(name))
+    # Positions 0 and 1 are the host and port, then the path parameters in the order of the spec
+    template = descriptor.url_template
+    for index, name in enumerate(descriptor.path_params):
+        template = template.replace("{" + name + "}", "{" + str(index + 2) + "}")
+    lines.append('        url = "{0}://{{0}}:{{1}}{1}".format({2})'.format(
+        descriptor.scheme, template, ", ".join(["host", "port"] + list(descriptor.path_params))))
+    if descriptor.query_params:
+        lines.append("        query = [")
+        for name in descriptor.query_params:
+            lines.append('            ("{0}", {0}),'.format(name))
+        lines.append("        ]")
+        # Unlike a path parameter, 0 is a valid value, e.g. of a page index
+        lines.append('        query = [(name, value) for name, value in query if value is not None and value != ""]')
+        lines.append("        if query:")
+        lines.append('            url += "?" + urlencode(query)')
+    if descriptor.body_params:
+        body = descriptor.body_params[0]
+        lines.append("        data = json.dumps({0}) if {0} else None".format(body))
+    else:
+        lines.append("        data = None")
+    lines.append('        return self._send("{0}", url, data, validate_certs, profiler)'.format(descriptor.name))
+    return "\n".join(lines)
+
+
+def generate(content):
+    """The source of generated_client.py for the content of the specification"""
+    raw_spec = parse_spec(content, SPEC_PATH)
+    spec = resolve_refs(raw_spec)
+    compact = dict(schemes=spec.get("schemes"), basePath=spec.get("basePath"), paths={})
+    for uri, methods in spec.get("paths").items():
+        compact["paths"][uri] = dict((method, dict((key, operation[key]) for key in OPERATION_KEYS if key in operation))
+                                     for method, operation in methods.items())
+
+    source = HEADER.format(spec_path=SPEC_PATH, sha256=hashlib.sha256(content).hexdigest(), spec=literal(strip_descriptions(compact)))
+    # The docstrings are generated from the descriptions, which SPEC leaves out
+    operations = compile_operations(spec)
+    for name in sorted(operations):
+        descriptor = operations[name]
+        source += "\n" + generate_operation(descriptor, raw_spec["paths"][descriptor.uri][descriptor.method]) + "\n"
+    return source
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the CAGW client of the bundled specification")
+    parser.add_argument("--check", action="store_true", help="fail when the generated module is not up to date")
+    args = parser.parse_args()
+
+    with open(os.path.join(COLLECTION_ROOT, SPEC_PATH), "rb") as f:
+        source = generate(f.read())
+    module_path = os.path.join(COLLECTION_ROOT, MODULE_PATH)
+    if args.check:
+        try:
+            with open(module_path, "r") as f:
+                current = f.read()
+        except IOError:
+            current = None
+        if current != source:
+            sys.exit("{0} is not up to date with {1}, run tools/generate_cagw_client.py".format(MODULE_PATH, SPEC_PATH))
+        return
+    with open(module_path, "w") as f:
+        f.write(source)
+
+
+if __name__ == "__main__":
+    main()